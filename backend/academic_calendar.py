@@ -0,0 +1,129 @@
+"""Calendar layer: maps real dates onto the weekly timetable.
+
+A weekly pattern plus a sparse, date-indexed list of exceptions is enough to answer "what is
+on date X": sessions are expanded lazily for the requested range only, never for a whole term.
+
+Exception kinds:
+    holiday       no classes that day (for every batch, or only the listed batch_ids)
+    day_swap      the date follows another weekday's timetable (e.g. a Saturday running Monday)
+    cancellation  one batch's session in one time slot does not take place
+
+Absences are stored with an ISO date. Older ones may hold a timestamp or only a weekday name
+("Monday"); `absence_date` reads the latter as the first such weekday on or after the day the
+absence was reported.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+EXCEPTION_KINDS = ("holiday", "day_swap", "cancellation")
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """A date from a date, datetime or ISO string ("2026-11-03" or a full timestamp); None otherwise"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def weekday_for(value: Any) -> Optional[str]:
+    """Timetable day for an absence date: ISO dates map to their weekday, and legacy values that
+    are already weekday names ("Monday") are accepted as they are"""
+    parsed = parse_date(value)
+    if parsed is not None:
+        return WEEKDAYS[parsed.weekday()]
+    if isinstance(value, str) and value.strip().lower() in WEEKDAYS:
+        return value.strip().lower()
+    return None
+
+
+def absence_date(absence: Dict[str, Any]) -> Optional[date]:
+    """The date an absence is for, from its ISO date or timestamp, or from a legacy weekday name
+    and the time it was reported; None when neither gives a date"""
+    parsed = parse_date(absence.get("date"))
+    if parsed is not None:
+        return parsed
+    weekday = weekday_for(absence.get("date"))
+    reported = parse_date(absence.get("created_at"))
+    if weekday is None or reported is None:
+        return None
+    return reported + timedelta(days=(WEEKDAYS.index(weekday) - reported.weekday()) % 7)
+
+
+def date_range(start: date, end: date) -> Iterator[date]:
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def applies_to(exception: Dict[str, Any], batch_id: str) -> bool:
+    return not exception.get("batch_ids") or batch_id in exception["batch_ids"]
+
+
+def effective_day(day: date, exceptions: Iterable[Dict[str, Any]], batch_id: str) -> Optional[str]:
+    """Weekday timetable a batch follows on `day`, or None when it has no classes"""
+    weekday = WEEKDAYS[day.weekday()]
+    for exception in exceptions:
+        if not applies_to(exception, batch_id):
+            continue
+        if exception["kind"] == "holiday":
+            return None
+        if exception["kind"] == "day_swap" and exception.get("follows_day"):
+            weekday = exception["follows_day"]
+    return weekday
+
+
+def expand_sessions(entries: Iterable[Dict[str, Any]], start: date, end: date,
+                    exceptions: Iterable[Dict[str, Any]],
+                    substitutions: Iterable[Dict[str, Any]] = ()) -> Iterator[Dict[str, Any]]:
+    """Dated sessions between start and end (inclusive), in date then slot order.
+
+    `exceptions` need only cover the range and `substitutions` are absences with a substitute;
+    a substituted session carries the substitute as faculty_id and the absent lecturer as
+    original_faculty_id.
+    """
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        by_day.setdefault(entry["day"], []).append(entry)
+
+    exceptions_by_date: Dict[date, List[Dict[str, Any]]] = {}
+    for exception in exceptions:
+        exceptions_by_date.setdefault(parse_date(exception["date"]), []).append(exception)
+    covered: Dict[Tuple[date, str, str], Dict[str, Any]] = {}
+    for absence in substitutions:
+        day = absence_date(absence)
+        if day is not None and absence.get("substitute_id"):
+            covered[(day, absence["time_slot"], absence["lecturer_id"])] = absence
+
+    for day in date_range(start, end):
+        todays = exceptions_by_date.get(day, [])
+        weekday = WEEKDAYS[day.weekday()]
+        # Without exceptions every batch follows the calendar weekday; otherwise each batch is
+        # resolved separately, since holidays and swaps can be limited to some batches
+        candidate_days = {weekday} | {e["follows_day"] for e in todays if e["kind"] == "day_swap" and e.get("follows_day")}
+        candidates = [entry for d in candidate_days for entry in by_day.get(d, ())]
+        batch_days: Dict[str, Optional[str]] = {}
+        for entry in sorted(candidates, key=lambda e: (e["time_slot"], e["batch_id"])):
+            if todays:
+                if entry["batch_id"] not in batch_days:
+                    batch_days[entry["batch_id"]] = effective_day(day, todays, entry["batch_id"])
+                if batch_days[entry["batch_id"]] != entry["day"]:
+                    continue
+                if any(e["kind"] == "cancellation" and e.get("time_slot") == entry["time_slot"]
+                       and applies_to(e, entry["batch_id"]) for e in todays):
+                    continue
+            session = {**entry, "date": day.isoformat(), "weekday": weekday}
+            absence = covered.get((day, entry["time_slot"], entry["faculty_id"]))
+            if absence is not None:
+                session["original_faculty_id"] = entry["faculty_id"]
+                session["faculty_id"] = absence["substitute_id"]
+                session["absence_id"] = absence.get("id")
+            yield session
@@ -0,0 +1,130 @@
+"""Admission control for expensive endpoints: concurrency budgets and per-client rate limits.
+
+Each guarded endpoint gets an `AdmissionControl`. A request is admitted only if the endpoint
+has a free slot (otherwise 503, the server is busy) and the client's token bucket holds a token
+(otherwise 429, this client is too fast). Rejections are immediate and carry a Retry-After, so
+a spike on heavy endpoints is shed in microseconds instead of queueing behind the workers that
+serve cheap reads. Budgets are per worker process.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from metrics import REGISTRY, Counter, Gauge
+
+admission_decisions = REGISTRY.register(Counter(
+    "admission_decisions_total", "Requests to guarded endpoints by outcome (admitted, overloaded, rate_limited)",
+    ("endpoint", "outcome")))
+admission_in_flight = REGISTRY.register(Gauge(
+    "admission_in_flight", "Admitted requests (and handed-off jobs) still holding a slot", ("endpoint",)))
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, message: str, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """0 if a token was taken, otherwise the seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class Ticket:
+    """An admitted request's slot; released when the request ends, or when a job it started ends"""
+
+    def __init__(self, control: "AdmissionControl"):
+        self.control = control
+        self.started = time.monotonic()
+        self.handed_off = False
+        self.released = False
+
+    def hand_off(self, task):
+        """Keep the slot until `task` finishes, for work that outlives the request"""
+        self.handed_off = True
+        task.add_done_callback(lambda _: self.release())
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.control._release(time.monotonic() - self.started)
+
+
+class AdmissionControl:
+    """max_concurrent <= 0 disables the concurrency budget, rate_per_minute <= 0 the rate limit"""
+
+    def __init__(self, name: str, max_concurrent: int = 0, rate_per_minute: float = 0, burst: Optional[int] = None,
+                 max_clients: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst if burst is not None else max(1, math.ceil(rate_per_minute / 2))
+        self.max_clients = max_clients
+        self.clock = clock
+        self.in_flight = 0
+        # Exponential moving average of how long a slot is held, for the 503 Retry-After
+        self.typical_seconds = 1.0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            bucket.updated = now
+            if len(self._buckets) > self.max_clients:
+                # A full bucket carries no state worth keeping, so forgetting the oldest is harmless
+                oldest, stale = next(iter(self._buckets.items()))
+                if stale.full(now) or len(self._buckets) > 2 * self.max_clients:
+                    del self._buckets[oldest]
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    def admit(self, client: str) -> Ticket:
+        if self.max_concurrent > 0 and self.in_flight >= self.max_concurrent:
+            admission_decisions.inc(endpoint=self.name, outcome="overloaded")
+            raise Rejected(503, f"Too many {self.name} requests in progress, try again later",
+                           max(1, math.ceil(self.typical_seconds)))
+        if self.rate > 0:
+            now = self.clock()
+            wait = self._bucket(client, now).take(now)
+            if wait > 0:
+                admission_decisions.inc(endpoint=self.name, outcome="rate_limited")
+                raise Rejected(429, f"Rate limit for {self.name} exceeded", max(1, math.ceil(wait)))
+        admission_decisions.inc(endpoint=self.name, outcome="admitted")
+        admission_in_flight.inc(endpoint=self.name)
+        self.in_flight += 1
+        return Ticket(self)
+
+    def _release(self, held_seconds: float):
+        self.in_flight -= 1
+        admission_in_flight.dec(endpoint=self.name)
+        self.typical_seconds = 0.8 * self.typical_seconds + 0.2 * held_seconds
+
+    def status(self):
+        return {
+            "endpoint": self.name,
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "rate_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "tracked_clients": len(self._buckets),
+        }
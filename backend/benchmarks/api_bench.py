@@ -0,0 +1,390 @@
+"""In-process API benchmark: latency percentiles, throughput and Mongo operations per request.
+
+Runs the FastAPI app through httpx's ASGI transport against either an in-memory mock-Motor
+database (mongomock-motor) or a real local Mongo, with LlmChat replaced by a stub (so the
+emergentintegrations package is not needed).
+
+    python benchmarks/api_bench.py --backend mock --dataset small --concurrency 32 --requests 500
+    python benchmarks/api_bench.py --backend mongo --routes timetable_batch,faculty_list
+    python benchmarks/api_bench.py --compare benchmarks/results/<old>.json --threshold 0.2
+
+Results are written to benchmarks/results/<timestamp>-<commit>-api.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(BACKEND_DIR))
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+SLOTS = ["09:00-10:00", "10:00-11:00", "11:00-12:00", "13:00-14:00", "14:00-15:00", "15:00-16:00", "16:00-17:00"]
+
+
+class StubLlmChat:
+    """Drop-in for emergentintegrations' LlmChat with a fixed, configurable latency"""
+
+    latency = 0.0
+
+    def __init__(self, api_key=None, session_id="", system_message=None):
+        self.session_id = session_id or ""
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.latency)
+        text = getattr(message, "text", str(message))
+        if self.session_id.startswith("substitute-"):
+            match = re.search(r'"id": "([^"]+)"', text)
+            return json.dumps({"recommended_faculty_id": match.group(1) if match else "", "reason": "stub"})
+        if self.session_id.startswith("timetable-gen-"):
+            return json.dumps(stub_timetable(text))
+        return "{}"
+
+
+class StubUserMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+def stub_timetable(prompt: str) -> List[Dict[str, str]]:
+    """Round-robin entries for the batches in a generation prompt; conflicts are ignored"""
+    start = prompt.index("{")
+    data, _ = json.JSONDecoder().raw_decode(prompt, start)
+    entries = []
+    slots = [(d, s) for d in DAYS for s in SLOTS]
+    for batch in data["batches"]:
+        subjects = [s for s in data["subjects"] if s["department"] == batch["department"] and s["year"] == batch["year"]]
+        for i, subject in enumerate(subjects):
+            teachers = [f for f in data["faculty"] if subject["name"] in f["subjects"]] or data["faculty"]
+            day, slot = slots[i % len(slots)]
+            entries.append({
+                "batch_id": batch["id"],
+                "subject_id": subject["id"],
+                "faculty_id": teachers[i % len(teachers)]["id"],
+                "classroom_id": data["classrooms"][i % len(data["classrooms"])]["id"],
+                "day": day,
+                "time_slot": slot,
+            })
+    return entries
+
+
+class OpCounter:
+    def __init__(self):
+        self.count = 0
+
+
+class CountingCollection:
+    """Counts every collection method call on a mock database (one call == one round trip)"""
+
+    def __init__(self, collection, counter: OpCounter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter.count += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+DATABASE_ATTRIBUTES = {"name", "client", "command", "list_collection_names", "drop_collection", "create_collection"}
+
+
+class CountingDatabase:
+    def __init__(self, database, counter: OpCounter):
+        self._database = database
+        self._counter = counter
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = CountingCollection(self._database[name], self._counter)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in DATABASE_ATTRIBUTES:
+            return getattr(self._database, name)
+        return self[name]
+
+
+def make_database(backend: str, db_name: str):
+    """Return (database, op counter, cleanup coroutine factory)"""
+    counter = OpCounter()
+    if backend == "mock":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--backend mock needs `pip install mongomock-motor`")
+        return CountingDatabase(AsyncMongoMockClient()[db_name], counter), counter, None
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import monitoring
+
+    class Listener(monitoring.CommandListener):
+        def started(self, event):
+            if event.command_name not in ("endSessions", "hello", "isMaster", "ping"):
+                counter.count += 1
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"], event_listeners=[Listener()])
+
+    async def cleanup():
+        await client.drop_database(db_name)
+        client.close()
+    return client[db_name], counter, cleanup
+
+
+async def seed(db, preset: str, seed_value: int) -> Dict[str, List[Dict[str, Any]]]:
+    from dataset_generator import DatasetSpec, generate_dataset, write_dataset
+
+    dataset = generate_dataset(DatasetSpec.from_preset(preset, seed=seed_value))
+    rng = random.Random(seed_value)
+    slots = [(d, s) for d in DAYS for s in SLOTS]
+    timetable = []
+    for batch in dataset["batches"]:
+        subjects = [s for s in dataset["subjects"] if s["department"] == batch["department"] and s["year"] == batch["year"]]
+        teachers = [f for f in dataset["faculty"] if f["department"] == batch["department"]]
+        for subject in subjects:
+            for _ in range(subject["hours_per_week"]):
+                day, slot = rng.choice(slots)
+                timetable.append({
+                    "id": f"tt-{len(timetable)}",
+                    "batch_id": batch["id"],
+                    "subject_id": subject["id"],
+                    "faculty_id": rng.choice(teachers)["id"],
+                    "classroom_id": rng.choice(dataset["classrooms"])["id"],
+                    "day": day,
+                    "time_slot": slot,
+                })
+    dataset["timetable"] = timetable
+    dataset["announcements"] = [
+        {"id": f"ann-{i}", "title": f"Notice {i}", "message": "Benchmark announcement", "author": "Admin",
+         "timestamp": f"2026-01-{(i % 28) + 1:02d}T09:00:00+00:00", "target_roles": ["student", "lecturer"]}
+        for i in range(200)
+    ]
+    dataset["absences"] = [
+        {"id": f"abs-{i}", "lecturer_id": entry["faculty_id"], "date": entry["day"].title(),
+         "time_slot": entry["time_slot"], "reason": "benchmark", "status": "pending",
+         "created_at": "2026-01-01T00:00:00+00:00"}
+        for i, entry in enumerate(rng.sample(timetable, min(200, len(timetable))))
+    ]
+    await write_dataset(db, dataset)
+    return dataset
+
+
+def build_scenarios(dataset) -> Dict[str, Callable[[random.Random], Dict[str, Any]]]:
+    batches = [b["id"] for b in dataset["batches"]]
+    faculty = [f["id"] for f in dataset["faculty"]]
+    absences = [a["id"] for a in dataset["absences"]]
+
+    def new_faculty(rng):
+        n = rng.getrandbits(48)
+        return {"method": "POST", "url": "/api/faculty",
+                "json": {"name": f"Bench {n}", "email": f"bench{n}@university.edu", "department": "CSE", "subjects": ["Algorithms"]}}
+
+    return {
+        "login": lambda rng: {"method": "POST", "url": "/api/auth/login",
+                              "json": {"email": f"user{rng.randrange(500)}@university.edu", "role": "student"}},
+        "faculty_list": lambda rng: {"method": "GET", "url": "/api/faculty"},
+        "subjects_list": lambda rng: {"method": "GET", "url": "/api/subjects"},
+        "classrooms_list": lambda rng: {"method": "GET", "url": "/api/classrooms"},
+        "batches_list": lambda rng: {"method": "GET", "url": "/api/batches"},
+        "faculty_create": new_faculty,
+        "timetable_batch": lambda rng: {"method": "GET", "url": f"/api/timetable/{rng.choice(batches)}"},
+        "timetable_faculty": lambda rng: {"method": "GET", "url": f"/api/timetable/faculty/{rng.choice(faculty)}"},
+        "announcements": lambda rng: {"method": "GET", "url": "/api/announcements?role=student"},
+        "dashboard_stats": lambda rng: {"method": "GET", "url": "/api/dashboard/stats"},
+        "substitute": lambda rng: {"method": "POST", "url": f"/api/absences/{rng.choice(absences)}/substitute"},
+        "timetable_generate": lambda rng: {"method": "POST", "url": "/api/timetable/generate",
+                                           "json": {"batch_ids": rng.sample(batches, min(2, len(batches))), "constraints": {}}},
+    }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, make_request, counter: OpCounter, total: int, concurrency: int, warmup: int, seed_value: int):
+    rng = random.Random(seed_value)
+    for _ in range(warmup):
+        await client.request(**make_request(rng))
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+    ops_before = counter.count
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            request = make_request(rng)
+            started = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / max(len(latencies), 1) * 1000, 3),
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mongo_ops_per_request": round((counter.count - ops_before) / max(len(latencies), 1), 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Dict[str, Any], baseline_path: Path, threshold: float) -> List[str]:
+    """Return a message for every route whose p95 or ops/request regressed by more than threshold"""
+    baseline = json.loads(baseline_path.read_text())
+    regressions = []
+    for route, result in current["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        for metric in ("p95_ms", "mongo_ops_per_request"):
+            old, new = previous.get(metric, 0), result.get(metric, 0)
+            if old and new > old * (1 + threshold):
+                regressions.append(f"{route}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, Any]]):
+    header = f"{'route':<20}{'reqs':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}{'ops/req':>9}"
+    print(header)
+    print("-" * len(header))
+    for route, r in results.items():
+        print(f"{route:<20}{r['requests']:>7}{r['errors']:>5}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['rps']:>10}{r['mongo_ops_per_request']:>9}")
+
+
+async def run(args) -> Dict[str, Any]:
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "bench")
+    # The benchmark measures handlers under load, so load shedding would only hide them
+    for endpoint in ("GENERATE", "SUBSTITUTE", "SAMPLE_DATA"):
+        os.environ.setdefault(f"ADMISSION_{endpoint}_CONCURRENCY", "0")
+        os.environ.setdefault(f"ADMISSION_{endpoint}_RATE", "0")
+    import logging
+    import httpx
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    StubLlmChat.latency = args.llm_latency_ms / 1000
+    server.LlmChat, server.UserMessage = StubLlmChat, StubUserMessage
+
+    db_name = f"bench_{int(time.time())}"
+    db, counter, cleanup = make_database(args.backend, db_name)
+    server.db = db
+    server.batch_leases.collection = db.timetable_leases
+    server.session_store.collection = db.sessions
+    try:
+        # What the lifespan hook does on a real worker, minus the Mongo ping
+        await server.ensure_indexes()
+        dataset = await seed(db, args.dataset, args.seed)
+        await server.warm_caches()
+        scenarios = build_scenarios(dataset)
+        selected = args.routes.split(",") if args.routes else list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            sys.exit(f"Unknown routes: {', '.join(sorted(unknown))}; choose from {', '.join(scenarios)}")
+
+        results = {}
+        transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in selected:
+                # Expensive routes get a proportionally smaller request budget
+                total = max(args.concurrency, args.requests // 10) if name in ("timetable_generate", "substitute") else args.requests
+                results[name] = await run_scenario(client, scenarios[name], counter, total, args.concurrency, args.warmup, args.seed)
+    finally:
+        if cleanup:
+            await cleanup()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {
+            "backend": args.backend, "dataset": args.dataset, "seed": args.seed, "concurrency": args.concurrency,
+            "requests": args.requests, "llm_latency_ms": args.llm_latency_ms,
+        },
+        "dataset": {name: len(docs) for name, docs in dataset.items()},
+        "routes": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-process API benchmark")
+    parser.add_argument("--backend", choices=("mock", "mongo"), default="mock")
+    parser.add_argument("--dataset", default="small", help="dataset_generator preset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--routes", help="comma separated scenario names (default: all)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=300, help="requests per route")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>-<commit>-api.json)")
+    parser.add_argument("--compare", help="previous result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression for --compare")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print_table(report["routes"])
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}-api.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        regressions = compare(report, Path(args.compare), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Timetable generation benchmark over a fixed corpus of instances.
+
+For every instance it records wall time, peak Python memory (tracemalloc), hard-constraint
+violations and the soft cost against the default `TimetableConstraints`, scored by the NumPy
+`fitness.FitnessModel` (or by `scheduling.evaluate_timetable` with --scorer python; both give
+the same numbers) along with the scoring time.
+
+    python benchmarks/solver_bench.py                            # greedy engine, xs..l
+    python benchmarks/solver_bench.py --instances xs,s,m,l,xl
+    python benchmarks/solver_bench.py --engine mymodule:schedule --compare benchmarks/results/<old>.json
+
+An engine is any callable `engine(data, constraints) -> list of entry dicts` (sync or async),
+where `data` has the same shape as the payload `generate_timetable` sends to the LLM.
+"""
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from api_bench import RESULTS_DIR, git_commit
+
+# name -> (dataset_generator preset, seed, overrides). Never change an existing entry: results
+# are only comparable across commits while the instances stay byte-identical.
+CORPUS: Dict[str, Any] = {
+    "xs": ("toy", 101, {}),
+    "s": ("small", 102, {}),
+    "m": ("medium", 103, {}),
+    "m-tight": ("medium", 104, {"target_room_utilisation": 0.9, "faculty_per_department": 10}),
+    "l": ("large", 105, {}),
+    "xl": ("university", 106, {}),
+}
+DEFAULT_INSTANCES = "xs,s,m,m-tight,l"
+# Timing differences below this are treated as noise by --compare
+MIN_WALL_DELTA_S = 0.05
+
+ENGINES = {
+    "greedy": "scheduling:greedy_schedule",
+}
+
+
+def load_engine(spec: str) -> Callable:
+    module_name, _, attr = ENGINES.get(spec, spec).partition(":")
+    if not attr:
+        sys.exit("--engine must be a registered name or 'module:function'")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def load_instance(name: str) -> Dict[str, List[Dict[str, Any]]]:
+    from dataset_generator import DatasetSpec, generate_dataset
+
+    preset, seed, overrides = CORPUS[name]
+    return generate_dataset(DatasetSpec.from_preset(preset, seed=seed, **overrides))
+
+
+def run_engine(engine: Callable, data, constraints):
+    result = engine(data, constraints)
+    if inspect.isawaitable(result):
+        result = asyncio.run(result)
+    return result
+
+
+def score(scorer: str, entries, data, constraints) -> Dict[str, Any]:
+    if scorer == "python":
+        from scheduling import evaluate_timetable
+
+        return evaluate_timetable(entries, data, constraints)
+    from fitness import FitnessModel
+
+    return FitnessModel(data, constraints).score(entries)
+
+
+def bench_instance(engine: Callable, name: str, constraints, repeat: int, scorer: str = "numpy") -> Dict[str, Any]:
+    data = load_instance(name)
+    timings = []
+    entries: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        entries = run_engine(engine, data, constraints)
+        timings.append(time.perf_counter() - started)
+
+    # Memory is traced in a separate run because tracemalloc slows allocation-heavy code
+    tracemalloc.start()
+    run_engine(engine, data, constraints)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    quality = score(scorer, entries, data, constraints)
+    score_s = time.perf_counter() - started
+    return {
+        "size": {k: len(v) for k, v in data.items()},
+        "required_hours": sum(
+            s["hours_per_week"] for b in data["batches"] for s in data["subjects"]
+            if (s["department"], s["year"], s["semester"]) == (b["department"], b["year"], b["semester"])
+        ),
+        "wall_s": round(min(timings), 4),
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "score_s": round(score_s, 4),
+        **quality,
+    }
+
+
+def compare(current: Dict[str, Any], baseline_path: Path, threshold: float) -> List[str]:
+    baseline = json.loads(baseline_path.read_text())
+    regressions = []
+    for name, result in current["instances"].items():
+        previous = baseline.get("instances", {}).get(name)
+        if not previous:
+            continue
+        if result["hard_total"] > previous["hard_total"]:
+            regressions.append(f"{name}: hard violations {previous['hard_total']} -> {result['hard_total']}")
+        for metric in ("wall_s", "peak_mb", "soft_cost"):
+            old, new = previous[metric], result[metric]
+            if metric == "wall_s" and new - old < MIN_WALL_DELTA_S:
+                continue
+            if old and new > old * (1 + threshold):
+                regressions.append(f"{name}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timetable generation benchmark")
+    parser.add_argument("--engine", default="greedy", help=f"one of {', '.join(ENGINES)} or module:function")
+    parser.add_argument("--instances", default=DEFAULT_INSTANCES, help=f"comma separated, from {', '.join(CORPUS)}")
+    parser.add_argument("--constraints", default="{}", help="JSON overrides for TimetableConstraints")
+    parser.add_argument("--scorer", choices=("numpy", "python"), default="numpy", help="quality scoring implementation")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per instance; the fastest is reported")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>-<commit>-solver.json)")
+    parser.add_argument("--compare", help="previous result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "bench")
+    from server import TimetableConstraints
+
+    constraints = TimetableConstraints(**json.loads(args.constraints))
+    engine = load_engine(args.engine)
+    names = args.instances.split(",")
+    unknown = set(names) - set(CORPUS)
+    if unknown:
+        sys.exit(f"Unknown instances: {', '.join(sorted(unknown))}")
+
+    results = {}
+    header = f"{'instance':<10}{'batches':>8}{'hours':>8}{'entries':>9}{'wall s':>9}{'peak MB':>9}{'hard':>7}{'soft':>11}"
+    print(header)
+    print("-" * len(header))
+    for name in names:
+        r = results[name] = bench_instance(engine, name, constraints, args.repeat, args.scorer)
+        print(f"{name:<10}{r['size']['batches']:>8}{r['required_hours']:>8}{r['entries']:>9}{r['wall_s']:>9}"
+              f"{r['peak_mb']:>9}{r['hard_total']:>7}{r['soft_cost']:>11}")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "engine": args.engine,
+        "scorer": args.scorer,
+        "constraints": constraints.dict(),
+        "instances": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}-solver.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        regressions = compare(report, Path(args.compare), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Streaming CSV / JSON imports with chunked validation and unordered bulk writes."""
+import asyncio
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+LIST_SEPARATORS = (";", "|")
+
+
+class ImportFormatError(ValueError):
+    """The upload cannot be parsed any further (malformed JSON, missing CSV header...)"""
+
+
+async def decode_stream(byte_chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    async for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_csv_records(text_chunks: AsyncIterator[str]) -> AsyncIterator[Dict[str, str]]:
+    """Yield one dict per CSV record without holding the whole file in memory.
+
+    Lines are buffered until their quotes balance so quoted newlines survive chunk boundaries.
+    """
+    header = None
+    pending = ""
+    buffer = ""
+
+    def parse(record):
+        return next(csv.reader([record]))
+
+    async def complete_lines():
+        nonlocal buffer
+        async for text in text_chunks:
+            buffer += text
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                yield line + "\n"
+        if buffer:
+            yield buffer
+
+    async for line in complete_lines():
+        pending += line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending.rstrip("\r\n"), ""
+        if not record.strip():
+            continue
+        values = parse(record)
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        yield {k: v.strip() for k, v in zip(header, values) if k and v.strip() != ""}
+
+    if pending.strip():
+        raise ImportFormatError("Unterminated quoted field at end of CSV upload")
+    if header is None:
+        raise ImportFormatError("CSV upload has no header row")
+
+
+async def iter_json_records(text_chunks: AsyncIterator[str]) -> AsyncIterator[Any]:
+    """Yield the elements of a top-level JSON array (or newline-delimited objects) incrementally"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    array = False
+    finished = False
+    exhausted = False
+    # Inside an array: a value was read and no comma has followed it yet / a comma awaits its value
+    after_value = False
+    after_comma = False
+    chunks = text_chunks.__aiter__()
+
+    async def fill():
+        nonlocal buffer, pos, exhausted
+        try:
+            buffer = buffer[pos:] + await chunks.__anext__()
+            pos = 0
+        except StopAsyncIteration:
+            exhausted = True
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos >= len(buffer):
+            if exhausted:
+                break
+            await fill()
+            continue
+
+        char = buffer[pos]
+        if finished:
+            raise ImportFormatError("Unexpected data after the end of the JSON array")
+        if not started:
+            started = True
+            array = char == "["
+            if array:
+                pos += 1
+            continue
+        if array and char == "]":
+            if after_comma:
+                raise ImportFormatError("Trailing comma at the end of the JSON array")
+            finished = True
+            pos += 1
+            continue
+        if array and char == ",":
+            if not after_value:
+                raise ImportFormatError("Unexpected ',' in the JSON array")
+            after_value, after_comma = False, True
+            pos += 1
+            continue
+        if after_value:
+            raise ImportFormatError("Expected ',' or ']' between JSON array elements")
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if exhausted:
+                raise ImportFormatError(f"Malformed JSON near character {e.pos}: {e.msg}")
+            await fill()
+            continue
+        if end == len(buffer) and not exhausted and not isinstance(value, (dict, list)):
+            # A bare scalar at the end of the buffer may still be growing
+            await fill()
+            continue
+        pos = end
+        after_value, after_comma = array, False
+        yield value
+
+    if array and not finished:
+        raise ImportFormatError("JSON array is not terminated")
+
+
+def normalise_row(row: Any, list_fields: Tuple[str, ...]) -> Any:
+    """Split CSV list cells ("Algorithms; Data Structures") into lists"""
+    if not isinstance(row, dict):
+        return row
+    row = dict(row)
+    for field in list_fields:
+        value = row.get(field)
+        if isinstance(value, str):
+            separator = next((s for s in LIST_SEPARATORS if s in value), None)
+            parts = value.split(separator) if separator else [value]
+            row[field] = [p.strip() for p in parts if p.strip()]
+    return row
+
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+class ImportReport:
+    def __init__(self, collection_name: str, mode: str):
+        self.collection = collection_name
+        self.mode = mode
+        self.received = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.fatal: Optional[str] = None
+
+    def add_error(self, row: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "success": self.fatal is None,
+            "collection": self.collection,
+            "mode": self.mode,
+            "received": self.received,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            **({"message": self.fatal} if self.fatal else {}),
+        }
+
+
+async def write_chunk(collection, documents: List[Tuple[int, Dict[str, Any]]], key: str, mode: str, report: ImportReport):
+    if not documents:
+        return
+    if mode == "insert":
+        operations = [InsertOne(doc) for _, doc in documents]
+    else:
+        operations = []
+        for _, doc in documents:
+            on_insert = {"id": doc.pop("id"), "created_at": doc.pop("created_at")}
+            operations.append(UpdateOne({key: doc[key]}, {"$set": doc, "$setOnInsert": on_insert}, upsert=True))
+
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for write_error in details.get("writeErrors", []):
+            report.add_error(documents[write_error["index"]][0], write_error.get("errmsg", "write failed"))
+
+    report.inserted += details.get("nInserted", 0) + details.get("nUpserted", 0)
+    report.updated += details.get("nMatched", 0)
+
+
+async def import_records(collection, records: AsyncIterator[Any], create_model, model, key: str,
+                         list_fields: Tuple[str, ...] = (), mode: str = "upsert",
+                         chunk_size: int = CHUNK_SIZE) -> ImportReport:
+    """Validate records in chunks and write each chunk with one unordered bulk_write.
+
+    Parsing and validation of the next chunk overlap with the write of the previous one.
+    """
+    report = ImportReport(collection.name, mode)
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    pending_write: Optional[asyncio.Task] = None
+
+    async def flush():
+        nonlocal chunk, pending_write
+        if pending_write:
+            await pending_write
+        pending_write = asyncio.create_task(write_chunk(collection, chunk, key, mode, report))
+        chunk = []
+
+    try:
+        async for record in records:
+            report.received += 1
+            row_number = report.received
+            try:
+                data = create_model(**normalise_row(record, list_fields))
+            except ValidationError as e:
+                report.add_error(row_number, format_validation_error(e))
+                continue
+            except TypeError:
+                report.add_error(row_number, "row must be an object")
+                continue
+            chunk.append((row_number, model(**data.dict()).dict()))
+            if len(chunk) >= chunk_size:
+                await flush()
+    except (ImportFormatError, csv.Error, UnicodeDecodeError) as e:
+        report.fatal = f"Import stopped after {report.received} rows: {e}"
+
+    await flush()
+    await pending_write
+    return report
@@ -0,0 +1,60 @@
+"""Single-flight request coalescing with a short micro-cache for hot read endpoints.
+
+Concurrent calls for the same key share one in-flight computation; its result is then served
+from memory for `ttl_seconds`. Writers call `invalidate` for the keys they change, which also
+stops a computation that started before the write from caching its (stale) result.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from metrics import REGISTRY, Counter
+
+singleflight_requests = REGISTRY.register(Counter(
+    "singleflight_requests_total", "Coalesced reads by outcome (hit, joined, computed)", ("cache", "outcome")))
+
+
+class SingleFlight:
+    def __init__(self, name: str, ttl_seconds: float = 1.0, max_entries: int = 10000):
+        self.name = name
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires at, value)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generations: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            singleflight_requests.inc(cache=self.name, outcome="hit")
+            return cached[1]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            singleflight_requests.inc(cache=self.name, outcome="joined")
+        else:
+            singleflight_requests.inc(cache=self.name, outcome="computed")
+            # A separate task, so a client disconnecting does not cancel everyone's computation
+            future = asyncio.ensure_future(compute())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f, g=self._generations.get(key, 0): self._finish(key, f, g))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: asyncio.Future, generation: int):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        if self.ttl > 0 and self._generations.get(key, 0) == generation:
+            self._cache[key] = (time.monotonic() + self.ttl, future.result())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._cache.pop(key, None)
+        if key in self._inflight:
+            # Later callers start a fresh computation instead of joining one that may be stale
+            del self._inflight[key]
+            self._generations[key] = self._generations.get(key, 0) + 1
@@ -0,0 +1,329 @@
+"""Seeded synthetic university datasets, from toy size up to large-university scale.
+
+Usage:
+    python dataset_generator.py --preset large --seed 7 --export ./data --format csv
+    python dataset_generator.py --preset medium --write        # bulk insert into MONGO_URL/DB_NAME
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import uuid
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+COLLECTIONS = ("faculty", "subjects", "classrooms", "batches")
+ROOM_TYPES = ("lecture_hall", "lab", "seminar_room")
+# Room capacities as multiples of the typical batch size
+ROOM_CAPACITY_FACTORS = {
+    "lecture_hall": (1.2, 1.4, 1.7, 2.0),
+    "lab": (1.2, 1.3, 1.4),
+    "seminar_room": (0.5, 0.6, 1.2),
+}
+ROOM_PREFIXES = {"lecture_hall": "LH", "lab": "LAB", "seminar_room": "SR"}
+ROOM_EQUIPMENT = {
+    "lecture_hall": ["Projector", "Audio System", "Smart Board", "AC", "Mic System"],
+    "lab": ["Computers", "Network", "Software", "Oscilloscope", "Electronics Equipment"],
+    "seminar_room": ["Video Conferencing", "Whiteboard", "Projector"],
+}
+
+DEPARTMENT_CODES = ["CSE", "ISE", "ECE", "ME", "CE", "EEE", "CHE", "AE", "BT", "IEM", "MT", "TE"]
+TOPICS = [
+    "Mathematics", "Physics", "Chemistry", "Programming", "Data Structures", "Algorithms",
+    "Database Systems", "Operating Systems", "Computer Networks", "Signals", "Control Systems",
+    "Thermodynamics", "Fluid Mechanics", "Structural Analysis", "Materials", "Electronics",
+    "Machine Design", "Statistics", "Optimization", "Machine Learning", "Embedded Systems",
+    "Power Systems", "Communication", "Management", "Software Engineering", "Graphics",
+]
+LEVELS = ["Fundamentals of", "Applied", "Advanced", "Principles of", "Topics in", "Modern"]
+FIRST_NAMES = [
+    "Rajesh", "Priya", "Arun", "Meera", "Suresh", "Lakshmi", "Anita", "Vikram", "Kavya", "Rahul",
+    "Deepa", "Sanjay", "Nisha", "Kiran", "Farah", "Joseph", "Maria", "Ahmed", "Li", "Elena",
+]
+LAST_NAMES = [
+    "Kumar", "Sharma", "Patel", "Singh", "Reddy", "Devi", "Iyer", "Nair", "Rao", "Gupta",
+    "Menon", "Das", "Khan", "Fernandes", "Chen", "Joshi", "Bose", "Mehta", "Pillai", "Varma",
+]
+TITLES = ["Dr.", "Prof."]
+BASE_TIMESTAMP = datetime(2026, 1, 1, tzinfo=timezone.utc)
+# Inclusive bounds for the integer spec fields. Subject names are "<level> <topic>" and must be
+# unique per department, so a topic can recur in at most len(LEVELS) years.
+SPEC_LIMITS = {
+    "departments": (1, 500),
+    "years": (1, len(LEVELS)),
+    "batches_per_year": (1, 50),
+    "students_per_batch": (1, 1000),
+    "faculty_per_department": (1, 1000),
+    "subjects_per_semester": (1, len(TOPICS)),
+    "subjects_per_faculty": (1, len(TOPICS) * len(LEVELS)),
+    "rooms": (1, 100000),
+    "slots_per_week": (1, 168),
+}
+
+
+@dataclass
+class DatasetSpec:
+    departments: int = 5
+    years: int = 4
+    batches_per_year: int = 2
+    students_per_batch: int = 60
+    faculty_per_department: int = 6
+    subjects_per_semester: int = 5
+    lab_ratio: float = 0.2
+    subjects_per_faculty: int = 3
+    term: str = "odd"  # odd -> semesters 1,3,5,7 are running; even -> 2,4,6,8
+    rooms: Optional[int] = None  # None sizes the room pool from the weekly teaching load
+    room_mix: Dict[str, float] = field(default_factory=lambda: {"lecture_hall": 0.6, "lab": 0.3, "seminar_room": 0.1})
+    slots_per_week: int = 35
+    target_room_utilisation: float = 0.7
+    seed: int = 0
+
+    def __post_init__(self):
+        for name, (low, high) in SPEC_LIMITS.items():
+            value = getattr(self, name)
+            if value is None and name == "rooms":
+                continue
+            if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+                raise ValueError(f"{name} must be an integer from {low} to {high}, got {value!r}")
+        for name, low, high in (("lab_ratio", 0.0, 1.0), ("target_room_utilisation", 0.01, 1.0)):
+            value = getattr(self, name)
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not low <= value <= high:
+                raise ValueError(f"{name} must be a number from {low} to {high}, got {value!r}")
+        if self.term not in ("odd", "even"):
+            raise ValueError(f"term must be 'odd' or 'even', got {self.term!r}")
+        if not isinstance(self.room_mix, dict) or not all(
+                isinstance(share, (int, float)) and not isinstance(share, bool) and share >= 0
+                for share in self.room_mix.values()):
+            raise ValueError("room_mix must map room types to non-negative shares")
+        if not isinstance(self.seed, int):
+            raise ValueError(f"seed must be an integer, got {self.seed!r}")
+
+    @classmethod
+    def from_preset(cls, preset: str = "small", **overrides) -> "DatasetSpec":
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown preset {preset!r}; choose from {', '.join(PRESETS)}")
+        known = {f.name for f in fields(cls)}
+        unknown = set(overrides) - known
+        if unknown:
+            raise ValueError(f"Unknown dataset parameters: {', '.join(sorted(unknown))}")
+        return cls(**{**PRESETS[preset], **overrides})
+
+
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "toy": {"departments": 1, "years": 1, "batches_per_year": 1, "faculty_per_department": 3, "subjects_per_semester": 3},
+    "small": {"departments": 5, "years": 4, "batches_per_year": 2, "faculty_per_department": 6},
+    "medium": {"departments": 10, "years": 4, "batches_per_year": 3, "faculty_per_department": 15, "subjects_per_semester": 6},
+    "large": {"departments": 25, "years": 4, "batches_per_year": 4, "faculty_per_department": 30, "subjects_per_semester": 6},
+    "university": {"departments": 60, "years": 4, "batches_per_year": 6, "faculty_per_department": 45, "subjects_per_semester": 7},
+}
+
+
+class _Ids:
+    """Deterministic UUIDs and timestamps so the same seed always yields byte-identical data"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.count = 0
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def timestamp(self) -> datetime:
+        self.count += 1
+        return BASE_TIMESTAMP + timedelta(milliseconds=self.count)
+
+
+def department_codes(count: int) -> List[str]:
+    codes = DEPARTMENT_CODES[:count]
+    codes += [f"D{i:02d}" for i in range(len(codes) + 1, count + 1)]
+    return codes
+
+
+def generate_dataset(spec: DatasetSpec) -> Dict[str, List[Dict[str, Any]]]:
+    rng = random.Random(spec.seed)
+    ids = _Ids(rng)
+    dataset: Dict[str, List[Dict[str, Any]]] = {name: [] for name in COLLECTIONS}
+    weekly_hours = 0
+
+    for dept in department_codes(spec.departments):
+        dept_subjects = []
+        # Qualifications match subjects by name, so a department never repeats one
+        used_names = set()
+        for year in range(1, spec.years + 1):
+            semester = 2 * year - 1 if spec.term == "odd" else 2 * year
+            topics = rng.sample(TOPICS, spec.subjects_per_semester)
+            for index, topic in enumerate(topics, start=1):
+                is_lab = rng.random() < spec.lab_ratio
+                level = LEVELS.index(rng.choice(LEVELS))
+                # On a repeat, step to the next free level without another draw, so datasets that
+                # had no repeats stay byte-identical for the benchmark corpus
+                names = [f"{LEVELS[(level + step) % len(LEVELS)]} {topic}" for step in range(len(LEVELS))]
+                base = next(name for name in names if name not in used_names)
+                used_names.add(base)
+                name = base + (" Lab" if is_lab else "")
+                subject = {
+                    "id": ids.uuid(),
+                    "name": name,
+                    "code": f"{dept}{year}{semester}{index:02d}",
+                    "department": dept,
+                    "year": year,
+                    "semester": semester,
+                    "type": "lab" if is_lab else "theory",
+                    "hours_per_week": 2 if is_lab else rng.choice((3, 4)),
+                    "created_at": ids.timestamp(),
+                }
+                dept_subjects.append(subject)
+
+            for section in range(spec.batches_per_year):
+                section_name = chr(ord("A") + section) if section < 26 else f"S{section + 1}"
+                dataset["batches"].append({
+                    "id": ids.uuid(),
+                    "name": f"{dept}-{year}{section_name}",
+                    "department": dept,
+                    "year": year,
+                    "semester": semester,
+                    "student_count": max(10, int(rng.gauss(spec.students_per_batch, spec.students_per_batch * 0.1))),
+                    "created_at": ids.timestamp(),
+                })
+                weekly_hours += sum(
+                    s["hours_per_week"] for s in dept_subjects if s["year"] == year
+                )
+
+        dataset["subjects"].extend(dept_subjects)
+
+        # Every subject gets at least one qualified lecturer, then loads are topped up at random
+        teaching: List[List[str]] = [[] for _ in range(spec.faculty_per_department)]
+        for i, subject in enumerate(dept_subjects):
+            teaching[i % len(teaching)].append(subject["name"])
+        for subjects in teaching:
+            extra = [s["name"] for s in dept_subjects if s["name"] not in subjects]
+            while len(subjects) < spec.subjects_per_faculty and extra:
+                subjects.append(extra.pop(rng.randrange(len(extra))))
+
+        for subjects in teaching:
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            number = len(dataset["faculty"]) + 1
+            dataset["faculty"].append({
+                "id": ids.uuid(),
+                "name": f"{rng.choice(TITLES)} {first} {last}",
+                "email": f"{first.lower()}.{last.lower()}{number}@university.edu",
+                "department": dept,
+                "subjects": subjects,
+                "created_at": ids.timestamp(),
+            })
+
+    room_count = spec.rooms
+    if room_count is None:
+        room_count = max(len(ROOM_TYPES), round(weekly_hours / (spec.slots_per_week * spec.target_room_utilisation)))
+    mix_total = sum(spec.room_mix.values()) or 1
+    numbers = {room_type: 0 for room_type in ROOM_TYPES}
+    for room_type, share in spec.room_mix.items():
+        for _ in range(max(1, round(room_count * share / mix_total))):
+            numbers[room_type] += 1
+            floor = {"lecture_hall": 1, "lab": 2, "seminar_room": 3}.get(room_type, 4)
+            dataset["classrooms"].append({
+                "id": ids.uuid(),
+                "name": f"{ROOM_PREFIXES.get(room_type, 'RM')}-{floor}{numbers[room_type]:02d}",
+                "capacity": int(spec.students_per_batch * rng.choice(ROOM_CAPACITY_FACTORS.get(room_type, (1.0,)))),
+                "type": room_type,
+                "equipment": rng.sample(ROOM_EQUIPMENT.get(room_type, []), min(2, len(ROOM_EQUIPMENT.get(room_type, [])))),
+                "created_at": ids.timestamp(),
+            })
+
+    return dataset
+
+
+def dataset_summary(dataset: Dict[str, List[Dict[str, Any]]]) -> Dict[str, int]:
+    return {name: len(documents) for name, documents in dataset.items()}
+
+
+async def write_dataset(db, dataset: Dict[str, List[Dict[str, Any]]], clear: bool = True, chunk_size: int = 5000):
+    """Bulk insert every collection concurrently (unordered insert_many in chunks)"""
+
+    async def write(name: str, documents: List[Dict[str, Any]]):
+        collection = db[name]
+        if clear:
+            await collection.delete_many({})
+        for start in range(0, len(documents), chunk_size):
+            # insert_many mutates its input with _id, so hand it copies
+            await collection.insert_many([dict(d) for d in documents[start:start + chunk_size]], ordered=False)
+
+    await asyncio.gather(*(write(name, documents) for name, documents in dataset.items()))
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return "; ".join(str(v) for v in value)
+    return value
+
+
+def export_dataset(dataset: Dict[str, List[Dict[str, Any]]], directory, fmt: str = "json") -> List[Path]:
+    """Write one file per collection in the format accepted by POST /api/import/{resource}"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, documents in dataset.items():
+        path = directory / f"{name}.{fmt}"
+        if fmt == "json":
+            with path.open("w", encoding="utf-8") as fh:
+                json.dump(documents, fh, default=str)
+        elif fmt == "csv":
+            columns = list(documents[0]) if documents else []
+            with path.open("w", encoding="utf-8", newline="") as fh:
+                writer = csv.DictWriter(fh, fieldnames=columns)
+                writer.writeheader()
+                for document in documents:
+                    writer.writerow({k: _export_value(v) for k, v in document.items()})
+        else:
+            raise ValueError("fmt must be 'json' or 'csv'")
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", default="small", choices=list(PRESETS))
+    parser.add_argument("--seed", type=int, default=0)
+    for spec_field in fields(DatasetSpec):
+        if spec_field.name in ("seed", "room_mix"):
+            continue
+        kind = spec_field.type if spec_field.type in (int, float, str) else int
+        parser.add_argument(f"--{spec_field.name.replace('_', '-')}", dest=spec_field.name, type=kind, default=None)
+    parser.add_argument("--room-mix", help='JSON object, e.g. {"lecture_hall": 0.5, "lab": 0.5}')
+    parser.add_argument("--export", help="directory to write one file per collection")
+    parser.add_argument("--format", default="json", choices=("json", "csv"))
+    parser.add_argument("--write", action="store_true", help="bulk insert into MONGO_URL / DB_NAME")
+    args = parser.parse_args(argv)
+
+    overrides = {f.name: getattr(args, f.name) for f in fields(DatasetSpec)
+                 if f.name not in ("seed", "room_mix") and getattr(args, f.name) is not None}
+    if args.room_mix:
+        overrides["room_mix"] = json.loads(args.room_mix)
+    try:
+        spec = DatasetSpec.from_preset(args.preset, seed=args.seed, **overrides)
+    except ValueError as e:
+        parser.error(str(e))
+    dataset = generate_dataset(spec)
+    print(json.dumps({"spec": asdict(spec), "counts": dataset_summary(dataset)}, indent=2))
+
+    if args.export:
+        for path in export_dataset(dataset, args.export, args.format):
+            print(f"wrote {path}")
+    if args.write:
+        from dotenv import load_dotenv
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        load_dotenv(Path(__file__).parent / ".env")
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        asyncio.run(write_dataset(client[os.environ["DB_NAME"]], dataset))
+        print(f"inserted into {os.environ['DB_NAME']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Exam timetabling by graph colouring.
+
+Subjects are vertices, and two subjects conflict when some batch sits both exams. A batch takes
+every subject of its department, year and semester, plus any extra enrollments (electives,
+repeated subjects) the caller passes. DSatur colours the conflict graph so that no batch has
+two exams in one period, and the exams of each period are then seated in rooms by capacity.
+
+Colours map to periods round-robin over the days (colour 0 on day 1, colour 1 on day 2, ...),
+so a batch's few exams land on different days before any day gets a second session. Like
+scheduling.py, everything works on plain dicts and needs no database.
+"""
+import bisect
+import heapq
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from scheduling import batch_subjects
+
+
+def build_enrollments(subjects: List[Dict[str, Any]], batches: List[Dict[str, Any]],
+                      extra: Optional[Dict[str, Iterable[str]]] = None) -> Dict[str, Set[str]]:
+    """subject id -> ids of the batches sitting its exam"""
+    known = {s["id"] for s in subjects}
+    takers: Dict[str, Set[str]] = defaultdict(set)
+    for batch in batches:
+        for subject in batch_subjects(batch, subjects):
+            takers[subject["id"]].add(batch["id"])
+    batch_ids = {b["id"] for b in batches}
+    for batch_id, subject_ids in (extra or {}).items():
+        if batch_id in batch_ids:
+            for subject_id in subject_ids:
+                if subject_id in known:
+                    takers[subject_id].add(batch_id)
+    return dict(takers)
+
+
+def conflict_graph(enrollments: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    """Adjacency sets; built per batch, so the cost follows the enrollments, not subjects squared"""
+    by_batch: Dict[str, List[str]] = defaultdict(list)
+    for subject_id, batch_ids in enrollments.items():
+        for batch_id in batch_ids:
+            by_batch[batch_id].append(subject_id)
+    graph: Dict[str, Set[str]] = {subject_id: set() for subject_id in enrollments}
+    for subject_ids in by_batch.values():
+        for subject_id in subject_ids:
+            graph[subject_id].update(subject_ids)
+    for subject_id, neighbours in graph.items():
+        neighbours.discard(subject_id)
+    return graph
+
+
+def dsatur(graph: Dict[str, Set[str]]) -> Dict[str, int]:
+    """DSatur colouring: repeatedly colour the vertex with the most distinctly coloured
+    neighbours (ties: most uncoloured neighbours, then id) with the smallest free colour.
+
+    A heap with lazily discarded entries keeps this at O((V + E) log V).
+    """
+    saturation: Dict[str, Set[int]] = {v: set() for v in graph}
+    degree = {v: len(neighbours) for v, neighbours in graph.items()}
+    heap = [(0, -degree[v], v) for v in graph]
+    heapq.heapify(heap)
+    colours: Dict[str, int] = {}
+    while heap:
+        negative_saturation, negative_degree, vertex = heapq.heappop(heap)
+        if vertex in colours or -negative_saturation != len(saturation[vertex]) or -negative_degree != degree[vertex]:
+            continue  # stale entry; the vertex was re-pushed with its current priority
+        used = saturation[vertex]
+        colour = 0
+        while colour in used:
+            colour += 1
+        colours[vertex] = colour
+        for neighbour in graph[vertex]:
+            if neighbour in colours:
+                continue
+            saturation[neighbour].add(colour)
+            degree[neighbour] -= 1
+            heapq.heappush(heap, (-len(saturation[neighbour]), -degree[neighbour], neighbour))
+    return colours
+
+
+def assign_rooms(seats: int, free: List[Tuple[int, str]]) -> Optional[List[Dict[str, Any]]]:
+    """Seats for one exam in a period (rooms are shared between exams, as in an exam hall):
+    the tightest room that fits, otherwise the emptiest rooms until the students fit.
+
+    `free` is the period's (free seats, room id) list in sorted order; it is only updated
+    when the exam fits.
+    """
+    index = bisect.bisect_left(free, (seats, ""))
+    if index < len(free):
+        available, room_id = free.pop(index)
+        if available > seats:
+            bisect.insort(free, (available - seats, room_id))
+        return [{"classroom_id": room_id, "seats": seats}]
+    if sum(available for available, _ in free) < seats:
+        return None
+    chosen, remaining = [], seats
+    while remaining > 0:
+        available, room_id = free.pop()
+        used = min(available, remaining)
+        chosen.append({"classroom_id": room_id, "seats": used})
+        remaining -= used
+        if available > used:
+            bisect.insort(free, (available - used, room_id))
+    return chosen
+
+
+def schedule_exams(data: Dict[str, List[Dict[str, Any]]], days: List[str], sessions: List[str],
+                   extra_enrollments: Optional[Dict[str, Iterable[str]]] = None,
+                   room_types: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Place every examined subject in a (day, session) period and in rooms.
+
+    An exam whose colour has no period, or whose period has no rooms left, is moved to the
+    first other period none of its neighbours use; if there is none it is reported under
+    `unscheduled` with the reason.
+    """
+    started = time.perf_counter()
+    subjects = {s["id"]: s for s in data["subjects"]}
+    batches = {b["id"]: b for b in data["batches"]}
+    allowed_types = set(room_types) if room_types is not None else None
+    rooms = [r for r in data["classrooms"] if allowed_types is None or r["type"] in allowed_types]
+    periods = [{"day": day, "session": session} for session in sessions for day in days]
+
+    enrollments = build_enrollments(data["subjects"], data["batches"], extra_enrollments)
+    graph = conflict_graph(enrollments)
+    colours = dsatur(graph)
+    seats = {s: sum(batches[b]["student_count"] for b in takers) for s, takers in enrollments.items()}
+
+    placed: Dict[str, int] = {}
+    empty = sorted((r["capacity"], r["id"]) for r in rooms if r["capacity"] > 0)
+    free_seats: Dict[int, List[Tuple[int, str]]] = defaultdict(lambda: list(empty))
+    exams, unscheduled = [], []
+    # Largest exams first within a colour, so they get first pick of the big rooms
+    for subject_id in sorted(graph, key=lambda s: (colours[s], -seats[s], s)):
+        neighbour_periods = {placed[n] for n in graph[subject_id] if n in placed}
+        preferred = [colours[subject_id]] if colours[subject_id] < len(periods) else []
+        candidates = preferred + [p for p in range(len(periods)) if p not in preferred]
+        allocation = None
+        for period in candidates:
+            if period in neighbour_periods:
+                continue
+            allocation = assign_rooms(seats[subject_id], free_seats[period])
+            if allocation is not None:
+                break
+        if allocation is None:
+            reason = "more conflicting exams than periods" if len(neighbour_periods) >= len(periods) \
+                else "not enough free seats in any conflict-free period"
+            unscheduled.append({"subject_id": subject_id, "students": seats[subject_id], "reason": reason})
+            continue
+        placed[subject_id] = period
+        exams.append({
+            "subject_id": subject_id,
+            "subject_code": subjects[subject_id].get("code"),
+            "batch_ids": sorted(enrollments[subject_id]),
+            "students": seats[subject_id],
+            "period": period,
+            **periods[period],
+            "rooms": allocation,
+        })
+    exams.sort(key=lambda e: (e["period"] % len(days) if days else 0, e["period"], e["subject_id"]))
+
+    # Soft quality: the same batch sitting two exams on one day
+    batch_day_exams: Dict[tuple, int] = defaultdict(int)
+    for exam in exams:
+        for batch_id in exam["batch_ids"]:
+            batch_day_exams[(batch_id, exam["day"])] += 1
+    return {
+        "periods": periods,
+        "exams": exams,
+        "unscheduled": unscheduled,
+        "stats": {
+            "subjects": len(graph),
+            "conflict_edges": sum(len(n) for n in graph.values()) // 2,
+            "colours": max(colours.values()) + 1 if colours else 0,
+            "periods_available": len(periods),
+            "periods_used": len(set(placed.values())),
+            "batch_same_day_exams": sum(count - 1 for count in batch_day_exams.values() if count > 1),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        },
+    }
@@ -0,0 +1,278 @@
+"""Timetable exports: iCalendar, CSV and PDF renderers plus a cache of rendered files.
+
+Renderers are plain generators over session rows, so a response can start streaming before the
+whole file exists; `RenderCache.fill` keeps a copy of what was streamed and serves it whole the
+next time the same timetable version is requested.
+"""
+import csv
+import io
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from scheduling import DAYS
+
+FORMATS = {
+    "ics": "text/calendar; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "pdf": "application/pdf",
+}
+CSV_COLUMNS = ("day", "time_slot", "subject_code", "subject", "faculty", "classroom", "batch")
+
+
+def parse_time_slot(time_slot: str) -> Optional[Tuple[str, str]]:
+    """'09:00-10:00' -> ('0900', '1000'), or None when the label is not a clock range"""
+    start, _, end = time_slot.partition("-")
+    try:
+        return tuple(datetime.strptime(t.strip(), "%H:%M").strftime("%H%M") for t in (start, end))
+    except ValueError:
+        return None
+
+
+def session_rows(entries: Iterable[Dict[str, Any]], names: Dict[str, Dict[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Entries joined with their subject, faculty, classroom and batch, in weekly order.
+
+    `names` maps "subjects"/"faculty"/"classrooms"/"batches" to {id: document}.
+    """
+    def lookup(kind, id_, field="name"):
+        return names.get(kind, {}).get(id_, {}).get(field, "Unknown")
+
+    rows = [{
+        "id": e.get("id", ""),
+        "day": e["day"],
+        "time_slot": e["time_slot"],
+        "subject_code": lookup("subjects", e["subject_id"], "code"),
+        "subject": lookup("subjects", e["subject_id"]),
+        "faculty": lookup("faculty", e["faculty_id"]),
+        "classroom": lookup("classrooms", e["classroom_id"]),
+        "batch": lookup("batches", e["batch_id"]),
+    } for e in entries]
+    day_order = {day: i for i, day in enumerate(DAYS)}
+    rows.sort(key=lambda r: (day_order.get(r["day"], len(DAYS)), r["time_slot"], r["batch"]))
+    return rows
+
+
+def render_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        writer.writerow([row[c] for c in CSV_COLUMNS])
+        if buffer.tell() > 16384:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ics_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_line(line: str) -> str:
+    """Fold to 75 octets per line as RFC 5545 requires, without splitting UTF-8 sequences"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, current = [], b""
+    for char in line:
+        piece = char.encode("utf-8")
+        if len(current) + len(piece) > (75 if not parts else 74):
+            parts.append(current.decode("utf-8"))
+            current = b""
+        current += piece
+    parts.append(current.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_offset(offset: timedelta) -> str:
+    minutes = int(offset.total_seconds()) // 60
+    return f"{'-' if minutes < 0 else '+'}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+
+def vtimezone(tzid: str, start: date, end: date) -> List[str]:
+    """VTIMEZONE lines for an IANA zone, with every offset change between start and end (strict
+    clients such as Outlook reject a TZID without one); empty if the zone is unknown"""
+    try:
+        zone = ZoneInfo(tzid)
+    except (ZoneInfoNotFoundError, ValueError):
+        return []
+
+    def component(local: datetime, dtstart: datetime, offset_from: timedelta) -> List[str]:
+        kind = "DAYLIGHT" if local.dst() else "STANDARD"
+        return [
+            f"BEGIN:{kind}",
+            f"DTSTART:{dtstart.strftime('%Y%m%dT%H%M%S')}",
+            f"TZOFFSETFROM:{_ics_offset(offset_from)}",
+            f"TZOFFSETTO:{_ics_offset(local.utcoffset())}",
+            f"TZNAME:{local.tzname()}",
+            f"END:{kind}",
+        ]
+
+    instant = datetime.combine(start - timedelta(days=1), time(), timezone.utc)
+    last = datetime.combine(end + timedelta(days=1), time(), timezone.utc)
+    current = instant.astimezone(zone)
+    # The offset in force before the term, then each transition during it, found hour by hour
+    # and narrowed down to the minute; a transition's DTSTART is in the offset it replaces
+    lines = ["BEGIN:VTIMEZONE", f"TZID:{tzid}"] + component(current, datetime(1970, 1, 1), current.utcoffset())
+    while instant < last:
+        if (instant + timedelta(hours=1)).astimezone(zone).utcoffset() != current.utcoffset():
+            changed = instant + timedelta(minutes=1)
+            while changed.astimezone(zone).utcoffset() == current.utcoffset():
+                changed += timedelta(minutes=1)
+            before = current.utcoffset()
+            current = changed.astimezone(zone)
+            lines += component(current, changed.replace(tzinfo=None) + before, before)
+        instant += timedelta(hours=1)
+    return lines + ["END:VTIMEZONE"]
+
+
+def render_ics(rows: Iterable[Dict[str, Any]], calendar_name: str, term_start: date, weeks: int,
+               tzid: Optional[str] = None) -> Iterator[str]:
+    """One weekly recurring event per session, repeating `weeks` times from the first matching
+    weekday on or after `term_start`. Times are floating unless a known IANA TZID is given, in
+    which case its VTIMEZONE is included."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    timezone_lines = vtimezone(tzid, term_start, term_start + timedelta(weeks=weeks)) if tzid else []
+    tz = f";TZID={tzid}" if timezone_lines else ""
+    yield "".join(_ics_line(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//University Class Scheduling Platform//Timetable//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ics_text(calendar_name)}",
+        *timezone_lines,
+    ))
+    for row in rows:
+        times = parse_time_slot(row["time_slot"])
+        if times is None or row["day"] not in DAYS:
+            continue
+        first = term_start + timedelta(days=(DAYS.index(row["day"]) - term_start.weekday()) % 7)
+        day = first.strftime("%Y%m%d")
+        yield "".join(_ics_line(line) for line in (
+            "BEGIN:VEVENT",
+            f"UID:{row['id'] or day + times[0] + row['batch']}@timetable",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART{tz}:{day}T{times[0]}00",
+            f"DTEND{tz}:{day}T{times[1]}00",
+            f"RRULE:FREQ=WEEKLY;COUNT={weeks}",
+            f"SUMMARY:{_ics_text(row['subject_code'] + ' ' + row['subject'])}",
+            f"LOCATION:{_ics_text(row['classroom'])}",
+            f"DESCRIPTION:{_ics_text('Lecturer: ' + row['faculty'] + chr(10) + 'Batch: ' + row['batch'])}",
+            "END:VEVENT",
+        ))
+    yield _ics_line("END:VCALENDAR")
+
+
+PDF_PAGE = (595, 842)  # A4 in points
+PDF_FONT_SIZE = 8
+PDF_LEADING = 11
+PDF_MARGIN = 40
+PDF_LINES_PER_PAGE = (PDF_PAGE[1] - 2 * PDF_MARGIN) // PDF_LEADING - 2
+PDF_COLUMNS = (("day", 10), ("time_slot", 12), ("subject_code", 10), ("subject", 26), ("faculty", 20), ("classroom", 12))
+
+
+def _pdf_text(value: str) -> bytes:
+    value = value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return value.encode("latin-1", "replace")
+
+
+def _pdf_row(values: Iterable[Tuple[str, int]]) -> str:
+    return " ".join(str(v)[:width - 1].ljust(width - 1) for v, width in values)
+
+
+def render_pdf(rows: Iterable[Dict[str, Any]], title: str) -> Iterator[bytes]:
+    """A printable monospaced table, written page by page.
+
+    Object 2 (the page tree) is referenced by every page but written last, once all page ids
+    are known, so nothing has to be buffered beyond the current page.
+    """
+    offset = 0
+    offsets: Dict[int, int] = {}
+    page_ids: List[int] = []
+    next_id = 4
+
+    def emit(obj_id: int, body: bytes) -> bytes:
+        nonlocal offset
+        offsets[obj_id] = offset
+        chunk = b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+        offset += len(chunk)
+        return chunk
+
+    def page(lines: List[str], number: int) -> bytes:
+        nonlocal next_id
+        content = b"BT /F1 %d Tf %d TL %d %d Td\n" % (PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN, PDF_PAGE[1] - PDF_MARGIN)
+        for line in [f"{title}  (page {number})", _pdf_row((c.replace("_", " ").title(), w) for c, w in PDF_COLUMNS)] + lines:
+            content += b"(" + _pdf_text(line) + b") Tj T*\n"
+        content += b"ET"
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        return emit(content_id, b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream") + emit(
+            page_id,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PDF_PAGE[0], PDF_PAGE[1], content_id)
+        )
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    offset = len(header)
+    yield header + emit(1, b"<< /Type /Catalog /Pages 2 0 R >>") + emit(
+        3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+
+    lines: List[str] = []
+    for row in rows:
+        lines.append(_pdf_row((row[c], w) for c, w in PDF_COLUMNS))
+        if len(lines) == PDF_LINES_PER_PAGE:
+            yield page(lines, len(page_ids) + 1)
+            lines = []
+    if lines or not page_ids:
+        yield page(lines, len(page_ids) + 1)
+
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    tail = emit(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids))
+    xref = b"xref\n0 %d\n0000000000 65535 f \n" % next_id
+    xref += b"".join(b"%010d 00000 n \n" % offsets[i] for i in range(1, next_id))
+    yield tail + xref + b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_id, offset)
+
+
+class RenderCache:
+    """LRU of rendered files bounded by total size; keys carry the timetable version, so an
+    entry never needs invalidating and old versions simply age out"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Tuple, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def fill(self, key: Tuple, chunks: Iterable) -> Iterator[bytes]:
+        """Pass rendered chunks through to the response and cache the file once it is complete"""
+        parts = []
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            parts.append(chunk)
+            yield chunk
+        self.put(key, b"".join(parts))
@@ -0,0 +1,208 @@
+"""Vectorized timetable scoring with NumPy, for engines that evaluate many candidates.
+
+`FitnessModel` computes the same hard violations and soft cost as
+`scheduling.evaluate_timetable`, but over integer arrays: each entry is (batch, subject,
+faculty, room, day, period) indices into the model's data, and every metric is a bincount,
+sort or reduction over those arrays. `score_many` concatenates any number of candidates and
+scores them in one pass, so the per-candidate Python overhead is only the encoding; engines
+that mutate `Encoded` arrays directly skip even that.
+
+Memory for one batch is dominated by the per-batch daily hours, K x batches x days integers
+for K candidates.
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Union
+
+import numpy as np
+
+from scheduling import DAYS, HARD_CONSTRAINTS, SOFT_WEIGHTS, batch_subjects, build_slot_grid, qualified_faculty
+
+
+class Encoded(NamedTuple):
+    """One candidate timetable; unknown ids and slots are -1"""
+    batch: np.ndarray
+    subject: np.ndarray
+    faculty: np.ndarray
+    room: np.ndarray
+    day: np.ndarray
+    period: np.ndarray
+
+
+def _unique_counts(codes: np.ndarray):
+    if not len(codes):
+        return codes, codes
+    return np.unique(codes, return_counts=True)
+
+
+class FitnessModel:
+    def __init__(self, data: Dict[str, List[Dict[str, Any]]], constraints):
+        self.constraints = constraints
+        self.slots = build_slot_grid(constraints)
+        self.batch_ids = [b["id"] for b in data["batches"]]
+        self.subject_ids = [s["id"] for s in data["subjects"]]
+        self.faculty_ids = [f["id"] for f in data["faculty"]]
+        self.room_ids = [c["id"] for c in data["classrooms"]]
+        self._batch_index = {v: i for i, v in enumerate(self.batch_ids)}
+        self._subject_index = {v: i for i, v in enumerate(self.subject_ids)}
+        self._faculty_index = {v: i for i, v in enumerate(self.faculty_ids)}
+        self._room_index = {v: i for i, v in enumerate(self.room_ids)}
+        self._day_index = {d: i for i, d in enumerate(DAYS)}
+        self._slot_index = {s: i for i, s in enumerate(self.slots)}
+
+        self.subject_is_lab = np.array([s["type"] == "lab" for s in data["subjects"]], dtype=bool)
+        self.room_is_lab = np.array([c["type"] == "lab" for c in data["classrooms"]], dtype=bool)
+        self.room_capacity = np.array([c.get("capacity", 0) for c in data["classrooms"]], dtype=np.int64)
+        self.batch_size = np.array([b.get("student_count", 0) for b in data["batches"]], dtype=np.int64)
+
+        # Qualified (faculty, subject) pairs as in evaluate_timetable, stored as sorted
+        # faculty * subjects + subject codes so a lookup is one searchsorted
+        n_subjects = len(self.subject_ids)
+        self.qualified = np.unique(np.array([
+            self._faculty_index[f] * n_subjects + self._subject_index[s]
+            for s, faculty_ids in qualified_faculty(data).items() if s in self._subject_index
+            for f in faculty_ids if f in self._faculty_index
+        ], dtype=np.int64))
+
+        required = {}
+        for b, batch in enumerate(data["batches"]):
+            for subject in batch_subjects(batch, data["subjects"]):
+                required[b * n_subjects + self._subject_index[subject["id"]]] = subject["hours_per_week"]
+        self.required_pairs = np.array(sorted(required), dtype=np.int64)
+        self.required_hours = np.array([required[k] for k in sorted(required)], dtype=np.int64)
+
+    def encode(self, entries: Iterable[Dict[str, Any]]) -> Encoded:
+        rows = [(
+            self._batch_index.get(e.get("batch_id"), -1),
+            self._subject_index.get(e.get("subject_id"), -1),
+            self._faculty_index.get(e.get("faculty_id"), -1),
+            self._room_index.get(e.get("classroom_id"), -1),
+            self._day_index.get(e.get("day"), -1),
+            self._slot_index.get(e.get("time_slot"), -1),
+        ) for e in entries]
+        columns = np.array(rows, dtype=np.int64).reshape(-1, 6).T
+        return Encoded(*columns)
+
+    def score_many(self, candidates: Sequence[Union[Encoded, List[Dict[str, Any]]]]) -> Dict[str, Any]:
+        """Scores of every candidate as arrays indexed by candidate"""
+        encoded = [c if isinstance(c, Encoded) else self.encode(c) for c in candidates]
+        k = len(encoded)
+        n_batches, n_subjects, n_faculty = len(self.batch_ids), len(self.subject_ids), len(self.faculty_ids)
+        n_days, n_periods = len(DAYS), len(self.slots)
+        n_cells = n_days * n_periods
+        lengths = np.array([len(e.batch) for e in encoded], dtype=np.int64)
+        if k == 0:
+            lengths = np.zeros(0, dtype=np.int64)
+        candidate = np.repeat(np.arange(k), lengths)
+        b, s, f, r, d, p = (np.concatenate([getattr(e, field) for e in encoded]) if k else np.zeros(0, dtype=np.int64)
+                            for field in Encoded._fields)
+
+        def per_candidate(index, weights=None):
+            return np.bincount(index, weights=weights, minlength=k)[:k]
+
+        hard = {}
+        unknown = (b < 0) | (s < 0) | (f < 0) | (r < 0)
+        invalid = ~unknown & ((d < 0) | (p < 0))
+        hard["unknown_reference"] = per_candidate(candidate[unknown])
+        hard["invalid_slot"] = per_candidate(candidate[invalid])
+        valid = ~unknown & ~invalid
+        candidate, b, s, f, r, d, p = (a[valid] for a in (candidate, b, s, f, r, d, p))
+        cell = d * n_periods + p
+
+        def clashes(owner, n_owner):
+            codes, counts = _unique_counts((candidate * n_owner + owner) * n_cells + cell)
+            return per_candidate(codes // (n_owner * n_cells), counts - 1)
+
+        hard["batch_clash"] = clashes(b, n_batches)
+        hard["faculty_clash"] = clashes(f, n_faculty)
+        hard["room_clash"] = clashes(r, len(self.room_ids))
+        hard["room_type"] = per_candidate(candidate, self.subject_is_lab[s] != self.room_is_lab[r])
+        hard["room_capacity"] = per_candidate(candidate, self.batch_size[b] > self.room_capacity[r])
+        fits = (self.batch_size[b] <= self.room_capacity[r]) & (self.room_capacity[r] > 0)
+        empty_share = 1 - self.batch_size[b] / np.maximum(self.room_capacity[r], 1)
+        pair = f * n_subjects + s
+        position = np.minimum(np.searchsorted(self.qualified, pair), max(len(self.qualified) - 1, 0))
+        is_qualified = self.qualified[position] == pair if len(self.qualified) else np.zeros(len(pair), dtype=bool)
+        hard["unqualified_faculty"] = per_candidate(candidate, ~is_qualified)
+        codes, counts = _unique_counts((candidate * n_faculty + f) * n_days + d)
+        hard["faculty_daily_hours"] = per_candidate(
+            codes // (n_faculty * n_days), np.maximum(counts - self.constraints.max_hours_per_day, 0))
+
+        n_required = len(self.required_pairs)
+        if n_required:
+            pair = b * n_subjects + s
+            position = np.minimum(np.searchsorted(self.required_pairs, pair), n_required - 1)
+            matched = self.required_pairs[position] == pair
+            scheduled = np.bincount(candidate[matched] * n_required + position[matched],
+                                    minlength=k * n_required).reshape(k, n_required)
+            hard["unscheduled_hours"] = np.maximum(self.required_hours - scheduled, 0).sum(axis=1)
+        else:
+            hard["unscheduled_hours"] = np.zeros(k, dtype=np.int64)
+
+        soft = {}
+        # Occupied (candidate, owner, day, period) cells, deduplicated and sorted; cells of one
+        # owner-day are contiguous codes, so runs and gaps come from neighbouring differences
+        batch_cells = np.unique((candidate * n_batches + b) * n_cells + cell)
+        faculty_cells = np.unique((candidate * n_faculty + f) * n_cells + cell)
+
+        def consecutive_excess(cells, n_owner):
+            if not len(cells):
+                return np.zeros(k)
+            starts = np.ones(len(cells), dtype=bool)
+            starts[1:] = ~((cells[1:] == cells[:-1] + 1) & (cells[1:] % n_periods > 0))
+            run_lengths = np.bincount(np.cumsum(starts) - 1)
+            excess = np.maximum(run_lengths - self.constraints.max_consecutive_hours, 0)
+            return per_candidate(cells[starts] // (n_owner * n_cells), excess)
+
+        soft["consecutive_excess"] = consecutive_excess(batch_cells, n_batches) + consecutive_excess(faculty_cells, n_faculty)
+
+        if self.constraints.no_back_to_back_labs:
+            lab = self.subject_is_lab[s]
+            lab_cells = np.unique((candidate[lab] * n_batches + b[lab]) * n_cells + cell[lab])
+            adjacent = (lab_cells[1:] == lab_cells[:-1] + 1) & (lab_cells[1:] % n_periods > 0)
+            soft["back_to_back_labs"] = per_candidate(lab_cells[1:][adjacent] // (n_batches * n_cells)).astype(float)
+        else:
+            soft["back_to_back_labs"] = np.zeros(k)
+
+        if len(batch_cells):
+            group = batch_cells // n_periods
+            first = np.ones(len(batch_cells), dtype=bool)
+            first[1:] = group[1:] != group[:-1]
+            last = np.ones(len(batch_cells), dtype=bool)
+            last[:-1] = first[1:]
+            span = batch_cells[last] % n_periods - batch_cells[first] % n_periods + 1
+            soft["batch_gaps"] = per_candidate(batch_cells[first] // (n_batches * n_cells), span - np.diff(
+                np.append(np.flatnonzero(first), len(batch_cells))))
+        else:
+            soft["batch_gaps"] = np.zeros(k)
+
+        daily = np.bincount((candidate * n_batches + b) * n_days + d,
+                            minlength=k * n_batches * n_days).reshape(k, n_batches, n_days)
+        soft["batch_daily_spread"] = daily.std(axis=2).sum(axis=1)
+
+        loads = np.bincount(candidate * n_faculty + f, minlength=k * n_faculty).reshape(k, n_faculty)
+        teaching = loads > 0
+        teachers = teaching.sum(axis=1)
+        mean = loads.sum(axis=1) / np.maximum(teachers, 1)
+        variance = np.where(teaching, (loads - mean[:, None]) ** 2, 0).sum(axis=1) / np.maximum(teachers, 1)
+        soft["faculty_load_spread"] = np.where(teachers > 1, np.sqrt(variance), 0.0)
+        soft["room_underuse"] = per_candidate(candidate[fits], empty_share[fits])
+
+        hard = {name: hard[name].astype(np.int64) for name in HARD_CONSTRAINTS}
+        soft = {name: soft[name].astype(float) for name in SOFT_WEIGHTS}
+        return {
+            "entries": lengths,
+            "hard_violations": hard,
+            "hard_total": sum(hard.values()),
+            "soft": soft,
+            "soft_cost": sum(SOFT_WEIGHTS[name] * value for name, value in soft.items()),
+        }
+
+    def score(self, candidate: Union[Encoded, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """One candidate, in the shape `evaluate_timetable` returns"""
+        scores = self.score_many([candidate])
+        return {
+            "entries": int(scores["entries"][0]),
+            "hard_violations": {name: int(v[0]) for name, v in scores["hard_violations"].items()},
+            "hard_total": int(scores["hard_total"][0]),
+            "soft": {name: round(float(v[0]), 3) for name, v in scores["soft"].items()},
+            "soft_cost": round(float(scores["soft_cost"][0]), 3),
+        }
@@ -0,0 +1,123 @@
+"""Expiring leases in MongoDB with fencing tokens, for work that must not overlap across workers.
+
+A lease document is {_id: resource, owner, token, expires_at}. Acquiring increments `token`,
+so every holder gets a number larger than any earlier holder's; writes that carry the token
+can be rejected once a newer holder exists, even if a paused worker wakes up after its lease
+expired. Tokens only order the holders of one resource, so a write is stamped with the token
+of the resource it belongs to. Holders renew in the background and re-verify right before
+committing.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("leases")
+
+
+class LeaseUnavailable(Exception):
+    pass
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Lease:
+    def __init__(self, manager: "LeaseManager", owner: str, tokens: Dict[str, int]):
+        self.manager = manager
+        self.owner = owner
+        self.tokens = tokens
+        self.lost = False
+
+    async def verify(self):
+        """Extend the lease and confirm it is still ours; call right before committing writes"""
+        if self.lost or not await self.manager.renew(self.tokens, self.owner):
+            self.lost = True
+            raise LeaseLost(f"Lease on {', '.join(self.tokens)} was lost")
+
+
+class LeaseManager:
+    def __init__(self, collection, ttl_seconds: float = 30.0, poll_seconds: float = 0.25):
+        self.collection = collection
+        self.ttl = ttl_seconds
+        self.poll = poll_seconds
+
+    def _expiry(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+
+    async def _acquire_one(self, resource: str, owner: str) -> Optional[int]:
+        now = datetime.now(timezone.utc)
+        try:
+            lease = await self.collection.find_one_and_update(
+                {"_id": resource, "$or": [{"owner": None}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expires_at": self._expiry(), "acquired_at": now}, "$inc": {"token": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return None  # held by someone else: the upsert collided with the existing document
+        return lease["token"]
+
+    async def try_acquire(self, resources: Iterable[str], owner: str) -> Optional[Dict[str, int]]:
+        """All resources or none; sorted order keeps two overlapping requests from deadlocking"""
+        tokens: Dict[str, int] = {}
+        for resource in sorted(set(resources)):
+            token = await self._acquire_one(resource, owner)
+            if token is None:
+                await self.release(tokens, owner)
+                return None
+            tokens[resource] = token
+        return tokens
+
+    async def acquire(self, resources: Iterable[str], owner: str, timeout: float) -> Dict[str, int]:
+        resources = list(resources)
+        deadline = asyncio.get_running_loop().time() + timeout
+        delay = self.poll
+        while True:
+            tokens = await self.try_acquire(resources, owner)
+            if tokens is not None:
+                return tokens
+            if asyncio.get_running_loop().time() + delay > deadline:
+                raise LeaseUnavailable(f"Timed out waiting for {', '.join(sorted(resources))}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 2.0)
+
+    async def renew(self, tokens: Dict[str, int], owner: str) -> bool:
+        held = 0
+        for resource, token in tokens.items():
+            result = await self.collection.update_one(
+                {"_id": resource, "owner": owner, "token": token},
+                {"$set": {"expires_at": self._expiry()}},
+            )
+            held += result.matched_count
+        return held == len(tokens)
+
+    async def release(self, tokens: Dict[str, int], owner: str):
+        for resource, token in tokens.items():
+            await self.collection.update_one(
+                {"_id": resource, "owner": owner, "token": token},
+                {"$set": {"owner": None, "expires_at": None}},
+            )
+
+    async def _keep_alive(self, lease: Lease):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            if not await self.renew(lease.tokens, lease.owner):
+                lease.lost = True
+                logger.warning(f"Lease {lease.owner} on {', '.join(lease.tokens)} expired before renewal")
+                return
+
+    @asynccontextmanager
+    async def hold(self, resources: Iterable[str], owner: str, timeout: float) -> AsyncIterator[Lease]:
+        lease = Lease(self, owner, await self.acquire(resources, owner, timeout))
+        renewal = asyncio.create_task(self._keep_alive(lease))
+        try:
+            yield lease
+        finally:
+            renewal.cancel()
+            await self.release(lease.tokens, owner)
@@ -0,0 +1,277 @@
+"""In-process Prometheus-style metrics: HTTP middleware, Mongo command listener and LLM timing."""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+TOKEN_BUCKETS = (64, 256, 1024, 4096, 16384, 65536)
+
+logger = logging.getLogger("metrics")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield from self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield from self.header()
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            cumulative += state[len(self.buckets)]
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {state[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_requests_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method", "route")))
+http_request_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time to produce the full response", ("method", "route", "status")))
+http_response_size = REGISTRY.register(Histogram(
+    "http_response_size_bytes", "Response body size", ("method", "route"), buckets=SIZE_BUCKETS))
+mongo_commands = REGISTRY.register(Counter(
+    "mongo_commands_total", "MongoDB commands by outcome", ("command", "collection", "outcome")))
+mongo_command_duration = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time", ("command", "collection")))
+llm_request_duration = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "LLM call latency", ("operation", "outcome")))
+llm_tokens = REGISTRY.register(Histogram(
+    "llm_tokens", "Tokens per LLM call (estimated when the provider does not report them)",
+    ("operation", "direction"), buckets=TOKEN_BUCKETS))
+llm_tokens_total = REGISTRY.register(Counter(
+    "llm_tokens_total", "Tokens sent to and received from the LLM", ("operation", "direction")))
+
+
+# Route template of the request being served; Motor copies the context into its executor
+# threads, so command listeners can attribute database work to a route
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar("current_route", default="background")
+
+
+def route_label(routes, scope) -> str:
+    """The matched path template (bounded cardinality), not the raw URL"""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Per-route latency and size histograms plus in-flight gauges, as plain ASGI middleware"""
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_label(self.routes, scope)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc(method=method, route=route)
+        token = current_route.set(f"{method} {route}")
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_route.reset(token)
+            http_requests_in_flight.dec(method=method, route=route)
+            http_request_duration.observe(time.perf_counter() - started, method=method, route=route, status=str(status))
+            http_response_size.observe(size, method=method, route=route)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Counts and times every command issued by the Motor client it is registered on"""
+
+    IGNORED = {"hello", "isMaster", "ismaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+    def __init__(self):
+        self._collections: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _event_key(event) -> Tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        collection = event.command.get(event.command_name)
+        with self._lock:
+            self._collections[self._event_key(event)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._collections.pop(self._event_key(event), None)
+        if collection is None:
+            return
+        mongo_commands.inc(command=event.command_name, collection=collection, outcome=outcome)
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name, collection=collection)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+# Loaded on first use: tiktoken may download the encoding, which a worker should not wait for
+# at import. If it cannot be loaded, token counts fall back to ~4 characters per token.
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def token_encoding():
+    """The cl100k_base encoding, or None when tiktoken is missing or cannot load it"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:  # tiktoken is optional and may be unable to fetch its encoding offline
+                    logger.warning(f"LLM token counts are estimated from text length: {e}")
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    encoding = token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def observe_llm_call(operation: str, seconds: float, outcome: str, prompt: str, response: Optional[str]):
+    llm_request_duration.observe(seconds, operation=operation, outcome=outcome)
+    for direction, text in (("prompt", prompt), ("completion", response)):
+        tokens = count_tokens(text)
+        llm_tokens.observe(tokens, operation=operation, direction=direction)
+        llm_tokens_total.inc(tokens, operation=operation, direction=direction)
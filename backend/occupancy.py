@@ -0,0 +1,144 @@
+"""Room and lecturer occupancy matrices, maintained incrementally from timetable diffs.
+
+One document per resource, {_id: "room:<id>" | "faculty:<id>", kind, resource_id, total,
+cells: {day: {time_slot: sessions}}}, plus a "meta" document recording when the matrices were
+last rebuilt from the timetable (absent while they are stale) and a "writers" document marking
+timetable writes in flight. Timetable writes turn their diff into $inc updates, so analytics
+read a few hundred small documents instead of scanning every timetable entry.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+KINDS = {"room": "classroom_id", "faculty": "faculty_id"}
+META_ID = "meta"
+WRITERS_ID = "writers"
+PERCENTILES = (50, 75, 90, 99)
+
+
+def occupancy_deltas(diff: Dict[str, Any]) -> Dict[Tuple[str, str], Dict[Tuple[str, str], int]]:
+    """(kind, resource id) -> (day, time slot) -> change in sessions, for a timetable diff"""
+    deltas: Dict[Tuple[str, str], Dict[Tuple[str, str], int]] = defaultdict(lambda: defaultdict(int))
+
+    def apply(entry, slot, amount):
+        for kind, field in KINDS.items():
+            if entry.get(field):
+                deltas[(kind, entry[field])][slot] += amount
+
+    for row in diff.get("added", ()):
+        apply(row, (row["day"], row["time_slot"]), 1)
+    for row in diff.get("removed", ()):
+        apply(row, (row["day"], row["time_slot"]), -1)
+    for row in diff.get("changed", ()):
+        apply(row["before"], (row["day"], row["time_slot"]), -1)
+        apply(row["after"], (row["day"], row["time_slot"]), 1)
+    return {
+        resource: {slot: amount for slot, amount in cells.items() if amount}
+        for resource, cells in deltas.items()
+        if any(cells.values())
+    }
+
+
+def occupancy_updates(diff: Dict[str, Any]) -> List[UpdateOne]:
+    updates = []
+    for (kind, resource_id), cells in occupancy_deltas(diff).items():
+        increments = {f"cells.{day}.{slot}": amount for (day, slot), amount in cells.items()}
+        increments["total"] = sum(cells.values())
+        updates.append(UpdateOne(
+            {"_id": f"{kind}:{resource_id}"},
+            {"$inc": increments, "$setOnInsert": {"kind": kind, "resource_id": resource_id}},
+            upsert=True,
+        ))
+    return updates
+
+
+def occupancy_documents(entries: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Full matrices for a set of timetable entries (used to rebuild)"""
+    documents: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        for kind, field in KINDS.items():
+            resource_id = entry.get(field)
+            if not resource_id:
+                continue
+            document = documents.setdefault(f"{kind}:{resource_id}", {
+                "_id": f"{kind}:{resource_id}", "kind": kind, "resource_id": resource_id, "total": 0, "cells": {},
+            })
+            day = document["cells"].setdefault(entry["day"], {})
+            day[entry["time_slot"]] = day.get(entry["time_slot"], 0) + 1
+            document["total"] += 1
+    return list(documents.values())
+
+
+def occupancy_replacements(documents: List[Dict[str, Any]]) -> List[Any]:
+    """Bulk operations replacing every matrix with `documents` and dropping the rest; upserts,
+    so concurrent rebuilds do not collide on inserting the same _id"""
+    operations: List[Any] = [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in documents]
+    operations.append(DeleteMany({"kind": {"$in": list(KINDS)}, "_id": {"$nin": [d["_id"] for d in documents]}}))
+    return operations
+
+
+def percentiles(values: Sequence[float], points: Sequence[int] = PERCENTILES) -> Dict[str, Optional[float]]:
+    """Linearly interpolated percentiles, as "p50" etc."""
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        if not ordered:
+            result[f"p{point}"] = None
+            continue
+        rank = (len(ordered) - 1) * point / 100
+        low = int(rank)
+        high = min(low + 1, len(ordered) - 1)
+        result[f"p{point}"] = round(ordered[low] + (ordered[high] - ordered[low]) * (rank - low), 4)
+    return result
+
+
+def summarise(documents: Iterable[Dict[str, Any]], resources: List[Dict[str, Any]], days: List[str],
+              time_slots: List[str], limit: int = 10, detail: bool = False) -> Dict[str, Any]:
+    """Utilisation of one kind of resource over the days x time slots week.
+
+    Every resource in `resources` counts, including ones with no sessions. `heatmap` is the
+    share of resources busy in each (day, slot); `peak_slots` the busiest cells.
+    """
+    cells_by_id = {d["resource_id"]: d.get("cells", {}) for d in documents}
+    week = len(days) * len(time_slots)
+    heatmap = [[0] * len(time_slots) for _ in days]
+    rows, matrices = [], []
+    for resource in resources:
+        cells = cells_by_id.get(resource["id"], {})
+        matrix = [[max(cells.get(day, {}).get(slot, 0), 0) for slot in time_slots] for day in days]
+        hours = sum(1 for day_row in matrix for sessions in day_row if sessions)
+        for d, day_row in enumerate(matrix):
+            for s, sessions in enumerate(day_row):
+                if sessions:
+                    heatmap[d][s] += 1
+        row = {
+            "id": resource["id"],
+            "name": resource.get("name"),
+            "hours": hours,
+            "sessions": sum(map(sum, matrix)),
+            "utilisation": round(hours / week, 4) if week else 0.0,
+        }
+        rows.append(row)
+        if detail:
+            matrices.append({"id": resource["id"], "cells": matrix})
+
+    count = len(resources)
+    shares = [[round(busy / count, 4) if count else 0.0 for busy in day_row] for day_row in heatmap]
+    peaks = sorted(
+        ({"day": day, "time_slot": slot, "busy": heatmap[d][s], "share": shares[d][s]}
+         for d, day in enumerate(days) for s, slot in enumerate(time_slots)),
+        key=lambda cell: -cell["busy"]
+    )
+    by_utilisation = sorted(rows, key=lambda row: (-row["utilisation"], row["id"]))
+    return {
+        "resources": count,
+        "mean_utilisation": round(sum(r["utilisation"] for r in rows) / count, 4) if count else None,
+        "utilisation_percentiles": percentiles([r["utilisation"] for r in rows]),
+        "hours_percentiles": percentiles([r["hours"] for r in rows]),
+        "heatmap": shares,
+        "peak_slots": peaks[:limit],
+        "busiest": by_utilisation[:limit],
+        "least_used": by_utilisation[::-1][:limit],
+        **({"matrix": matrices} if detail else {}),
+    }
@@ -0,0 +1,229 @@
+"""Slow MongoDB operation profiler built on pymongo command monitoring.
+
+Every command slower than the threshold is logged with its filter and the route that issued
+it, aggregated by query shape (the filter with values replaced by their types), and explained
+once per shape so the worst offenders can be inspected on a diagnostics endpoint.
+
+Filters carry user data (emails, token hashes), so nothing keeps or logs their literal values:
+the sample filter and the explain output are redacted like Mongo's representative query
+shapes, with each value replaced by "?<type>" and keys and operators left in place.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from metrics import current_route
+
+logger = logging.getLogger("slow_queries")
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+IGNORED = {"hello", "isMaster", "ismaster", "ping", "endSessions", "saslStart", "saslContinue", "explain", "getMore"}
+# Driver-added fields that must not be sent back inside an explain command
+DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "autocommit", "startTransaction"}
+# Parts of an explain result that repeat the filter's values
+EXPLAIN_VALUE_FIELDS = {"parsedQuery", "filter", "indexBounds"}
+MAX_SHAPES = 500
+
+
+def command_filter(command_name: str, command: Dict[str, Any]) -> Any:
+    if command_name == "find":
+        return command.get("filter", {})
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query", {})
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        return pipeline[0].get("$match", {}) if pipeline else {}
+    if command_name == "update":
+        updates = command.get("updates") or [{}]
+        return updates[0].get("q", {})
+    if command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        return deletes[0].get("q", {})
+    return {}
+
+
+def query_shape(value: Any) -> Any:
+    """Replace literal values by their type name, keeping field names and operators"""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return type(value).__name__
+
+
+def redact(value: Any) -> Any:
+    """The filter with every literal replaced by "?<type>"; unlike query_shape, list items and
+    their order are kept, so the sample still shows what the query looked like"""
+    if isinstance(value, dict):
+        return {k: redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return f"?{type(value).__name__}"
+
+
+def redact_explain(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: redact(v) if k in EXPLAIN_VALUE_FIELDS else redact_explain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact_explain(item) for item in value]
+    return value
+
+
+def plan_summary(plan: Dict[str, Any]) -> str:
+    """Compact "FETCH <- IXSCAN {batch_id: 1}" rendering of a winning plan"""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if "keyPattern" in plan:
+            stage += " {" + ", ".join(f"{k}: {v}" for k, v in plan["keyPattern"].items()) + "}"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+class ShapeStats:
+    def __init__(self, key: Tuple, command_name: str, database: str, collection: str, shape: Any):
+        self.key = key
+        self.command_name = command_name
+        self.database = database
+        self.collection = collection
+        self.shape = shape
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_seen = 0.0
+        self.routes: Dict[str, int] = {}
+        self.sample_filter: Any = None
+        self.explain: Optional[Dict[str, Any]] = None
+        self.explain_state = "pending"
+
+    def as_dict(self) -> Dict[str, Any]:
+        winning = (self.explain or {}).get("queryPlanner", {}).get("winningPlan") or {}
+        return {
+            "command": self.command_name,
+            "collection": f"{self.database}.{self.collection}",
+            "shape": self.shape,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "last_seen": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.last_seen)),
+            "routes": dict(sorted(self.routes.items(), key=lambda item: -item[1])),
+            "sample_filter": self.sample_filter,
+            "plan": plan_summary(winning) if winning else None,
+            "explain_state": self.explain_state,
+            "explain": self.explain,
+        }
+
+
+class SlowQueryProfiler(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = 100.0, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.explain_enabled = explain
+        self._started: Dict[Tuple, Tuple[str, str, Dict[str, Any], str]] = {}
+        self._shapes: Dict[Tuple, ShapeStats] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._tasks = set()
+
+    def attach(self, loop: asyncio.AbstractEventLoop, client):
+        """Give the profiler an event loop and Motor client to run explain() with"""
+        self._loop = loop
+        self._client = client
+
+    @staticmethod
+    def _event_key(event) -> Tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        if event.command_name in IGNORED:
+            return
+        with self._lock:
+            self._started[self._event_key(event)] = (event.database_name, event.command_name, event.command, current_route.get())
+
+    def failed(self, event):
+        with self._lock:
+            self._started.pop(self._event_key(event), None)
+
+    def succeeded(self, event):
+        with self._lock:
+            started = self._started.pop(self._event_key(event), None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        database, command_name, command, route = started
+        collection = command.get(command_name) if isinstance(command.get(command_name), str) else ""
+        filter_ = command_filter(command_name, command)
+        sample = redact(filter_)
+        logger.warning(f"Slow {command_name} on {database}.{collection} took {duration_ms:.1f}ms "
+                       f"from {route}: filter={sample!r}")
+
+        shape = query_shape(filter_)
+        key = (database, collection, command_name, repr(shape))
+        with self._lock:
+            stats = self._shapes.get(key)
+            is_new = stats is None
+            if is_new:
+                if len(self._shapes) >= MAX_SHAPES:
+                    cheapest = min(self._shapes.values(), key=lambda s: s.total_ms)
+                    del self._shapes[cheapest.key]
+                stats = self._shapes[key] = ShapeStats(key, command_name, database, collection, shape)
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.last_seen = time.time()
+            stats.routes[route] = stats.routes.get(route, 0) + 1
+            stats.sample_filter = sample
+
+        if is_new:
+            self._schedule_explain(stats, command_name, command)
+
+    def _schedule_explain(self, stats: ShapeStats, command_name: str, command: Dict[str, Any]):
+        if not self.explain_enabled or command_name not in EXPLAINABLE:
+            stats.explain_state = "skipped"
+            return
+        if self._loop is None or self._client is None or self._loop.is_closed():
+            stats.explain_state = "unavailable"
+            return
+        explain_command = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+        self._loop.call_soon_threadsafe(self._start_explain, stats, explain_command)
+
+    def _start_explain(self, stats: ShapeStats, command: Dict[str, Any]):
+        task = self._loop.create_task(self._explain(stats, command))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, stats: ShapeStats, command: Dict[str, Any]):
+        try:
+            result = await self._client[stats.database].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+            stats.explain = {"queryPlanner": redact_explain(result.get("queryPlanner", {}))}
+            stats.explain_state = "captured"
+        except Exception as e:
+            stats.explain_state = f"failed: {e}"
+
+    def report(self, limit: int = 20, sort: str = "total_ms") -> List[Dict[str, Any]]:
+        with self._lock:
+            shapes = list(self._shapes.values())
+        key = {"total_ms": lambda s: s.total_ms, "max_ms": lambda s: s.max_ms, "count": lambda s: s.count}.get(sort)
+        if key is None:
+            raise ValueError("sort must be one of total_ms, max_ms, count")
+        return [s.as_dict() for s in sorted(shapes, key=key, reverse=True)[:limit]]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
@@ -0,0 +1,165 @@
+"""In-process publish/subscribe hub feeding Server-Sent Event streams.
+
+Each subscriber is just a bounded asyncio.Queue; a single hub-wide timer pushes heartbeats,
+so an idle connection costs one queue and one suspended generator. Every topic keeps a small
+replay buffer so clients that reconnect with Last-Event-ID receive what they missed.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+HEARTBEAT = object()
+CLOSED = object()
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, hub: "Hub", topics: Tuple[str, ...], predicate: Optional[Callable[[Any], bool]], queue_size: int):
+        self.hub = hub
+        self.topics = topics
+        self.predicate = predicate
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, item) -> bool:
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def accepts(self, data: Any) -> bool:
+        return self.predicate is None or self.predicate(data)
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        while True:
+            item = await self.queue.get()
+            if item is CLOSED:
+                return
+            yield item
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class Hub:
+    def __init__(self, replay_size: int = 100, queue_size: int = 64, heartbeat_seconds: float = 20.0,
+                 max_subscribers: int = 10000):
+        self.replay_size = replay_size
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_subscribers = max_subscribers
+        # Event ids are "<epoch>-<sequence>"; a different epoch means this process restarted
+        # and the client's position is meaningless, so it gets the whole replay buffer
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._sequence = 0
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._replay: Dict[str, Deque[Tuple[int, str, Any]]] = {}
+        self._all: Set[Subscription] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._all)
+
+    def _event_id(self, sequence: int) -> str:
+        return f"{self.epoch}-{sequence}"
+
+    def _parse_event_id(self, event_id: Optional[str]) -> int:
+        """Sequence number after which to replay; 0 replays everything buffered"""
+        if not event_id:
+            return -1
+        epoch, _, sequence = event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return 0
+        return int(sequence)
+
+    def publish(self, topic: str, event: str, data: Any) -> str:
+        self._sequence += 1
+        item = (self._sequence, event, data)
+        self._replay.setdefault(topic, deque(maxlen=self.replay_size)).append(item)
+        for subscription in list(self._subscribers.get(topic, ())):
+            if subscription.accepts(data) and not subscription.offer(item):
+                # A client that cannot keep up is disconnected; it resumes from the replay buffer
+                self.unsubscribe(subscription)
+        return self._event_id(self._sequence)
+
+    def subscribe(self, topics: Iterable[str], predicate: Optional[Callable[[Any], bool]] = None,
+                  last_event_id: Optional[str] = None) -> Subscription:
+        if len(self._all) >= self.max_subscribers:
+            raise TooManySubscribers()
+        topics = tuple(dict.fromkeys(topics))
+        subscription = Subscription(self, topics, predicate, self.queue_size)
+
+        after = self._parse_event_id(last_event_id)
+        if after >= 0:
+            missed: List[Tuple[int, str, Any]] = []
+            for topic in topics:
+                missed.extend(item for item in self._replay.get(topic, ()) if item[0] > after)
+            for item in sorted(missed, key=lambda i: i[0])[-self.queue_size + 1:]:
+                if subscription.accepts(item[2]):
+                    subscription.offer(item)
+
+        for topic in topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        self._all.add(subscription)
+        self._ensure_heartbeat()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription not in self._all:
+            return
+        self._all.discard(subscription)
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+        # Wake the stream so it can finish, even when its queue is full. The newest queued event
+        # makes way, so the client ends on an unbroken prefix and resumes with the rest from replay
+        if not subscription.offer(CLOSED):
+            queued = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+            for item in queued[:-1] + [CLOSED]:
+                subscription.offer(item)
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+
+    async def _heartbeat(self):
+        while self._all:
+            await asyncio.sleep(self.heartbeat_seconds)
+            for subscription in list(self._all):
+                if subscription.queue.empty():
+                    subscription.offer(HEARTBEAT)
+
+    async def sse_stream(self, subscription: Subscription, retry_ms: int = 3000) -> AsyncIterator[str]:
+        """Render a subscription as text/event-stream frames"""
+        try:
+            yield f"retry: {retry_ms}\n: connected\n\n"
+            async for item in subscription:
+                if item is HEARTBEAT:
+                    yield ": ping\n\n"
+                    continue
+                sequence, event, data = item
+                payload = json.dumps(data, default=_json_default)
+                yield f"id: {self._event_id(sequence)}\nevent: {event}\ndata: {payload}\n\n"
+        finally:
+            subscription.close()
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
@@ -0,0 +1,95 @@
+"""Which lecturers can teach which subjects.
+
+Faculty records list the subjects they teach by name, typed by hand, so "Data  Structures" and
+"data structures" must match. Names are reduced to a key (accents stripped, lowercase, single
+spaces) and the index keeps two inverted maps over those keys: subject key -> faculty ids and
+subject id -> key. Finding a subject's qualified lecturers is then two dictionary lookups, and a
+faculty or subject write only touches the keys that record names.
+
+Keys are kept for names no subject has yet, so a lecturer created before the subject is still
+qualified once it exists. Subjects sharing a name (the same course taught in two semesters)
+share their lecturers. `QualificationIndex` tracks freshness like the search index;
+`qualification_map` builds a one-off mapping for the pure engines in scheduling.py.
+"""
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from search import VersionTracker, normalise
+
+KINDS = ("faculty", "subjects")
+# Fields each kind needs in memory
+QUALIFICATION_FIELDS = {"faculty": ("subjects",), "subjects": ("name",)}
+
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+def subject_key(name: Any) -> str:
+    return " ".join(normalise(name).split())
+
+
+class QualificationIndex(VersionTracker):
+    def __init__(self):
+        super().__init__()
+        self._subject_key: Dict[str, str] = {}
+        self._faculty_keys: Dict[str, Set[str]] = {}
+        self._faculty_by_key: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._faculty_keys)
+
+    # Maintenance
+
+    def upsert(self, kind: str, record: Dict[str, Any]):
+        if kind == "subjects":
+            self._subject_key[record["id"]] = subject_key(record.get("name"))
+            return
+        self.remove(kind, record["id"])
+        keys = {key for key in map(subject_key, record.get("subjects") or ()) if key}
+        self._faculty_keys[record["id"]] = keys
+        for key in keys:
+            self._faculty_by_key[key].add(record["id"])
+
+    def remove(self, kind: str, record_id: str):
+        if kind == "subjects":
+            self._subject_key.pop(record_id, None)
+            return
+        for key in self._faculty_keys.pop(record_id, ()):
+            faculty_ids = self._faculty_by_key[key]
+            faculty_ids.discard(record_id)
+            if not faculty_ids:
+                del self._faculty_by_key[key]
+
+    def replace_kind(self, kind: str, records: Iterable[Dict[str, Any]], version: Optional[int] = None):
+        if kind == "subjects":
+            self._subject_key = {}
+        else:
+            self._faculty_keys, self._faculty_by_key = {}, defaultdict(set)
+        for record in records:
+            self.upsert(kind, record)
+        self.synced(kind, version)
+
+    # Queries
+
+    def faculty_for(self, subject_id: str) -> FrozenSet[str]:
+        """Ids of the lecturers qualified to teach a subject"""
+        key = self._subject_key.get(subject_id)
+        return frozenset(self._faculty_by_key.get(key, _EMPTY)) if key else _EMPTY
+
+    def is_qualified(self, faculty_id: str, subject_id: str) -> bool:
+        key = self._subject_key.get(subject_id)
+        return key is not None and key in self._faculty_keys.get(faculty_id, _EMPTY)
+
+    def subject_map(self, subject_ids: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        """subject id -> sorted qualified faculty ids, for every (or the given) subject"""
+        return {
+            subject_id: sorted(self.faculty_for(subject_id))
+            for subject_id in (self._subject_key if subject_ids is None else subject_ids)
+        }
+
+
+def qualification_map(faculty: Iterable[Dict[str, Any]], subjects: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """subject id -> sorted ids of the lecturers qualified to teach it"""
+    index = QualificationIndex()
+    index.replace_kind("faculty", faculty)
+    index.replace_kind("subjects", subjects)
+    return index.subject_map()
@@ -0,0 +1,94 @@
+"""What-if scenarios: hypothetical edits applied to an in-memory snapshot and scheduled locally.
+
+Nothing here touches the database. The caller loads a snapshot once; every scenario works on
+its own copy, so the snapshot can be evaluated against many edit sets.
+"""
+import copy
+from typing import Any, Callable, Dict, List, Optional
+
+from scheduling import diff_entries, evaluate_timetable, greedy_schedule
+
+RESOURCES = ("faculty", "classrooms", "subjects", "batches")
+OPERATIONS = ("add", "update", "remove")
+
+
+class ScenarioError(ValueError):
+    pass
+
+
+def apply_edits(snapshot: Dict[str, List[Dict[str, Any]]], edits: List[Dict[str, Any]],
+                validate: Callable[[str, Dict[str, Any]], Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """A copy of `snapshot` with the edits applied in order.
+
+    Each edit is {"op": add|update|remove, "resource": faculty|classrooms|subjects|batches,
+    "id": ..., "data": {...}}; `validate(resource, record)` returns the record as it would be
+    stored (filling ids and defaults) or raises ValueError.
+    """
+    data = {resource: copy.deepcopy(snapshot.get(resource, [])) for resource in RESOURCES}
+    for number, edit in enumerate(edits, 1):
+        op, resource = edit.get("op"), edit.get("resource")
+        if op not in OPERATIONS or resource not in RESOURCES:
+            raise ScenarioError(f"edit {number}: op must be one of {OPERATIONS} and resource one of {RESOURCES}")
+        records = data[resource]
+        if op == "add":
+            try:
+                records.append(validate(resource, dict(edit.get("data") or {})))
+            except ValueError as e:
+                raise ScenarioError(f"edit {number}: {e}")
+            continue
+
+        position = next((i for i, r in enumerate(records) if r["id"] == edit.get("id")), None)
+        if position is None:
+            raise ScenarioError(f"edit {number}: no {resource} with id {edit.get('id')!r}")
+        if op == "remove":
+            del records[position]
+        else:
+            try:
+                records[position] = validate(resource, {**records[position], **(edit.get("data") or {})})
+            except ValueError as e:
+                raise ScenarioError(f"edit {number}: {e}")
+    return data
+
+
+def run_scenario(snapshot: Dict[str, List[Dict[str, Any]]], current: List[Dict[str, Any]], edits: List[Dict[str, Any]],
+                 constraints, validate: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                 batch_ids: Optional[List[str]] = None, include_entries: bool = False) -> Dict[str, Any]:
+    """Compare the stored timetable with what the local engine would produce after the edits.
+
+    current   the stored timetable judged against the edited data: what the edits break
+    baseline  the engine on the unedited snapshot, so engine quality is not mistaken for impact
+    proposed  the engine on the edited data, with its diff against the stored timetable
+
+    `current` is the whole stored timetable. With `batch_ids` only those batches are
+    rescheduled and judged; the other batches' entries stay as they are and keep their
+    lecturers and rooms busy.
+    """
+    edited = apply_edits(snapshot, edits, validate)
+    if batch_ids is None:
+        fixed = []
+    else:
+        fixed = [e for e in current if e["batch_id"] not in batch_ids]
+        current = [e for e in current if e["batch_id"] in batch_ids]
+
+    def scoped(data):
+        if batch_ids is None:
+            return data
+        return {**data, "batches": [b for b in data["batches"] if b["id"] in batch_ids]}
+
+    baseline_entries = greedy_schedule(scoped(snapshot), constraints, fixed)
+    proposed_entries = greedy_schedule(scoped(edited), constraints, fixed)
+    diff = diff_entries(current, proposed_entries)
+    result = {
+        "current": evaluate_timetable(current, scoped(edited), constraints, fixed),
+        "baseline": evaluate_timetable(baseline_entries, scoped(snapshot), constraints, fixed),
+        "proposed": evaluate_timetable(proposed_entries, scoped(edited), constraints, fixed),
+        "diff": diff,
+        "affected": {
+            "batches": len({r["batch_id"] for r in diff["added"] + diff["removed"] + diff["changed"]}),
+            "faculty": len({r["faculty_id"] for r in diff["added"] + diff["removed"]}
+                           | {side["faculty_id"] for r in diff["changed"] for side in (r["before"], r["after"])}),
+        },
+    }
+    if include_entries:
+        result["entries"] = proposed_entries
+    return result
@@ -0,0 +1,351 @@
+"""Local timetable rules: the weekly slot grid, constraint evaluation and a greedy baseline engine.
+
+Functions take plain dicts shaped like the stored documents and any object exposing the
+`TimetableConstraints` attributes, so they can run without a database. When only some batches
+are scheduled, the other batches' entries are passed as `fixed`: they hold their lecturers and
+rooms but are neither moved nor scored.
+"""
+from collections import defaultdict
+from statistics import pstdev
+from typing import Any, Dict, Iterable, List, Tuple
+
+from qualifications import qualification_map
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+HARD_CONSTRAINTS = (
+    "unknown_reference",    # entry points at a batch/subject/faculty/classroom that does not exist
+    "invalid_slot",         # day or time slot outside the grid, or inside the lunch break
+    "batch_clash",          # a batch has two sessions in the same slot
+    "faculty_clash",        # a lecturer teaches two sessions in the same slot
+    "room_clash",           # a classroom hosts two sessions in the same slot
+    "room_type",            # lab subject outside a lab (or theory in a lab)
+    "room_capacity",        # batch does not fit in the classroom
+    "unqualified_faculty",  # lecturer does not list the subject (names compared as qualifications.subject_key)
+    "faculty_daily_hours",  # lecturer above max_hours_per_day on a day (per excess hour)
+    "unscheduled_hours",    # weekly hours required by a subject that were not scheduled
+)
+
+SOFT_WEIGHTS = {
+    "consecutive_excess": 5.0,  # per hour beyond max_consecutive_hours in a batch's or lecturer's run
+    "back_to_back_labs": 10.0,  # per adjacent lab pair for a batch when no_back_to_back_labs is set
+    "batch_gaps": 1.0,          # per idle slot between a batch's first and last session of a day
+    "batch_daily_spread": 2.0,  # standard deviation of a batch's daily hours, summed over batches
+    "faculty_load_spread": 1.0, # standard deviation of weekly load across lecturers
+    "room_underuse": 1.0,       # per session, the share of the room's seats the batch leaves empty
+}
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def build_slot_grid(constraints) -> List[str]:
+    """Teaching periods of one day as "HH:MM-HH:MM" labels, skipping the lunch break.
+
+    Short breaks between periods are absorbed into the period length so labels stay on the
+    hourly grid the dashboards and absence forms use.
+    """
+    start, end = _minutes(constraints.start_time), _minutes(constraints.end_time)
+    lunch_start = _minutes(constraints.lunch_break_start)
+    lunch_end = lunch_start + constraints.lunch_break_duration
+    period = max(constraints.period_duration, 1)
+
+    slots = []
+    current = start
+    while current + period <= end:
+        if current < lunch_end and current + period > lunch_start:
+            current = lunch_end
+            continue
+        slots.append(f"{_hhmm(current)}-{_hhmm(current + period)}")
+        current += period
+    return slots
+
+
+def batch_subjects(batch: Dict[str, Any], subjects: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        s for s in subjects
+        if s["department"] == batch["department"] and s["year"] == batch["year"] and s["semester"] == batch["semester"]
+    ]
+
+
+def _runs(indices: Iterable[int]) -> List[int]:
+    """Lengths of runs of consecutive slot indices"""
+    runs, previous, length = [], None, 0
+    for index in sorted(indices):
+        if previous is not None and index == previous + 1:
+            length += 1
+        else:
+            if length:
+                runs.append(length)
+            length = 1
+        previous = index
+    if length:
+        runs.append(length)
+    return runs
+
+
+def qualified_faculty(data: Dict[str, Any]) -> Dict[str, List[str]]:
+    """subject id -> qualified faculty ids: the "qualified_faculty" the server sends from its
+    live index, or built from the faculty and subjects"""
+    if "qualified_faculty" in data:
+        return data["qualified_faculty"]
+    return qualification_map(data["faculty"], data["subjects"])
+
+
+def fixed_occupancy(fixed: Iterable[Dict[str, Any]], slot_index: Dict[str, int]) -> List[Tuple[str, str, str, int]]:
+    """(faculty_id, classroom_id, day, slot index) held by each fixed entry that sits on the grid"""
+    held = []
+    for entry in fixed:
+        index = slot_index.get(entry.get("time_slot"))
+        if entry.get("day") in DAYS and index is not None:
+            held.append((entry.get("faculty_id"), entry.get("classroom_id"), entry["day"], index))
+    return held
+
+
+def evaluate_timetable(entries: List[Dict[str, Any]], data: Dict[str, List[Dict[str, Any]]], constraints,
+                       fixed: Iterable[Dict[str, Any]] = ()) -> Dict[str, Any]:
+    """Count hard-constraint violations and compute a weighted soft cost for a set of entries.
+
+    Clashes with `fixed` entries and the hours they add to a lecturer's day count against
+    `entries`; clashes among the fixed entries themselves do not.
+    """
+    batches = {b["id"]: b for b in data["batches"]}
+    subjects = {s["id"]: s for s in data["subjects"]}
+    faculty = {f["id"]: f for f in data["faculty"]}
+    classrooms = {c["id"]: c for c in data["classrooms"]}
+    slot_index = {slot: i for i, slot in enumerate(build_slot_grid(constraints))}
+    qualified = {subject_id: set(ids) for subject_id, ids in qualified_faculty(data).items()}
+
+    hard = dict.fromkeys(HARD_CONSTRAINTS, 0)
+    batch_slots = defaultdict(int)
+    faculty_slots = defaultdict(int)
+    room_slots = defaultdict(int)
+    batch_day = defaultdict(list)
+    faculty_day = defaultdict(list)
+    batch_lab_slots = defaultdict(set)
+    scheduled_hours = defaultdict(int)
+    faculty_load = dict.fromkeys(faculty, 0)
+    room_underuse = 0.0
+    fixed_faculty_slots = defaultdict(int)
+    fixed_room_slots = defaultdict(int)
+    fixed_faculty_hours = defaultdict(int)
+    for faculty_id, room_id, day, index in fixed_occupancy(fixed, slot_index):
+        fixed_faculty_slots[(faculty_id, (day, index))] += 1
+        fixed_room_slots[(room_id, (day, index))] += 1
+        fixed_faculty_hours[(faculty_id, day)] += 1
+
+    for entry in entries:
+        batch = batches.get(entry.get("batch_id"))
+        subject = subjects.get(entry.get("subject_id"))
+        lecturer = faculty.get(entry.get("faculty_id"))
+        room = classrooms.get(entry.get("classroom_id"))
+        if not (batch and subject and lecturer and room):
+            hard["unknown_reference"] += 1
+            continue
+        day, index = entry.get("day"), slot_index.get(entry.get("time_slot"))
+        if day not in DAYS or index is None:
+            hard["invalid_slot"] += 1
+            continue
+
+        key = (day, index)
+        batch_slots[(batch["id"], key)] += 1
+        faculty_slots[(lecturer["id"], key)] += 1
+        room_slots[(room["id"], key)] += 1
+        batch_day[(batch["id"], day)].append(index)
+        faculty_day[(lecturer["id"], day)].append(index)
+        scheduled_hours[(batch["id"], subject["id"])] += 1
+        faculty_load[lecturer["id"]] += 1
+
+        if (subject["type"] == "lab") != (room["type"] == "lab"):
+            hard["room_type"] += 1
+        if batch.get("student_count", 0) > room.get("capacity", 0):
+            hard["room_capacity"] += 1
+        elif room.get("capacity", 0) > 0:
+            room_underuse += 1 - batch.get("student_count", 0) / room["capacity"]
+        if lecturer["id"] not in qualified.get(subject["id"], ()):
+            hard["unqualified_faculty"] += 1
+        if subject["type"] == "lab":
+            batch_lab_slots[(batch["id"], day)].add(index)
+
+    hard["batch_clash"] = sum(n - 1 for n in batch_slots.values() if n > 1)
+    hard["faculty_clash"] = sum(n - 1 + (fixed_faculty_slots.get(k, 0) > 0) for k, n in faculty_slots.items())
+    hard["room_clash"] = sum(n - 1 + (fixed_room_slots.get(k, 0) > 0) for k, n in room_slots.items())
+    hard["faculty_daily_hours"] = sum(
+        max(0, len(indices) + fixed_faculty_hours.get(k, 0) - constraints.max_hours_per_day)
+        - max(0, fixed_faculty_hours.get(k, 0) - constraints.max_hours_per_day)
+        for k, indices in faculty_day.items()
+    )
+    for batch in batches.values():
+        for subject in batch_subjects(batch, subjects.values()):
+            hard["unscheduled_hours"] += max(0, subject["hours_per_week"] - scheduled_hours[(batch["id"], subject["id"])])
+
+    soft = dict.fromkeys(SOFT_WEIGHTS, 0.0)
+    for indices in list(batch_day.values()) + list(faculty_day.values()):
+        soft["consecutive_excess"] += sum(max(0, run - constraints.max_consecutive_hours) for run in _runs(set(indices)))
+    if constraints.no_back_to_back_labs:
+        soft["back_to_back_labs"] = sum(
+            sum(1 for i in labs if i + 1 in labs) for labs in batch_lab_slots.values()
+        )
+    for indices in batch_day.values():
+        unique = set(indices)
+        soft["batch_gaps"] += max(unique) - min(unique) + 1 - len(unique)
+    for batch_id in batches:
+        daily = [len(batch_day.get((batch_id, day), ())) for day in DAYS]
+        soft["batch_daily_spread"] += pstdev(daily)
+    teaching_loads = [load for load in faculty_load.values() if load]
+    soft["faculty_load_spread"] = pstdev(teaching_loads) if len(teaching_loads) > 1 else 0.0
+    soft["room_underuse"] = room_underuse
+
+    return {
+        "entries": len(entries),
+        "hard_violations": hard,
+        "hard_total": sum(hard.values()),
+        "soft": {k: round(v, 3) for k, v in soft.items()},
+        "soft_cost": round(sum(SOFT_WEIGHTS[k] * v for k, v in soft.items()), 3),
+    }
+
+
+def greedy_schedule(data: Dict[str, List[Dict[str, Any]]], constraints,
+                    fixed: Iterable[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+    """Deterministic first-fit baseline engine.
+
+    Sessions are placed most-constrained first (labs, then subjects with few qualified
+    lecturers) into the batch's lightest day, with the least loaded qualified lecturer and
+    the smallest free room of the right type that fits the batch. Lecturers and rooms held by
+    `fixed` entries are busy in those slots, and their hours count towards lecturer loads.
+    """
+    slots = build_slot_grid(constraints)
+    grid = [(day, index) for index in range(len(slots)) for day in DAYS]
+    faculty = {f["id"]: f for f in data["faculty"]}
+    qualified = defaultdict(list)
+    for subject_id, faculty_ids in qualified_faculty(data).items():
+        qualified[subject_id] = [faculty[i] for i in sorted(faculty_ids) if i in faculty]
+    rooms_by_type = defaultdict(list)
+    for room in sorted(data["classrooms"], key=lambda c: (c["capacity"], c["id"])):
+        rooms_by_type[room["type"] == "lab"].append(room)
+
+    busy_batch, busy_faculty, busy_room = set(), set(), set()
+    faculty_day_hours = defaultdict(int)
+    faculty_load = defaultdict(int)
+    batch_day_hours = defaultdict(int)
+    batch_lab_slots = set()
+    for faculty_id, room_id, day, index in fixed_occupancy(fixed, {slot: i for i, slot in enumerate(slots)}):
+        busy_faculty.add((faculty_id, day, index))
+        busy_room.add((room_id, day, index))
+        faculty_day_hours[(faculty_id, day)] += 1
+        faculty_load[faculty_id] += 1
+
+    demands: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    for batch in sorted(data["batches"], key=lambda b: b["id"]):
+        for subject in batch_subjects(batch, data["subjects"]):
+            demands.extend((batch, subject) for _ in range(subject["hours_per_week"]))
+    demands.sort(key=lambda d: (d[1]["type"] != "lab", len(qualified[d[1]["id"]]), d[0]["id"], d[1]["id"]))
+
+    entries = []
+    for batch, subject in demands:
+        is_lab = subject["type"] == "lab"
+        teachers = qualified[subject["id"]]
+        rooms = [r for r in rooms_by_type[is_lab] if r["capacity"] >= batch["student_count"]]
+        if not teachers or not rooms:
+            continue
+        for day, index in sorted(grid, key=lambda g: (batch_day_hours[(batch["id"], g[0])], g[1], DAYS.index(g[0]))):
+            if (batch["id"], day, index) in busy_batch:
+                continue
+            if is_lab and constraints.no_back_to_back_labs and (
+                (batch["id"], day, index - 1) in batch_lab_slots or (batch["id"], day, index + 1) in batch_lab_slots
+            ):
+                continue
+            lecturer = min(
+                (f for f in teachers
+                 if (f["id"], day, index) not in busy_faculty and faculty_day_hours[(f["id"], day)] < constraints.max_hours_per_day),
+                key=lambda f: faculty_load[f["id"]],
+                default=None,
+            )
+            if lecturer is None:
+                continue
+            room = next((r for r in rooms if (r["id"], day, index) not in busy_room), None)
+            if room is None:
+                continue
+
+            busy_batch.add((batch["id"], day, index))
+            busy_faculty.add((lecturer["id"], day, index))
+            busy_room.add((room["id"], day, index))
+            faculty_day_hours[(lecturer["id"], day)] += 1
+            faculty_load[lecturer["id"]] += 1
+            batch_day_hours[(batch["id"], day)] += 1
+            if is_lab:
+                batch_lab_slots.add((batch["id"], day, index))
+            entries.append({
+                "batch_id": batch["id"],
+                "subject_id": subject["id"],
+                "faculty_id": lecturer["id"],
+                "classroom_id": room["id"],
+                "day": day,
+                "time_slot": slots[index],
+            })
+            break
+    return entries
+
+
+# An entry is identified by where it sits in a batch's week; the rest is its payload
+SLOT_KEY = ("batch_id", "day", "time_slot")
+ENTRY_FIELDS = ("subject_id", "faculty_id", "classroom_id")
+
+
+def slot_key(entry: Dict[str, Any]) -> Tuple[str, str, str]:
+    return tuple(entry[field] for field in SLOT_KEY)
+
+
+def compact_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: entry.get(field) for field in ("id",) + SLOT_KEY + ENTRY_FIELDS}
+
+
+def diff_entries(old: Iterable[Dict[str, Any]], new: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Slot-by-slot difference between two entry sets.
+
+    added/removed hold compact entries; changed holds {id, batch_id, day, time_slot, before, after}
+    where id is the stored entry's and before/after carry the subject, faculty and classroom.
+    Entries whose payload is identical are only counted in "unchanged". When several old entries
+    share a slot (a clash left by an earlier generation) all but the first are removed.
+    """
+    old_by_slot: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    diff = {"added": [], "removed": [], "changed": [], "unchanged": 0}
+    for entry in old:
+        if old_by_slot.setdefault(slot_key(entry), entry) is not entry:
+            diff["removed"].append(compact_entry(entry))
+    new_by_slot = {slot_key(e): e for e in new}
+    for key, entry in new_by_slot.items():
+        previous = old_by_slot.get(key)
+        if previous is None:
+            diff["added"].append(compact_entry(entry))
+        elif any(previous.get(f) != entry.get(f) for f in ENTRY_FIELDS):
+            diff["changed"].append({
+                "id": previous.get("id"),
+                **dict(zip(SLOT_KEY, key)),
+                "before": {f: previous.get(f) for f in ENTRY_FIELDS},
+                "after": {f: entry.get(f) for f in ENTRY_FIELDS},
+            })
+        else:
+            diff["unchanged"] += 1
+    diff["removed"].extend(compact_entry(e) for key, e in old_by_slot.items() if key not in new_by_slot)
+    return diff
+
+
+def split_diff_by_subscriber(diff: Dict[str, Any]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """Per-topic slices of a diff: "batch:<id>" and "faculty:<id>" each get only their own rows"""
+    slices: Dict[str, Dict[str, List[Dict[str, Any]]]] = defaultdict(lambda: {"added": [], "removed": [], "changed": []})
+    for kind in ("added", "removed"):
+        for entry in diff[kind]:
+            slices[f"batch:{entry['batch_id']}"][kind].append(entry)
+            slices[f"faculty:{entry['faculty_id']}"][kind].append(entry)
+    for change in diff["changed"]:
+        slices[f"batch:{change['batch_id']}"]["changed"].append(change)
+        for faculty_id in {change["before"]["faculty_id"], change["after"]["faculty_id"]}:
+            slices[f"faculty:{faculty_id}"]["changed"].append(change)
+    return dict(slices)
@@ -0,0 +1,251 @@
+"""In-memory autocomplete index over faculty, subjects, classrooms and batches.
+
+Every record is split into lowercase tokens from a few fields (name, code, email, ...). Each
+token's prefixes up to MAX_PREFIX characters map to the records containing it, together with
+the record's score for that prefix, so a prefix query is one dictionary lookup per query word
+and ranking needs no further work per record. When prefixes find fewer than `limit` records,
+trigram postings add fuzzy matches, so a typo ("algoritms") still finds its record.
+
+Autocomplete mostly sends one short word, whose postings can hold most of the index; each
+prefix therefore keeps its records sorted by rank, built on first use and dropped only when a
+write touches that prefix. Recent results are cached until the index next changes.
+
+Freshness across workers is tracked by resource versions: the index remembers the version of
+each kind it reflects and the versions this worker's own writes bumped it to since, and
+`stale_kinds` names the kinds some other worker changed. Recording versions rather than a count
+keeps a refresh that lands between a write's version bump and its index update from
+mistaking the next remote write for that local one.
+"""
+import heapq
+import re
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# kind -> ((field, weight), ...); the first field is the label shown in results
+SEARCH_FIELDS = {
+    "faculty": (("name", 1.0), ("email", 1.0), ("department", 0.5)),
+    "subjects": (("name", 1.0), ("code", 1.0), ("department", 0.5)),
+    "classrooms": (("name", 1.0), ("type", 0.5)),
+    "batches": (("name", 1.0), ("department", 0.5)),
+}
+MAX_PREFIX = 12
+FUZZY_MIN_SIMILARITY = 0.5
+RESULT_CACHE_SIZE = 1024
+_SPLIT = re.compile(r"[^0-9a-z]+")
+
+DocKey = Tuple[str, str]
+
+
+def normalise(text: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: Any) -> List[str]:
+    return [token for token in _SPLIT.split(normalise(text)) if token]
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VersionTracker:
+    """The resource version of each kind an in-memory index reflects, plus the versions this
+    worker's own writes produced since (already applied to the index)"""
+
+    def __init__(self):
+        self.versions: Dict[str, int] = {}
+        self._local_writes: Dict[str, Set[int]] = defaultdict(set)
+
+    def synced(self, kind: str, version: Optional[int]):
+        if version is not None:
+            self.versions[kind] = version
+            self._local_writes[kind] = {v for v in self._local_writes[kind] if v > version}
+
+    def note_local_write(self, kind: str, version: int):
+        """Record the version a write this worker applied to the index bumped `kind` to; a
+        version the index has already been synced past needs no record"""
+        known = self.versions.get(kind)
+        if known is None or version > known:
+            self._local_writes[kind].add(version)
+
+    def stale_kinds(self, versions: Dict[str, int]) -> List[str]:
+        """Kinds whose stored version moved past versions other than this worker's own writes"""
+        stale = []
+        for kind, version in versions.items():
+            known, own = self.versions.get(kind), self._local_writes[kind]
+            if known is not None and version >= known and own.issuperset(range(known + 1, version + 1)):
+                self.synced(kind, version)
+            else:
+                stale.append(kind)
+        return stale
+
+
+class SearchIndex(VersionTracker):
+    def __init__(self, fields: Dict[str, Tuple[Tuple[str, float], ...]] = SEARCH_FIELDS):
+        super().__init__()
+        self.fields = fields
+        self._docs: Dict[DocKey, Dict[str, Any]] = {}
+        self._tokens: Dict[DocKey, Dict[str, float]] = {}
+        self._labels: Dict[DocKey, str] = {}
+        self._prefixes: Dict[str, Dict[DocKey, float]] = defaultdict(dict)
+        self._ranked: Dict[str, List[Tuple[float, int, DocKey]]] = {}
+        self._trigrams: Dict[str, Set[DocKey]] = defaultdict(set)
+        self._results: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # Maintenance
+
+    def upsert(self, kind: str, record: Dict[str, Any]):
+        key = (kind, record["id"])
+        self._unlink(key)
+        weights: Dict[str, float] = {}
+        for field, weight in self.fields[kind]:
+            for token in tokenize(record.get(field)):
+                weights[token] = max(weight, weights.get(token, 0.0))
+        label_field = self.fields[kind][0][0]
+        self._docs[key] = {
+            "kind": kind,
+            "id": record["id"],
+            "label": record.get(label_field),
+            **{field: record.get(field) for field, _ in self.fields[kind][1:]},
+        }
+        self._tokens[key] = weights
+        self._labels[key] = normalise(record.get(label_field))
+        for token, weight in weights.items():
+            for end in range(1, min(len(token), MAX_PREFIX) + 1):
+                prefix = token[:end]
+                score = weight if end == len(token) else 0.8 * weight
+                postings = self._prefixes[prefix]
+                postings[key] = max(score, postings.get(key, 0.0))
+                self._ranked.pop(prefix, None)
+            for gram in trigrams(token):
+                self._trigrams[gram].add(key)
+        self._results.clear()
+
+    def remove(self, kind: str, record_id: str):
+        self._unlink((kind, record_id))
+
+    def _unlink(self, key: DocKey):
+        weights = self._tokens.pop(key, None)
+        self._docs.pop(key, None)
+        self._labels.pop(key, None)
+        if weights is None:
+            return
+        self._results.clear()
+        for token in weights:
+            for end in range(1, min(len(token), MAX_PREFIX) + 1):
+                self._discard(self._prefixes, token[:end], key)
+                self._ranked.pop(token[:end], None)
+            for gram in trigrams(token):
+                self._discard(self._trigrams, gram, key)
+
+    @staticmethod
+    def _discard(postings, term: str, key: DocKey):
+        keys = postings.get(term)
+        if keys is not None:
+            if isinstance(keys, dict):
+                keys.pop(key, None)
+            else:
+                keys.discard(key)
+            if not keys:
+                del postings[term]
+
+    def replace_kind(self, kind: str, records: Iterable[Dict[str, Any]], version: Optional[int] = None):
+        for key in [key for key in self._docs if key[0] == kind]:
+            self._unlink(key)
+        for record in records:
+            self.upsert(kind, record)
+        self.synced(kind, version)
+
+    # Queries
+
+    def _prefix_matches(self, token: str) -> Dict[DocKey, float]:
+        """Records with a token starting with `token`, with their score for it"""
+        keys = self._prefixes.get(token[:MAX_PREFIX], {})
+        if len(token) <= MAX_PREFIX:
+            return keys
+        return {key: score for key in keys if (score := self._token_score(key, token))}
+
+    def _fuzzy_matches(self, token: str) -> Dict[DocKey, float]:
+        grams = trigrams(token)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+        return {key: count / len(grams) for key, count in shared.items() if count / len(grams) >= FUZZY_MIN_SIMILARITY}
+
+    def _ranked_prefix(self, prefix: str) -> List[Tuple[float, int, DocKey]]:
+        """(score, -label length, key) of the prefix's records, best first"""
+        ranked = self._ranked.get(prefix)
+        if ranked is None:
+            ranked = self._ranked[prefix] = sorted((
+                (round(score + (0.2 if self._labels[key].startswith(prefix) else 0.0), 4), -len(self._labels[key]), key)
+                for key, score in self._prefixes.get(prefix, {}).items()
+            ), reverse=True)
+        return ranked
+
+    def _token_score(self, key: DocKey, token: str) -> float:
+        best = 0.0
+        for candidate, weight in self._tokens[key].items():
+            if candidate == token:
+                best = max(best, weight)
+            elif candidate.startswith(token):
+                best = max(best, 0.8 * weight)
+        return best
+
+    def search(self, query: str, kinds: Optional[Iterable[str]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Records matching every query word by prefix (or, failing that, fuzzily), best first"""
+        words = tokenize(query)
+        if not words:
+            return []
+        allowed = frozenset(kinds) if kinds else None
+        cache_key = (tuple(words), allowed, limit)
+        cached = self._results.get(cache_key)
+        if cached is not None:
+            self._results.move_to_end(cache_key)
+            return cached
+
+        if len(words) == 1 and len(words[0]) <= MAX_PREFIX:
+            ranked = self._ranked_prefix(words[0])
+            top = []
+            for value, _, key in ranked:
+                if allowed is None or key[0] in allowed:
+                    top.append({**self._docs[key], "score": value})
+                    if len(top) == limit:
+                        break
+            if len(top) == limit:
+                return self._remember(cache_key, top)
+
+        prefix = [self._prefix_matches(word) for word in words]
+        # Intersect starting from the rarest word
+        smallest = min(range(len(words)), key=lambda i: len(prefix[i]))
+        matches = {key for key in prefix[smallest]
+                   if all(key in p for p in prefix) and (allowed is None or key[0] in allowed)}
+        fuzzy: List[Dict[DocKey, float]] = [{} for _ in words]
+        if len(matches) < limit:
+            fuzzy = [self._fuzzy_matches(word) if len(word) >= 3 else {} for word in words]
+            candidates = set(prefix[0]) | set(fuzzy[0])
+            for i in range(1, len(words)):
+                candidates &= set(prefix[i]) | set(fuzzy[i])
+            matches |= {key for key in candidates if allowed is None or key[0] in allowed}
+
+        phrase = " ".join(words)
+
+        def score(key: DocKey) -> float:
+            total = sum(prefix[i].get(key) or 0.6 * fuzzy[i].get(key, 0.0) for i in range(len(words))) / len(words)
+            if self._labels[key].startswith(phrase):
+                total += 0.2
+            return round(total, 4)
+
+        ranked = heapq.nlargest(limit, ((score(key), -len(self._labels[key]), key) for key in matches))
+        return self._remember(cache_key, [{**self._docs[key], "score": value} for value, _, key in ranked])
+
+    def _remember(self, cache_key: tuple, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._results[cache_key] = results
+        if len(self._results) > RESULT_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return results
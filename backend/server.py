@@ -1,30 +1,191 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+import time as timer
+IMPORT_STARTED = timer.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Query
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, DeleteOne, DeleteMany, ReplaceOne
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timezone, time
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import socket
+import hashlib
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone, time
 import json
+import re
+from bulk_import import decode_stream, iter_csv_records, iter_json_records, import_records
+from dataset_generator import DatasetSpec, generate_dataset, write_dataset, dataset_summary
+from exports import FORMATS as EXPORT_FORMATS, RenderCache, session_rows, render_csv, render_ics, render_pdf
+from metrics import REGISTRY, CONTENT_TYPE, Gauge, MetricsMiddleware, MongoCommandMetrics, observe_llm_call, token_encoding
+from profiler import SlowQueryProfiler
+from week_matrix import encode_week, decode_week, bson_size
+from scenarios import ScenarioError, run_scenario
+from exam_scheduler import schedule_exams
+from leases import LeaseManager, LeaseUnavailable, LeaseLost
+from coalesce import SingleFlight
+from compression import CompressionMiddleware, EncodedBody
+from admission import AdmissionControl, Rejected
+from sessions import SessionStore
+from search import SEARCH_FIELDS, SearchIndex
+from qualifications import QUALIFICATION_FIELDS, QualificationIndex
+from fastapi.encoders import jsonable_encoder
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from academic_calendar import EXCEPTION_KINDS, WEEKDAYS, absence_date, parse_date, weekday_for, effective_day, expand_sessions
+from pubsub import Hub, TooManySubscribers, SSE_HEADERS
+from scheduling import DAYS, SLOT_KEY, build_slot_grid, diff_entries, split_diff_by_subscriber, slot_key, ENTRY_FIELDS
+from occupancy import (KINDS as OCCUPANCY_KINDS, META_ID as OCCUPANCY_META_ID, WRITERS_ID as OCCUPANCY_WRITERS_ID,
+                       occupancy_documents, occupancy_replacements, occupancy_updates, summarise as summarise_occupancy)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+slow_queries = SlowQueryProfiler(
+    threshold_ms=float(os.environ.get('SLOW_QUERY_MS', '100')),
+    explain=os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics(), slow_queries])
 db = client[os.environ['DB_NAME']]
 
 # LLM Integration
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
+# emergentintegrations pulls in litellm and provider SDKs, which dominates import time.
+# Most requests never touch the LLM, so the classes are imported on first use.
+LlmChat = None
+UserMessage = None
+# "lazy" (the default) imports the LLM stack on the first LLM request; "background" opts in to
+# importing it right after startup, trading worker memory for a faster first LLM request
+LLM_PRELOAD = os.environ.get('LLM_PRELOAD', 'lazy')
+
+def load_llm_integration():
+    global LlmChat, UserMessage
+    if LlmChat is None:
+        from emergentintegrations.llm.chat import LlmChat as chat_class, UserMessage as message_class
+        LlmChat, UserMessage = chat_class, message_class
+    # Token counting for the LLM metrics is only needed from here on
+    token_encoding()
+
+# Hedged substitute suggestions: how long to wait for the LLM before answering
+# with the local heuristic, and how long to keep waiting for a late upgrade
+SUBSTITUTE_LLM_DEADLINE = float(os.environ.get('SUBSTITUTE_LLM_DEADLINE', '1.5'))
+SUBSTITUTE_LLM_UPGRADE_TIMEOUT = float(os.environ.get('SUBSTITUTE_LLM_UPGRADE_TIMEOUT', '60'))
+
+# Push channel for announcements (Server-Sent Events); events are delivered to subscribers
+# of this worker, and the replay buffer covers clients that reconnect
+announcement_hub = Hub(
+    replay_size=int(os.environ.get('ANNOUNCEMENT_REPLAY_SIZE', '100')),
+    heartbeat_seconds=float(os.environ.get('STREAM_HEARTBEAT_SECONDS', '20')),
+    max_subscribers=int(os.environ.get('STREAM_MAX_SUBSCRIBERS', '10000'))
+)
+# Timetable changes, published per "batch:<id>" and "faculty:<id>" topic so each student
+# batch and lecturer only receives the slots that concern them
+timetable_hub = Hub(
+    replay_size=int(os.environ.get('TIMETABLE_REPLAY_SIZE', '20')),
+    heartbeat_seconds=float(os.environ.get('STREAM_HEARTBEAT_SECONDS', '20')),
+    max_subscribers=int(os.environ.get('STREAM_MAX_SUBSCRIBERS', '10000'))
+)
+
+# Rendered timetable exports, keyed by timetable version
+export_cache = RenderCache(max_bytes=int(os.environ.get('EXPORT_CACHE_MB', '64')) * 2 ** 20)
+TERM_START = os.environ.get('TERM_START')
+TERM_WEEKS = int(os.environ.get('TERM_WEEKS', '16'))
+TIMETABLE_TZ = os.environ.get('TIMETABLE_TZ')
+# Week-matrix documents kept per batch (see week_matrix.py)
+TIMETABLE_WEEK_HISTORY = int(os.environ.get('TIMETABLE_WEEK_HISTORY', '3'))
+# Longest date range the calendar endpoint expands in one request
+CALENDAR_MAX_DAYS = int(os.environ.get('CALENDAR_MAX_DAYS', '366'))
+ISO_DATE_PREFIX = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+# Timetable generation is serialised per batch across workers with leases in Mongo; an
+# identical request joins the job already running instead of generating twice
+LEASE_TTL_SECONDS = float(os.environ.get('LEASE_TTL_SECONDS', '30'))
+GENERATION_QUEUE_TIMEOUT = float(os.environ.get('GENERATION_QUEUE_TIMEOUT', '300'))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+batch_leases = LeaseManager(db.timetable_leases, ttl_seconds=LEASE_TTL_SECONDS)
+# job id -> task running it in this worker, so local waiters do not have to poll
+local_generation_jobs = {}
+
+# Hot reads (a whole batch opening its timetable at once) share one computation per burst,
+# and the result is reused for READ_CACHE_TTL seconds
+read_cache = SingleFlight("reads", ttl_seconds=float(os.environ.get('READ_CACHE_TTL', '1.0')))
+
+# Serialized and pre-compressed bodies of cacheable GET responses, keyed by resource version
+response_cache = RenderCache(max_bytes=int(os.environ.get('RESPONSE_CACHE_MB', '64')) * 2 ** 20)
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+
+# Admission control for endpoints that hold a worker for long (see admission.py): concurrent
+# requests per worker (503 beyond it) and requests per client per minute (429 beyond it)
+def admission_control(name, concurrency, rate_per_minute):
+    prefix = f"ADMISSION_{name.upper().replace('-', '_')}"
+    burst = os.environ.get(f'{prefix}_BURST')
+    return AdmissionControl(
+        name,
+        max_concurrent=int(os.environ.get(f'{prefix}_CONCURRENCY', concurrency)),
+        rate_per_minute=float(os.environ.get(f'{prefix}_RATE', rate_per_minute)),
+        burst=int(burst) if burst else None
+    )
+
+generate_admission = admission_control("generate", '4', '6')
+substitute_admission = admission_control("substitute", '16', '30')
+sample_data_admission = admission_control("sample-data", '1', '2')
+# Behind a reverse proxy every request comes from the proxy; only trust X-Forwarded-For when
+# the proxy sets it, or clients could pick their own identity
+TRUST_FORWARDED_FOR = os.environ.get('TRUST_FORWARDED_FOR', 'false').lower() == 'true'
+
+# Login sessions (see sessions.py); SESSION_CACHE_SECONDS bounds how long a logout takes to
+# reach the other workers
+session_store = SessionStore(
+    db.sessions,
+    ttl_seconds=float(os.environ.get('SESSION_TTL_HOURS', '12')) * 3600,
+    cache_size=int(os.environ.get('SESSION_CACHE_SIZE', '10000')),
+    cache_seconds=float(os.environ.get('SESSION_CACHE_SECONDS', '60'))
+)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# Autocomplete index over faculty, subjects, classrooms and batches (see search.py) and the
+# subject -> qualified faculty index (see qualifications.py); writes on other workers show up
+# within SEARCH_REFRESH_SECONDS
+search_index = SearchIndex()
+qualification_index = QualificationIndex()
+SEARCH_REFRESH_SECONDS = float(os.environ.get('SEARCH_REFRESH_SECONDS', '1.0'))
+search_state = {"checked_at": None, "lock": asyncio.Lock()}
+qualification_state = {"checked_at": None, "lock": asyncio.Lock()}
+
+# Strong references to fire-and-forget tasks so they are not garbage collected
+background_tasks = set()
+
+startup_seconds = REGISTRY.register(Gauge(
+    "process_startup_seconds", "Time spent in each startup phase of this worker", ("phase",)))
+
+# Startup status reported by the readiness endpoint
+startup_state = {"ready": False, "phases": {}, "errors": []}
+
+@asynccontextmanager
+async def lifespan(app):
+    lifespan_started = timer.perf_counter()
+    startup_state["phases"]["import"] = round(lifespan_started - IMPORT_STARTED, 4)
+    startup_seconds.set(lifespan_started - IMPORT_STARTED, phase="import")
+    slow_queries.attach(asyncio.get_running_loop(), client)
+    
+    # Accept liveness probes right away; readiness flips once Mongo is reachable and indexes exist
+    preparation = spawn_background(prepare_worker(lifespan_started))
+    if LLM_PRELOAD == "background":
+        spawn_background(preload_llm_integration())
+    yield
+    preparation.cancel()
+    client.close()
+
 # Create the main app without a prefix
-app = FastAPI(title="University Class Scheduling Platform")
+app = FastAPI(title="University Class Scheduling Platform", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -148,6 +309,8 @@ class Absence(BaseModel):
     reason: str
     status: str = "pending"  # pending, approved, substituted
     substitute_id: Optional[str] = None
+    substitute_reason: Optional[str] = None
+    substitute_source: Optional[str] = None  # heuristic, llm
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class AbsenceCreate(BaseModel):
@@ -156,6 +319,43 @@ class AbsenceCreate(BaseModel):
     time_slot: str
     reason: str
 
+class CalendarException(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    date: str  # ISO date
+    kind: str  # holiday, day_swap, cancellation
+    description: Optional[str] = None
+    batch_ids: Optional[List[str]] = None  # None applies to every batch
+    follows_day: Optional[str] = None  # day_swap: weekday whose timetable runs on this date
+    time_slot: Optional[str] = None  # cancellation
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class CalendarExceptionCreate(BaseModel):
+    date: str
+    kind: str
+    description: Optional[str] = None
+    batch_ids: Optional[List[str]] = None
+    follows_day: Optional[str] = None
+    time_slot: Optional[str] = None
+
+class ScenarioEdit(BaseModel):
+    op: str  # add, update, remove
+    resource: str  # faculty, classrooms, subjects, batches
+    id: Optional[str] = None  # update, remove
+    data: Dict[str, Any] = {}  # add, update
+
+class ScenarioRequest(BaseModel):
+    edits: List[ScenarioEdit] = []
+    batch_ids: Optional[List[str]] = None  # None schedules every batch
+    constraints: Dict[str, Any] = {}
+    include_entries: bool = False
+
+class ExamScheduleRequest(BaseModel):
+    dates: List[str]  # ISO dates of the exam days
+    sessions: List[str] = ["09:00-12:00", "14:00-17:00"]
+    batch_ids: Optional[List[str]] = None  # None examines every batch
+    enrollments: Dict[str, List[str]] = {}  # batch id -> extra subject ids (electives, repeats)
+    room_types: Optional[List[str]] = ["lecture_hall", "seminar_room"]  # None allows every room
+
 class TimetableConstraints(BaseModel):
     start_time: str = "09:00"
     end_time: str = "17:00"
@@ -167,7 +367,50 @@ class TimetableConstraints(BaseModel):
     no_back_to_back_labs: bool = True
     max_consecutive_hours: int = 3
 
+async def send_llm_message(chat, user_message, operation):
+    """Send a message to the LLM, recording latency and token counts for /metrics"""
+    started = timer.perf_counter()
+    response = None
+    outcome = "error"
+    try:
+        response = await chat.send_message(user_message)
+        outcome = "success"
+        return response
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        observe_llm_call(operation, timer.perf_counter() - started, outcome, user_message.text, response)
+
+# Admission control
+def client_identity(request: Request) -> str:
+    if TRUST_FORWARDED_FOR and request.headers.get("x-forwarded-for"):
+        return request.headers["x-forwarded-for"].split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def admitted(control: AdmissionControl):
+    """Dependency holding one of the endpoint's slots for the duration of the request"""
+    async def dependency(request: Request):
+        try:
+            ticket = control.admit(client_identity(request))
+        except Rejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.message,
+                                headers={"Retry-After": str(e.retry_after)})
+        try:
+            yield ticket
+        finally:
+            if not ticket.handed_off:
+                ticket.release()
+    return dependency
+
 # Authentication Routes
+async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)):
+    """The user of the request's bearer token; 401 without a live session"""
+    user = await session_store.resolve(credentials.credentials) if credentials else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return user
+
 @api_router.post("/auth/login")
 async def login(user_data: dict):
     """Mock authentication - in real app, integrate with Firebase"""
@@ -189,19 +432,24 @@ async def login(user_data: dict):
         await db.users.insert_one(mock_user.dict())
         user = mock_user.dict()
     
+    session = await session_store.issue(user)
     return {
         "success": True,
-        "user": {
-            "id": user["id"],
-            "email": user["email"],
-            "name": user["name"],
-            "role": user["role"],
-            "department": user.get("department"),
-            "batch": user.get("batch")
-        },
-        "token": f"mock-token-{uuid.uuid4()}"
+        "user": session["user"],
+        "token": session["token"],
+        "expires_at": session["expires_at"]
     }
 
+@api_router.get("/auth/me")
+async def get_me(user: dict = Depends(get_current_user)):
+    return user
+
+@api_router.post("/auth/logout")
+async def logout(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)):
+    if not credentials or not await session_store.revoke(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return {"success": True}
+
 # User Management
 @api_router.post("/users", response_model=User)
 async def create_user(user: UserCreate):
@@ -215,12 +463,65 @@ async def get_users():
     users = await db.users.find().to_list(1000)
     return [User(**user) for user in users]
 
+# Resource versions
+# Monotonic counters in the resource_versions collection, bumped on every write that changes
+# what a cached rendering would contain: "timetable:<scope>:<id>" for a batch, lecturer or
+# classroom timetable, "reference" for the names those timetables are joined with, and the
+# collection name for cached lists ("subjects", "announcements") and for every write to a
+# collection the in-memory indexes cover ("faculty", "subjects", "classrooms", "batches").
+async def bump_versions(keys):
+    """Increment each key's version; returns key -> the version this write produced"""
+    documents = await asyncio.gather(*(
+        db.resource_versions.find_one_and_update(
+            {"_id": key}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        for key in sorted(set(keys))
+    ))
+    return {document["_id"]: document["version"] for document in documents}
+
+async def get_versions(keys):
+    found = {doc["_id"]: doc["version"] async for doc in db.resource_versions.find({"_id": {"$in": list(keys)}})}
+    return [found.get(key, 0) for key in keys]
+
+async def versioned_json(request, key, version_keys, compute):
+    """Serve `compute()` as JSON from a body cached per resource version, in the best encoding
+    the client accepts; an unchanged version is answered with 304"""
+    versions = await get_versions(version_keys)
+    cache_key = (*key, *versions)
+    etag = 'W/"' + "-".join(str(part) for part in cache_key) + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    body = response_cache.get(cache_key)
+    if body is None:
+        async def render():
+            data = json.dumps(jsonable_encoder(await compute())).encode()
+            # Compression is CPU bound; keep it off the event loop
+            return await asyncio.to_thread(EncodedBody, data, "application/json", COMPRESS_MIN_BYTES)
+        body = await read_cache.do(cache_key, render)
+        response_cache.put(cache_key, body)
+    return body.response(request.headers.get("accept-encoding"), headers)
+
+def timetable_version_keys(diff):
+    keys = set()
+    for row in diff["added"] + diff["removed"]:
+        keys.update({f"timetable:batch:{row['batch_id']}", f"timetable:faculty:{row['faculty_id']}",
+                     f"timetable:classroom:{row['classroom_id']}"})
+    for row in diff["changed"]:
+        keys.add(f"timetable:batch:{row['batch_id']}")
+        for side in (row["before"], row["after"]):
+            keys.update({f"timetable:faculty:{side['faculty_id']}", f"timetable:classroom:{side['classroom_id']}"})
+    return keys
+
 # Faculty Management
 @api_router.post("/faculty", response_model=Faculty)
 async def create_faculty(faculty: FacultyCreate):
     faculty_dict = faculty.dict()
     faculty_obj = Faculty(**faculty_dict)
     await db.faculty.insert_one(faculty_obj.dict())
+    versions = await bump_versions(["faculty"])
+    index_record("faculty", faculty_obj.dict(), versions["faculty"])
     return faculty_obj
 
 @api_router.get("/faculty", response_model=List[Faculty])
@@ -243,7 +544,9 @@ async def update_faculty(faculty_id: str, faculty_update: FacultyCreate):
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Faculty not found")
+    versions = await bump_versions(["reference", "faculty"])
     updated_faculty = await db.faculty.find_one({"id": faculty_id})
+    index_record("faculty", updated_faculty, versions["faculty"])
     return Faculty(**updated_faculty)
 
 @api_router.delete("/faculty/{faculty_id}")
@@ -251,6 +554,8 @@ async def delete_faculty(faculty_id: str):
     result = await db.faculty.delete_one({"id": faculty_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Faculty not found")
+    versions = await bump_versions(["reference", "faculty"])
+    unindex_record("faculty", faculty_id, versions["faculty"])
     return {"message": "Faculty deleted successfully"}
 
 # Classroom Management
@@ -259,6 +564,8 @@ async def create_classroom(classroom: ClassroomCreate):
     classroom_dict = classroom.dict()
     classroom_obj = Classroom(**classroom_dict)
     await db.classrooms.insert_one(classroom_obj.dict())
+    versions = await bump_versions(["classrooms"])
+    index_record("classrooms", classroom_obj.dict(), versions["classrooms"])
     return classroom_obj
 
 @api_router.get("/classrooms", response_model=List[Classroom])
@@ -271,6 +578,8 @@ async def delete_classroom(classroom_id: str):
     result = await db.classrooms.delete_one({"id": classroom_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Classroom not found")
+    versions = await bump_versions(["reference", "classrooms"])
+    unindex_record("classrooms", classroom_id, versions["classrooms"])
     return {"message": "Classroom deleted successfully"}
 
 # Subject Management
@@ -279,10 +588,15 @@ async def create_subject(subject: SubjectCreate):
     subject_dict = subject.dict()
     subject_obj = Subject(**subject_dict)
     await db.subjects.insert_one(subject_obj.dict())
+    versions = await bump_versions(["subjects"])
+    index_record("subjects", subject_obj.dict(), versions["subjects"])
     return subject_obj
 
 @api_router.get("/subjects", response_model=List[Subject])
-async def get_subjects():
+async def get_subjects(request: Request):
+    return await versioned_json(request, ("subjects",), ["subjects"], load_subjects)
+
+async def load_subjects():
     subjects = await db.subjects.find().to_list(1000)
     return [Subject(**s) for s in subjects]
 
@@ -300,6 +614,8 @@ async def delete_subject(subject_id: str):
     result = await db.subjects.delete_one({"id": subject_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Subject not found")
+    versions = await bump_versions(["reference", "subjects"])
+    unindex_record("subjects", subject_id, versions["subjects"])
     return {"message": "Subject deleted successfully"}
 
 # Student Batch Management
@@ -308,6 +624,8 @@ async def create_batch(batch: StudentBatchCreate):
     batch_dict = batch.dict()
     batch_obj = StudentBatch(**batch_dict)
     await db.batches.insert_one(batch_obj.dict())
+    versions = await bump_versions(["batches"])
+    index_record("batches", batch_obj.dict(), versions["batches"])
     return batch_obj
 
 @api_router.get("/batches", response_model=List[StudentBatch])
@@ -320,17 +638,256 @@ async def delete_batch(batch_id: str):
     result = await db.batches.delete_one({"id": batch_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Batch not found")
+    versions = await bump_versions(["reference", "batches"])
+    unindex_record("batches", batch_id, versions["batches"])
     return {"message": "Batch deleted successfully"}
 
+# Search and qualifications
+SEARCH_INDEX_FIELDS = {kind: [field for field, _ in fields] for kind, fields in SEARCH_FIELDS.items()}
+# (index, refresh state, kind -> fields it keeps) for every in-memory index
+MEMORY_INDEXES = (
+    (search_index, search_state, SEARCH_INDEX_FIELDS),
+    (qualification_index, qualification_state, QUALIFICATION_FIELDS),
+)
+
+def index_record(kind, record, version):
+    """Apply this worker's own write to the in-memory indexes; `version` is what the write's
+    bump_versions returned for `kind`"""
+    for index, _, fields in MEMORY_INDEXES:
+        if kind in fields:
+            index.upsert(kind, record)
+            index.note_local_write(kind, version)
+
+def unindex_record(kind, record_id, version):
+    for index, _, fields in MEMORY_INDEXES:
+        if kind in fields:
+            index.remove(kind, record_id)
+            index.note_local_write(kind, version)
+
+def invalidate_memory_indexes():
+    """Check versions on the next use, after a bulk write that bypassed index_record"""
+    for _, state, _ in MEMORY_INDEXES:
+        state["checked_at"] = None
+
+async def refresh_memory_index(index, state, fields):
+    """Reload the kinds another worker (or a bulk write) changed, checking at most every
+    SEARCH_REFRESH_SECONDS"""
+    def due():
+        checked_at = state["checked_at"]
+        return checked_at is None or timer.monotonic() - checked_at >= SEARCH_REFRESH_SECONDS
+    if not due():
+        return
+    async with state["lock"]:
+        if not due():
+            return
+        kinds = list(fields)
+        versions = dict(zip(kinds, await get_versions(kinds)))
+        for kind in index.stale_kinds(versions):
+            projection = {"_id": 0, "id": 1, **{field: 1 for field in fields[kind]}}
+            records = await db[kind].find({}, projection).to_list(None)
+            index.replace_kind(kind, records, versions[kind])
+        state["checked_at"] = timer.monotonic()
+
+async def refresh_search_index():
+    await refresh_memory_index(search_index, search_state, SEARCH_INDEX_FIELDS)
+
+async def refresh_qualification_index():
+    await refresh_memory_index(qualification_index, qualification_state, QUALIFICATION_FIELDS)
+
+@api_router.get("/search")
+async def search_records(q: str, kinds: Optional[str] = None, limit: int = Query(10, ge=1, le=100)):
+    """Ranked autocomplete matches by name, code, email or department"""
+    selected = kinds.split(",") if kinds else None
+    if selected and set(selected) - set(SEARCH_FIELDS):
+        raise HTTPException(status_code=400, detail=f"kinds must be among {', '.join(SEARCH_FIELDS)}")
+    await refresh_search_index()
+    return {"query": q, "results": search_index.search(q, selected, limit)}
+
+# Bulk Import
+# resource -> (collection, create model, stored model, natural key used for upserts, list-valued fields)
+IMPORT_SPECS = {
+    "faculty": ("faculty", FacultyCreate, Faculty, "email", ("subjects",)),
+    "subjects": ("subjects", SubjectCreate, Subject, "code", ()),
+    "classrooms": ("classrooms", ClassroomCreate, Classroom, "name", ("equipment",)),
+    "batches": ("batches", StudentBatchCreate, StudentBatch, "name", ()),
+}
+
+@api_router.post("/import/{resource}")
+async def bulk_import(resource: str, request: Request, format: Optional[str] = None, mode: str = "upsert"):
+    """Import a CSV file or JSON array, sent as the raw body or as a multipart "file" field"""
+    if resource not in IMPORT_SPECS:
+        raise HTTPException(status_code=404, detail=f"Unknown import resource: {resource}")
+    if mode not in ("upsert", "insert"):
+        raise HTTPException(status_code=400, detail="mode must be 'upsert' or 'insert'")
+    collection_name, create_model, model, key, list_fields = IMPORT_SPECS[resource]
+    
+    content_type = request.headers.get("content-type", "")
+    filename = ""
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Expected a file upload in the 'file' field")
+        filename = upload.filename or ""
+        content_type = upload.content_type or ""
+        
+        async def byte_chunks():
+            while chunk := await upload.read(64 * 1024):
+                yield chunk
+    else:
+        byte_chunks = request.stream
+    
+    format = (format or "").lower()
+    if not format:
+        format = "csv" if filename.lower().endswith(".csv") or "csv" in content_type else "json"
+    if format not in ("csv", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'json'")
+    
+    parse = iter_csv_records if format == "csv" else iter_json_records
+    report = await import_records(
+        db[collection_name],
+        parse(decode_stream(byte_chunks())),
+        create_model,
+        model,
+        key,
+        list_fields=list_fields,
+        mode=mode
+    )
+    await bump_versions(["reference", resource])
+    # Reloaded from the collection on next use
+    invalidate_memory_indexes()
+    return report.as_dict()
+
 # Timetable Generation with AI
+def generation_key(request):
+    payload = json.dumps({"batch_ids": sorted(set(request.batch_ids)), "constraints": request.constraints},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def execute_generation_job(job, request):
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(LEASE_TTL_SECONDS / 3)
+            await db.generation_jobs.update_one({"id": job["id"]}, {"$set": {"heartbeat_at": datetime.now(timezone.utc)}})
+    
+    beating = asyncio.create_task(heartbeat())
+    try:
+        async with batch_leases.hold([f"batch:{b}" for b in request.batch_ids], job["id"], GENERATION_QUEUE_TIMEOUT) as lease:
+            # While this job was queued, an identical one may have finished; reuse its result
+            finished = await db.generation_jobs.find_one(
+                {"key": job["key"], "status": "succeeded", "finished_at": {"$gte": job["created_at"]}},
+                {"_id": 0, "id": 1, "result": 1}
+            )
+            if finished:
+                result = {**finished["result"], "reused_job_id": finished["id"]}
+            else:
+                await db.generation_jobs.update_one(
+                    {"id": job["id"]},
+                    {"$set": {"status": "running", "started_at": datetime.now(timezone.utc), "fences": lease.tokens}}
+                )
+                result = await run_generation(request, lease)
+        status = "succeeded" if result.get("success") else "failed"
+    except LeaseUnavailable as e:
+        result, status = {"success": False, "message": f"Another generation is still running: {e}"}, "failed"
+    except Exception as e:
+        result, status = {"success": False, "message": f"Error generating timetable: {str(e)}"}, "failed"
+    finally:
+        beating.cancel()
+    await db.generation_jobs.update_one(
+        {"id": job["id"]},
+        {"$set": {"status": status, "result": result, "finished_at": datetime.now(timezone.utc)}}
+    )
+    return result
+
+async def wait_for_generation_job(job_id):
+    task = local_generation_jobs.get(job_id)
+    if task is not None:
+        await asyncio.shield(task)
+    delay = 0.25
+    while True:
+        job = await db.generation_jobs.find_one({"id": job_id}, {"_id": 0})
+        if job is None:
+            return {"success": False, "message": "Generation job not found"}
+        if job["status"] in ("succeeded", "failed"):
+            return job["result"]
+        heartbeat = job["heartbeat_at"].replace(tzinfo=job["heartbeat_at"].tzinfo or timezone.utc)
+        if datetime.now(timezone.utc) - heartbeat > timedelta(seconds=3 * LEASE_TTL_SECONDS):
+            return {"success": False, "message": "Generation job stopped responding"}
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 2.0)
+
 @api_router.post("/timetable/generate")
-async def generate_timetable(request: TimetableGenRequest):
+async def generate_timetable(request: TimetableGenRequest, wait: bool = True,
+                             ticket=Depends(admitted(generate_admission))):
+    """Generate timetables for the given batches, at most one job per batch across all workers.
+
+    An identical request (same batches and constraints) joins the running job; an overlapping
+    one queues until the batches it shares are released. With wait=false the job id is returned
+    immediately and the outcome is read from /timetable/generate/jobs/{job_id}.
+    """
+    key = generation_key(request)
+    stale = datetime.now(timezone.utc) - timedelta(seconds=3 * LEASE_TTL_SECONDS)
+    job = await db.generation_jobs.find_one(
+        {"key": key, "status": {"$in": ["queued", "running"]}, "heartbeat_at": {"$gte": stale}}, {"_id": 0}
+    )
+    joined = job is not None
+    if not joined:
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "key": key,
+            "batch_ids": request.batch_ids,
+            "status": "queued",
+            "worker": WORKER_ID,
+            "created_at": now,
+            "heartbeat_at": now
+        }
+        await db.generation_jobs.insert_one(dict(job))
+        task = spawn_background(execute_generation_job(job, request))
+        local_generation_jobs[job["id"]] = task
+        task.add_done_callback(lambda _: local_generation_jobs.pop(job["id"], None))
+        # The job keeps the generation slot after a wait=false request has returned
+        ticket.hand_off(task)
+    
+    if not wait:
+        return JSONResponse(status_code=202, content={"success": True, "job_id": job["id"], "joined": joined,
+                                                      "status": "running" if joined else "queued"})
+    result = await wait_for_generation_job(job["id"])
+    return {**result, "job_id": job["id"], "joined": joined}
+
+@api_router.get("/timetable/generate/jobs/{job_id}")
+async def get_generation_job(job_id: str):
+    job = await db.generation_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return job
+
+def changed_batches(batch_ids, diff):
+    touched = {row["batch_id"] for row in diff["added"] + diff["removed"] + diff["changed"]}
+    return [b for b in batch_ids if b in touched]
+
+async def verify_inserted(lease, inserted_ids, fence):
+    """Inserts into empty slots have nothing to be fenced against, so the lease is checked again
+    after them. If it was lost meanwhile, the rows are taken back unless a newer holder has
+    already rewritten them."""
+    try:
+        await lease.verify()
+    except LeaseLost:
+        batch_ids = [resource.split(":", 1)[1] for resource in lease.tokens]
+        await db.timetable.delete_many({
+            "_id": {"$in": list(inserted_ids)},
+            "$or": [{"batch_id": b, "fence": fence(b)} for b in batch_ids]
+        })
+        raise
+
+async def run_generation(request, lease):
     try:
         # Get data for timetable generation
         batches = await db.batches.find({"id": {"$in": request.batch_ids}}).to_list(1000)
         faculty = await db.faculty.find().to_list(1000)
         classrooms = await db.classrooms.find().to_list(1000)
         subjects = await db.subjects.find().to_list(1000)
+        await refresh_qualification_index()
         
         # Prepare data for AI
         timetable_data = {
@@ -338,10 +895,12 @@ async def generate_timetable(request: TimetableGenRequest):
             "faculty": [Faculty(**f).dict() for f in faculty],
             "classrooms": [Classroom(**c).dict() for c in classrooms],
             "subjects": [Subject(**s).dict() for s in subjects],
+            "qualified_faculty": qualification_index.subject_map([s["id"] for s in subjects]),
             "constraints": request.constraints
         }
         
         # Initialize LLM Chat
+        load_llm_integration()
         chat = LlmChat(
             api_key=EMERGENT_LLM_KEY,
             session_id=f"timetable-gen-{uuid.uuid4()}",
@@ -357,7 +916,7 @@ Constraints to consider:
 1. No faculty should have more than {request.constraints.get('max_hours_per_day', 6)} hours per day
 2. No back-to-back lab sessions for students
 3. Respect classroom capacity and type (labs for lab subjects)
-4. Ensure faculty expertise matches subjects
+4. Only assign a subject to the faculty listed for its id in qualified_faculty
 5. Balance workload across faculty
 6. Consider break times and lunch breaks
 7. No scheduling conflicts
@@ -378,26 +937,94 @@ Ensure the response is valid JSON only, no additional text.
 """
         
         user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        response = await send_llm_message(chat, user_message, "timetable_generation")
         
         # Parse AI response
         try:
             timetable_entries = json.loads(response)
             
-            # Clear existing timetable for these batches
-            await db.timetable.delete_many({"batch_id": {"$in": request.batch_ids}})
+            # Tokens are per batch lease; those of different batches are unrelated counters
+            def fence(batch_id):
+                return lease.tokens[f"batch:{batch_id}"]
             
-            # Save new timetable entries
-            saved_entries = []
+            # Validate every entry before touching the stored timetable; one entry per slot
+            generated = {}
             for entry in timetable_entries:
-                timetable_entry = TimetableEntry(**entry)
-                await db.timetable.insert_one(timetable_entry.dict())
-                saved_entries.append(timetable_entry)
+                timetable_entry = TimetableEntry(**entry).dict()
+                # Only the leased batches may be written
+                if timetable_entry["batch_id"] in request.batch_ids:
+                    timetable_entry["fence"] = fence(timetable_entry["batch_id"])
+                    generated[slot_key(timetable_entry)] = timetable_entry
+            
+            previous_entries = await db.timetable.find(
+                {"batch_id": {"$in": request.batch_ids}}, {"_id": 0}
+            ).to_list(None)
+            stored = {}
+            for entry in previous_entries:
+                stored.setdefault(slot_key(entry), entry)
+            
+            # Write only the slots that changed, in a single round trip. Entries carry the fencing
+            # token of their batch's lease, so a worker whose lease expired mid-generation
+            # cannot overwrite or delete what a newer holder of that batch wrote.
+            diff = diff_entries(previous_entries, generated.values())
+            
+            def fenced(row):
+                return {"id": row["id"], "fence": {"$not": {"$gt": fence(row["batch_id"])}}}
+            
+            # A new slot is only filled if it is still empty, so an insert never lands next to
+            # what someone else wrote there in the meantime
+            operations = [UpdateOne({field: row[field] for field in SLOT_KEY},
+                                    {"$setOnInsert": dict(generated[slot_key(row)])}, upsert=True)
+                          for row in diff["added"]]
+            operations += [UpdateOne(fenced(row), {"$set": {**row["after"], "fence": fence(row["batch_id"])}})
+                           for row in diff["changed"]]
+            operations += [DeleteOne(fenced(row)) for row in diff["removed"]]
+            if operations:
+                await lease.verify()
+                async with occupancy_write():
+                    written = await db.timetable.bulk_write(operations, ordered=False)
+                    if written.upserted_count:
+                        await verify_inserted(lease, written.upserted_ids.values(), fence)
+                    occupied = len(diff["added"]) - written.upserted_count
+                    applied = (written.upserted_count, written.matched_count - occupied, written.deleted_count)
+                    planned = (len(diff["added"]), len(diff["changed"]), len(diff["removed"]))
+                    await update_occupancy(diff, complete=applied == planned)
+                version_keys = timetable_version_keys(diff)
+                await bump_versions(version_keys)
+                for key in version_keys:
+                    _, scope, scope_id = key.split(":", 2)
+                    if scope == "faculty":
+                        read_cache.invalidate(("faculty_timetable", scope_id))
+                if applied != planned:
+                    # Some slots were rewritten under a newer fence (or edited) since they were read, so
+                    # the planned diff is not what happened: report and publish what the collection holds
+                    stored_now = await db.timetable.find(
+                        {"batch_id": {"$in": request.batch_ids}}, {"_id": 0}
+                    ).to_list(None)
+                    landed = diff_entries(previous_entries, stored_now)
+                    await store_weeks(changed_batches(request.batch_ids, landed), stored_now)
+                    publish_timetable_diff(landed, "generated")
+                    return {
+                        "success": False,
+                        "message": f"The timetable changed during generation: {sum(applied)} of {sum(planned)} "
+                                   f"slot changes were applied; generate again to retry",
+                        "diff": landed
+                    }
+                await store_weeks(changed_batches(request.batch_ids, diff), generated.values())
+                publish_timetable_diff(diff, "generated")
+            
+            # Slots that already existed keep their stored id and creation time
+            timetable = [
+                {**entry, "id": stored[key]["id"], "created_at": stored[key].get("created_at", entry["created_at"])}
+                if key in stored else entry
+                for key, entry in generated.items()
+            ]
             
             return {
                 "success": True,
-                "message": f"Generated timetable for {len(saved_entries)} entries",
-                "timetable": [entry.dict() for entry in saved_entries]
+                "message": f"Generated timetable for {len(timetable)} entries",
+                "timetable": timetable,
+                "diff": diff
             }
             
         except json.JSONDecodeError:
@@ -407,16 +1034,163 @@ Ensure the response is valid JSON only, no additional text.
                 "raw_response": response
             }
             
+    except LeaseLost:
+        raise
     except Exception as e:
         return {
             "success": False,
             "message": f"Error generating timetable: {str(e)}"
         }
 
+# What-if Scenarios
+SCENARIO_MODELS = {"faculty": Faculty, "classrooms": Classroom, "subjects": Subject, "batches": StudentBatch}
+
+@api_router.post("/scenarios/evaluate")
+async def evaluate_scenario(request: ScenarioRequest):
+    """Apply hypothetical edits to a snapshot of the current data and schedule it locally; read-only"""
+    try:
+        constraints = TimetableConstraints(**request.constraints)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def load(collection):
+        return collection, await db[collection].find({}, {"_id": 0}).to_list(None)
+    
+    snapshot = dict(await asyncio.gather(*(load(c) for c in SCENARIO_MODELS)))
+    # The whole timetable: batches outside batch_ids still hold their lecturers and rooms
+    current = await db.timetable.find({}, {"_id": 0}).to_list(None)
+    
+    def validate(resource, record):
+        return SCENARIO_MODELS[resource](**record).dict()
+    
+    try:
+        # Scheduling is CPU bound; keep it off the event loop
+        return await asyncio.to_thread(
+            run_scenario, snapshot, current, [edit.dict() for edit in request.edits], constraints, validate,
+            batch_ids=request.batch_ids, include_entries=request.include_entries
+        )
+    except ScenarioError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Exam Scheduling
+@api_router.post("/exams/schedule")
+async def schedule_exam_timetable(request: ExamScheduleRequest):
+    """Colour the subject conflict graph into exam periods and seat each exam; read-only"""
+    dates = [parse_date(value) for value in request.dates]
+    if not dates or None in dates:
+        raise HTTPException(status_code=400, detail="dates must be a non-empty list of ISO dates")
+    if not request.sessions:
+        raise HTTPException(status_code=400, detail="At least one session per day is required")
+    
+    batch_query = {"id": {"$in": request.batch_ids}} if request.batch_ids is not None else {}
+    batches, subjects, classrooms = await asyncio.gather(
+        db.batches.find(batch_query, {"_id": 0}).to_list(None),
+        db.subjects.find({}, {"_id": 0}).to_list(None),
+        db.classrooms.find({}, {"_id": 0}).to_list(None)
+    )
+    data = {"batches": batches, "subjects": subjects, "classrooms": classrooms}
+    return await asyncio.to_thread(
+        schedule_exams, data, [d.isoformat() for d in sorted(set(dates))], request.sessions,
+        extra_enrollments=request.enrollments, room_types=request.room_types
+    )
+
 # Timetable Management
+def publish_timetable_diff(diff, reason, **context):
+    """Send each affected batch and lecturer the slice of a timetable diff that concerns them"""
+    for topic, rows in split_diff_by_subscriber(diff).items():
+        timetable_hub.publish(topic, "timetable_diff", {"topic": topic, "reason": reason, **context, **rows})
+
+@api_router.get("/timetable/changes")
+async def stream_timetable_changes(
+    request: Request,
+    batch_id: List[str] = Query(default=[]),
+    faculty_id: List[str] = Query(default=[]),
+    last_event_id: Optional[str] = None
+):
+    """Server-Sent Events feed of timetable diffs for the given batches and/or lecturers"""
+    topics = [f"batch:{b}" for b in batch_id] + [f"faculty:{f}" for f in faculty_id]
+    if not topics:
+        raise HTTPException(status_code=400, detail="Pass at least one batch_id or faculty_id")
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+    try:
+        subscription = timetable_hub.subscribe(topics, last_event_id=last_event_id)
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many open streams", headers={"Retry-After": "5"})
+    return StreamingResponse(timetable_hub.sse_stream(subscription), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# scope -> (timetable field, collection holding the scoped document)
+EXPORT_SCOPES = {
+    "batch": ("batch_id", "batches"),
+    "faculty": ("faculty_id", "faculty"),
+    "classroom": ("classroom_id", "classrooms"),
+}
+
+async def load_session_rows(field, scope_id):
+    entries = await db.timetable.find({field: scope_id}, {"_id": 0}).to_list(None)
+    lookups = {"subjects": "subject_id", "faculty": "faculty_id", "classrooms": "classroom_id", "batches": "batch_id"}
+    
+    async def names(collection, key):
+        ids = list({e[key] for e in entries})
+        docs = await db[collection].find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "name": 1, "code": 1}).to_list(None)
+        return collection, {d["id"]: d for d in docs}
+    
+    return session_rows(entries, dict(await asyncio.gather(*(names(c, k) for c, k in lookups.items()))))
+
+def term_start_date():
+    if TERM_START:
+        return date.fromisoformat(TERM_START)
+    today = date.today()
+    return today - timedelta(days=today.weekday())
+
+@api_router.get("/timetable/export/{scope}/{scope_id}")
+async def export_timetable(scope: str, scope_id: str, request: Request, format: str = "ics",
+                           start: Optional[date] = None, weeks: Optional[int] = None):
+    """Batch, lecturer or classroom timetable as an iCalendar feed, CSV or printable PDF"""
+    if scope not in EXPORT_SCOPES:
+        raise HTTPException(status_code=404, detail=f"Unknown export scope: {scope}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    field, collection = EXPORT_SCOPES[scope]
+    owner = await db[collection].find_one({"id": scope_id}, {"_id": 0, "name": 1})
+    if not owner:
+        raise HTTPException(status_code=404, detail=f"{scope.title()} not found")
+    
+    start = start or term_start_date()
+    weeks = weeks or TERM_WEEKS
+    versions = await get_versions([f"timetable:{scope}:{scope_id}", "reference"])
+    key = (scope, scope_id, format, *versions, start.isoformat() if format == "ics" else "", weeks if format == "ics" else 0)
+    # Weak, like versioned_json: CompressionMiddleware may send the same version in different encodings
+    etag = 'W/"' + "-".join(str(part) for part in key) + '"'
+    filename = "".join(c if c.isalnum() or c in "-_" else "_" for c in owner["name"]) or scope_id
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="{scope}-{filename}.{format}"'
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    body = export_cache.get(key)
+    if body is not None:
+        return Response(body, media_type=EXPORT_FORMATS[format], headers=headers)
+    
+    rows = await load_session_rows(field, scope_id)
+    title = f"{scope.title()} timetable: {owner['name']}"
+    if format == "ics":
+        chunks = render_ics(rows, title, start, weeks, TIMETABLE_TZ)
+    elif format == "csv":
+        chunks = render_csv(rows)
+    else:
+        chunks = render_pdf(rows, title)
+    return StreamingResponse(export_cache.fill(key, chunks), media_type=EXPORT_FORMATS[format], headers=headers)
+
 @api_router.get("/timetable/{batch_id}")
-async def get_timetable(batch_id: str):
-    timetable = await db.timetable.find({"batch_id": batch_id}).to_list(1000)
+async def get_timetable(batch_id: str, request: Request):
+    return await versioned_json(request, ("timetable", batch_id), [f"timetable:batch:{batch_id}", "reference"],
+                                lambda: enrich_batch_timetable(batch_id))
+
+async def enrich_batch_timetable(batch_id):
+    timetable = await db.timetable.find({"batch_id": batch_id}, {"_id": 0}).to_list(1000)
     
     # Enrich with additional data
     enriched_timetable = []
@@ -437,9 +1211,46 @@ async def get_timetable(batch_id: str):
     
     return enriched_timetable
 
+async def store_weeks(batch_ids, entries):
+    """Write the week-matrix document for each batch's new timetable version and prune old ones"""
+    if not batch_ids:
+        return []
+    versions = await get_versions([f"timetable:batch:{b}" for b in batch_ids])
+    entries = list(entries)
+    weeks = [encode_week(b, version, entries) for b, version in zip(batch_ids, versions)]
+    operations = [ReplaceOne({"_id": week["_id"]}, week, upsert=True) for week in weeks]
+    operations += [
+        DeleteMany({"batch_id": week["batch_id"], "version": {"$lte": week["version"] - TIMETABLE_WEEK_HISTORY}})
+        for week in weeks
+    ]
+    await db.timetable_weeks.bulk_write(operations, ordered=False)
+    return weeks
+
+@api_router.get("/timetable/{batch_id}/week")
+async def get_timetable_week(batch_id: str, version: Optional[int] = None, expand: bool = False):
+    """A batch's whole week as one compact document; `expand` adds the decoded entries"""
+    if version is None:
+        week = await db.timetable_weeks.find_one({"batch_id": batch_id}, sort=[("version", -1)])
+        if week is None:
+            # Timetables generated before week documents existed are converted on first read
+            entries = await db.timetable.find({"batch_id": batch_id}, {"_id": 0}).to_list(None)
+            if not entries:
+                raise HTTPException(status_code=404, detail="No timetable for this batch")
+            week = (await store_weeks([batch_id], entries))[0]
+    else:
+        week = await db.timetable_weeks.find_one({"_id": f"{batch_id}:{version}"})
+        if week is None:
+            raise HTTPException(status_code=404, detail="Timetable version not found")
+    if expand:
+        return {**week, "entries": decode_week(week)}
+    return week
+
 @api_router.get("/timetable/faculty/{faculty_id}")
 async def get_faculty_timetable(faculty_id: str):
-    timetable = await db.timetable.find({"faculty_id": faculty_id}).to_list(1000)
+    return await read_cache.do(("faculty_timetable", faculty_id), lambda: enrich_faculty_timetable(faculty_id))
+
+async def enrich_faculty_timetable(faculty_id):
+    timetable = await db.timetable.find({"faculty_id": faculty_id}, {"_id": 0}).to_list(1000)
     
     # Enrich with additional data
     enriched_timetable = []
@@ -465,10 +1276,26 @@ async def create_announcement(announcement: AnnouncementCreate):
     announcement_dict = announcement.dict()
     announcement_obj = Announcement(**announcement_dict)
     await db.announcements.insert_one(announcement_obj.dict())
+    await bump_versions(["announcements"])
+    announcement_hub.publish("announcements", "announcement", announcement_obj.dict())
     return announcement_obj
 
+@api_router.get("/announcements/stream")
+async def stream_announcements(request: Request, role: Optional[str] = None, last_event_id: Optional[str] = None):
+    """Server-Sent Events feed of new announcements, filtered by target role"""
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+    predicate = (lambda announcement: role in announcement["target_roles"]) if role else None
+    try:
+        subscription = announcement_hub.subscribe(["announcements"], predicate, last_event_id)
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many open streams", headers={"Retry-After": "5"})
+    return StreamingResponse(announcement_hub.sse_stream(subscription), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @api_router.get("/announcements")
-async def get_announcements(role: Optional[str] = None):
+async def get_announcements(request: Request, role: Optional[str] = None):
+    return await versioned_json(request, ("announcements", role or ""), ["announcements"], lambda: load_announcements(role))
+
+async def load_announcements(role):
     query = {}
     if role:
         query["target_roles"] = {"$in": [role]}
@@ -481,6 +1308,11 @@ async def get_announcements(role: Optional[str] = None):
 async def report_absence(absence: AbsenceCreate):
     absence_dict = absence.dict()
     absence_obj = Absence(**absence_dict)
+    # Stored as an ISO date so calendar range queries find it; a weekday name means the next one
+    day = absence_date(absence_obj.dict())
+    if day is None:
+        raise HTTPException(status_code=400, detail="date must be an ISO date (YYYY-MM-DD)")
+    absence_obj.date = day.isoformat()
     await db.absences.insert_one(absence_obj.dict())
     return absence_obj
 
@@ -489,19 +1321,236 @@ async def get_absences():
     absences = await db.absences.find().sort("created_at", -1).to_list(100)
     return [Absence(**a) for a in absences]
 
+# Academic Calendar
+@api_router.post("/calendar/exceptions", response_model=CalendarException)
+async def create_calendar_exception(exception: CalendarExceptionCreate):
+    exception_dict = exception.dict()
+    parsed = parse_date(exception.date)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail="date must be an ISO date (YYYY-MM-DD)")
+    if exception.kind not in EXCEPTION_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(EXCEPTION_KINDS)}")
+    if exception.kind == "day_swap" and (exception.follows_day or "").lower() not in WEEKDAYS:
+        raise HTTPException(status_code=400, detail="day_swap needs follows_day set to a weekday")
+    if exception.kind == "cancellation" and not (exception.time_slot and exception.batch_ids):
+        raise HTTPException(status_code=400, detail="cancellation needs a time_slot and batch_ids")
+    exception_dict["date"] = parsed.isoformat()
+    if exception.follows_day:
+        exception_dict["follows_day"] = exception.follows_day.lower()
+    exception_obj = CalendarException(**exception_dict)
+    await db.calendar_exceptions.insert_one(exception_obj.dict())
+    return exception_obj
+
+@api_router.get("/calendar/exceptions", response_model=List[CalendarException])
+async def get_calendar_exceptions(start: Optional[date] = None, end: Optional[date] = None):
+    query = {}
+    if start or end:
+        query["date"] = {}
+        if start:
+            query["date"]["$gte"] = start.isoformat()
+        if end:
+            query["date"]["$lte"] = end.isoformat()
+    exceptions = await db.calendar_exceptions.find(query, {"_id": 0}).sort("date", 1).to_list(1000)
+    return [CalendarException(**e) for e in exceptions]
+
+@api_router.delete("/calendar/exceptions/{exception_id}")
+async def delete_calendar_exception(exception_id: str):
+    result = await db.calendar_exceptions.delete_one({"id": exception_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Calendar exception not found")
+    return {"message": "Calendar exception deleted successfully"}
+
+@api_router.get("/calendar/sessions")
+async def get_calendar_sessions(start: date, end: Optional[date] = None, batch_id: Optional[str] = None,
+                                faculty_id: Optional[str] = None, classroom_id: Optional[str] = None):
+    """Concrete dated sessions for a batch, lecturer or classroom between start and end (inclusive)"""
+    end = end or start
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days >= CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {CALENDAR_MAX_DAYS} days")
+    scope = {k: v for k, v in (("batch_id", batch_id), ("faculty_id", faculty_id), ("classroom_id", classroom_id)) if v}
+    if len(scope) != 1:
+        raise HTTPException(status_code=400, detail="Pass exactly one of batch_id, faculty_id or classroom_id")
+    
+    date_filter = {"$gte": start.isoformat(), "$lte": end.isoformat()}
+    # Absences are matched on their date prefix, so older timestamped ones are found too, and
+    # legacy weekday-name ones are resolved to a date before filtering
+    absence_filter = {"$or": [
+        {"date": {"$gte": start.isoformat(), "$lt": (end + timedelta(days=1)).isoformat()}},
+        {"date": {"$not": ISO_DATE_PREFIX}}
+    ]}
+    exceptions, substitutions = await asyncio.gather(
+        db.calendar_exceptions.find({"date": date_filter}, {"_id": 0}).to_list(None),
+        db.absences.find({**absence_filter, "substitute_id": {"$ne": None}}, {"_id": 0}).to_list(None)
+    )
+    substitutions = [a for a in substitutions if start <= (absence_date(a) or date.min) <= end]
+    query = dict(scope)
+    if faculty_id:
+        # Sessions this lecturer covers for absent colleagues come from the colleagues' entries
+        covering = [{"faculty_id": a["lecturer_id"], "time_slot": a["time_slot"]}
+                    for a in substitutions if a["substitute_id"] == faculty_id]
+        query = {"$or": [scope] + covering}
+    entries = await db.timetable.find(query, {"_id": 0, "created_at": 0}).to_list(None)
+    
+    sessions = [
+        session for session in expand_sessions(entries, start, end, exceptions, substitutions)
+        if not faculty_id or session["faculty_id"] == faculty_id
+    ]
+    return {"start": start.isoformat(), "end": end.isoformat(), "exceptions": exceptions, "sessions": sessions}
+
+async def find_absence_entry(absence):
+    """The weekly timetable entry an absence refers to, following holidays and day swaps
+    when the absence carries a real date"""
+    day = absence_date(absence)
+    weekday = WEEKDAYS[day.weekday()] if day is not None else weekday_for(absence["date"])
+    if weekday is None:
+        return None
+    exceptions = []
+    if day is not None:
+        exceptions = await db.calendar_exceptions.find({"date": day.isoformat()}, {"_id": 0}).to_list(None)
+    days = [weekday] + [e["follows_day"] for e in exceptions if e["kind"] == "day_swap" and e.get("follows_day")]
+    entries = await db.timetable.find({
+        "faculty_id": absence["lecturer_id"],
+        "day": {"$in": days},
+        "time_slot": absence["time_slot"]
+    }, {"_id": 0}).to_list(None)
+    for entry in entries:
+        if not exceptions or effective_day(day, exceptions, entry["batch_id"]) == entry["day"]:
+            if not any(e["kind"] == "cancellation" and e.get("time_slot") == entry["time_slot"]
+                       and entry["batch_id"] in (e.get("batch_ids") or []) for e in exceptions):
+                return entry
+    return None
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def pick_heuristic_substitute(qualified_faculty, faculty_workload, busy_ids):
+    """Deterministic fallback: the least loaded qualified lecturer who is free in the slot"""
+    candidates = [f for f in qualified_faculty if f["id"] not in busy_ids]
+    if not candidates:
+        return None
+    best = min(candidates, key=lambda f: (faculty_workload.get(f["id"], 0), f["name"], f["id"]))
+    return {
+        "recommended_faculty_id": best["id"],
+        "reason": f"{best['name']} is qualified, free at this time and has the lightest teaching load "
+                  f"({faculty_workload.get(best['id'], 0)} weekly sessions)"
+    }
+
+async def get_busy_faculty(faculty_ids, day, time_slot, date, exclude_absence_id=None):
+    """Lecturers teaching in the slot, or covering an absence other than `exclude_absence_id` in it"""
+    busy = await db.timetable.distinct("faculty_id", {
+        "faculty_id": {"$in": faculty_ids},
+        "day": day,
+        "time_slot": time_slot
+    })
+    covering_query = {
+        "substitute_id": {"$in": faculty_ids},
+        "date": date,
+        "time_slot": time_slot
+    }
+    if exclude_absence_id is not None:
+        covering_query["id"] = {"$ne": exclude_absence_id}
+    covering = await db.absences.distinct("substitute_id", covering_query)
+    return set(busy) | set(covering)
+
+async def ask_llm_for_substitute(subject, absence, qualified_faculty, faculty_workload, busy_ids):
+    load_llm_integration()
+    chat = LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=f"substitute-{uuid.uuid4()}",
+        system_message="You are an AI assistant that helps find the best substitute lecturer based on workload balance, availability, and subject expertise."
+    ).with_model("openai", "gpt-5")
+    
+    prompt = f"""
+Find the best substitute lecturer for:
+Subject: {subject['name']}
+Date: {absence['date']}
+Time: {absence['time_slot']}
+
+Qualified Faculty:
+{json.dumps([{**f, 'current_workload': faculty_workload.get(f['id'], 0), 'available': f['id'] not in busy_ids} for f in qualified_faculty], indent=2, default=str)}
+
+Only recommend a lecturer whose "available" is true. Prioritize based on:
+1. Subject expertise match
+2. Workload balance (prefer lower workload)
+
+Return JSON with this structure:
+{{
+  "recommended_faculty_id": "faculty_id",
+  "reason": "explanation for selection"
+}}
+"""
+    
+    user_message = UserMessage(text=prompt)
+    response = await send_llm_message(chat, user_message, "substitute_suggestion")
+    suggestion = json.loads(response)
+    
+    # Only accept suggestions that point at a qualified lecturer who is free in the slot
+    if suggestion.get("recommended_faculty_id") not in {f["id"] for f in qualified_faculty}:
+        raise ValueError("AI suggested a lecturer who is not qualified for this subject")
+    if suggestion["recommended_faculty_id"] in busy_ids:
+        raise ValueError("AI suggested a lecturer who is busy at this time")
+    return suggestion
+
+async def store_substitute(absence_id, timetable_entry, suggestion, source, expected_source=None, conditional=False):
+    query = {"id": absence_id}
+    if conditional:
+        # Never let a late LLM answer overwrite a manual or newer assignment
+        query["substitute_source"] = expected_source
+    substitute_id = suggestion["recommended_faculty_id"]
+    previous = await db.absences.find_one_and_update(
+        query,
+        {"$set": {
+            "substitute_id": substitute_id,
+            "substitute_reason": suggestion.get("reason"),
+            "substitute_source": source,
+            "status": "substituted"
+        }},
+        projection={"_id": 0, "lecturer_id": 1, "substitute_id": 1, "date": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous is not None and previous.get("substitute_id") != substitute_id:
+        # The slot moves from whoever held it for that date to the new substitute
+        before = {field: timetable_entry[field] for field in ENTRY_FIELDS}
+        before["faculty_id"] = previous.get("substitute_id") or previous["lecturer_id"]
+        publish_timetable_diff({"added": [], "removed": [], "changed": [{
+            "batch_id": timetable_entry["batch_id"],
+            "day": timetable_entry["day"],
+            "time_slot": timetable_entry["time_slot"],
+            "date": previous["date"],
+            "before": before,
+            "after": {**before, "faculty_id": substitute_id}
+        }]}, "substitution", absence_id=absence_id, source=source)
+    return previous
+
+async def upgrade_substitute_when_ready(absence, timetable_entry, llm_task, expected_source):
+    absence_id = absence["id"]
+    try:
+        suggestion = await asyncio.wait_for(llm_task, timeout=SUBSTITUTE_LLM_UPGRADE_TIMEOUT)
+    except Exception as e:
+        logger.info(f"Keeping current substitute for absence {absence_id}: {e!r}")
+        return
+    # The slot may have filled up while the LLM was thinking
+    if await get_busy_faculty([suggestion["recommended_faculty_id"]], timetable_entry["day"], absence["time_slot"],
+                              absence["date"], exclude_absence_id=absence_id):
+        logger.info(f"Keeping current substitute for absence {absence_id}: suggested lecturer is now busy")
+        return
+    await store_substitute(absence_id, timetable_entry, suggestion, "llm", expected_source=expected_source, conditional=True)
+
 @api_router.post("/absences/{absence_id}/substitute")
-async def find_substitute(absence_id: str):
+async def find_substitute(absence_id: str, hedged: bool = True, deadline_ms: Optional[int] = None,
+                          _=Depends(admitted(substitute_admission))):
     try:
         absence = await db.absences.find_one({"id": absence_id})
         if not absence:
             raise HTTPException(status_code=404, detail="Absence not found")
         
         # Get the timetable entry for this absence
-        timetable_entry = await db.timetable.find_one({
-            "faculty_id": absence["lecturer_id"],
-            "day": absence["date"].lower(),
-            "time_slot": absence["time_slot"]
-        })
+        timetable_entry = await find_absence_entry(absence)
         
         if not timetable_entry:
             return {"success": False, "message": "No timetable entry found for this absence"}
@@ -510,72 +1559,92 @@ async def find_substitute(absence_id: str):
         subject = await db.subjects.find_one({"id": timetable_entry["subject_id"]})
         
         # Find qualified faculty for substitution
-        qualified_faculty = await db.faculty.find({
-            "subjects": {"$in": [subject["name"]]},
-            "id": {"$ne": absence["lecturer_id"]}
-        }).to_list(1000)
+        await refresh_qualification_index()
+        candidate_ids = sorted(qualification_index.faculty_for(subject["id"]) - {absence["lecturer_id"]})
+        qualified_faculty = await db.faculty.find(
+            {"id": {"$in": candidate_ids}}, {"_id": 0}
+        ).to_list(1000) if candidate_ids else []
         
-        # Use AI to suggest best substitute
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"substitute-{uuid.uuid4()}",
-            system_message="You are an AI assistant that helps find the best substitute lecturer based on workload balance, availability, and subject expertise."
-        ).with_model("openai", "gpt-5")
+        if not qualified_faculty:
+            return {"success": False, "message": "No qualified faculty available", "qualified_faculty": []}
         
-        # Get current workload for all qualified faculty
-        faculty_workload = {}
-        for faculty in qualified_faculty:
-            workload = await db.timetable.count_documents({"faculty_id": faculty["id"]})
-            faculty_workload[faculty["id"]] = workload
+        # Get current workload for all qualified faculty in one round trip
+        qualified_ids = [f["id"] for f in qualified_faculty]
+        faculty_workload = {
+            row["_id"]: row["count"]
+            async for row in db.timetable.aggregate([
+                {"$match": {"faculty_id": {"$in": qualified_ids}}},
+                {"$group": {"_id": "$faculty_id", "count": {"$sum": 1}}}
+            ])
+        }
         
-        prompt = f"""
-Find the best substitute lecturer for:
-Subject: {subject['name']}
-Date: {absence['date']}
-Time: {absence['time_slot']}
-
-Qualified Faculty:
-{json.dumps([{**f, 'current_workload': faculty_workload.get(f['id'], 0)} for f in qualified_faculty], indent=2, default=str)}
-
-Prioritize based on:
-1. Subject expertise match
-2. Current availability (check for conflicts)
-3. Workload balance (prefer lower workload)
-
-Return JSON with this structure:
-{{
-  "recommended_faculty_id": "faculty_id",
-  "reason": "explanation for selection"
-}}
-"""
+        busy_ids = await get_busy_faculty(qualified_ids, timetable_entry["day"], absence["time_slot"], absence["date"],
+                                          exclude_absence_id=absence_id)
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        # Start the LLM call, then work out the local answer while it is in flight
+        llm_task = asyncio.create_task(ask_llm_for_substitute(subject, absence, qualified_faculty, faculty_workload, busy_ids))
         
-        try:
-            suggestion = json.loads(response)
-            
-            # Update absence with suggestion
-            await db.absences.update_one(
-                {"id": absence_id},
-                {"$set": {
-                    "substitute_id": suggestion["recommended_faculty_id"],
-                    "status": "substituted"
-                }}
-            )
-            
+        if not hedged:
+            try:
+                suggestion = await llm_task
+            except json.JSONDecodeError:
+                return {
+                    "success": False,
+                    "message": "Failed to parse AI response",
+                    "qualified_faculty": qualified_faculty
+                }
+            except ValueError as e:
+                return {
+                    "success": False,
+                    "message": str(e),
+                    "qualified_faculty": qualified_faculty
+                }
+            await store_substitute(absence_id, timetable_entry, suggestion, "llm")
             return {
                 "success": True,
                 "substitute": suggestion,
+                "source": "llm",
                 "qualified_faculty": qualified_faculty
             }
-            
-        except json.JSONDecodeError:
+        
+        heuristic = pick_heuristic_substitute(qualified_faculty, faculty_workload, busy_ids)
+        
+        deadline = SUBSTITUTE_LLM_DEADLINE if deadline_ms is None else max(deadline_ms, 0) / 1000
+        done, _ = await asyncio.wait({llm_task}, timeout=deadline)
+        
+        if llm_task in done and llm_task.exception() is None:
+            suggestion = llm_task.result()
+            await store_substitute(absence_id, timetable_entry, suggestion, "llm")
+            return {
+                "success": True,
+                "substitute": suggestion,
+                "source": "llm",
+                "qualified_faculty": qualified_faculty
+            }
+        
+        llm_pending = llm_task not in done
+        if heuristic is None:
+            if llm_pending:
+                spawn_background(upgrade_substitute_when_ready(absence, timetable_entry, llm_task, None))
             return {
                 "success": False,
-                "message": "Failed to parse AI response",
+                "message": "No qualified faculty is free at this time",
+                "llm_pending": llm_pending,
                 "qualified_faculty": qualified_faculty
             }
+        
+        await store_substitute(absence_id, timetable_entry, heuristic, "heuristic")
+        if llm_pending:
+            # Let the LLM refine the choice in the background if it answers in time
+            spawn_background(upgrade_substitute_when_ready(absence, timetable_entry, llm_task, "heuristic"))
+        
+        return {
+            "success": True,
+            "substitute": heuristic,
+            "source": "heuristic",
+            "llm_pending": llm_pending,
+            "qualified_faculty": qualified_faculty
+        }
             
     except Exception as e:
         return {
@@ -597,9 +1666,160 @@ async def get_dashboard_stats():
     }
     return stats
 
+# Utilisation Analytics
+# Readers that find the matrices stale in this worker share one rebuild
+occupancy_rebuilds = SingleFlight("occupancy", ttl_seconds=0)
+
+@asynccontextmanager
+async def occupancy_write():
+    """Mark a timetable write and its occupancy update as in flight, so a rebuild overlapping
+    them is not trusted (see rebuild_occupancy)"""
+    token = uuid.uuid4().hex
+    await db.occupancy.update_one(
+        {"_id": OCCUPANCY_WRITERS_ID},
+        {"$set": {f"active.{token}": datetime.now(timezone.utc)}, "$inc": {"writes": 1}},
+        upsert=True
+    )
+    try:
+        yield
+    except BaseException:
+        # The timetable write may have landed without its occupancy update
+        await db.occupancy.delete_one({"_id": OCCUPANCY_META_ID})
+        raise
+    finally:
+        await db.occupancy.update_one({"_id": OCCUPANCY_WRITERS_ID}, {"$unset": {f"active.{token}": ""}})
+
+async def update_occupancy(diff, complete=True):
+    """Apply a timetable diff to the occupancy matrices; if a fenced write skipped some of its
+    operations (`complete` is false) the diff no longer describes what was stored, so the
+    matrices are marked stale instead"""
+    if not complete:
+        await db.occupancy.delete_one({"_id": OCCUPANCY_META_ID})
+        return
+    updates = occupancy_updates(diff)
+    if updates:
+        await db.occupancy.bulk_write(updates, ordered=False)
+
+def active_occupancy_writers(writers):
+    # A worker that died mid-write never clears its mark; ignore marks older than a lease
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=2 * LEASE_TTL_SECONDS)
+    return [t for t, started in (writers.get("active") or {}).items()
+            if started.replace(tzinfo=started.tzinfo or timezone.utc) > cutoff]
+
+async def rebuild_occupancy():
+    """Recompute every occupancy matrix from the timetable collection.
+
+    A timetable write whose $inc lands between reading the timetable and replacing the matrices
+    would be lost or counted twice, so the meta document is only stamped when no write was in
+    flight when the rebuild started and none started before it finished. Otherwise the matrices
+    stay marked stale and the next read rebuilds them again.
+    """
+    writers = await db.occupancy.find_one({"_id": OCCUPANCY_WRITERS_ID}) or {}
+    entries = await db.timetable.find({}, {"_id": 0, "day": 1, "time_slot": 1, "faculty_id": 1, "classroom_id": 1}).to_list(None)
+    await db.occupancy.bulk_write(occupancy_replacements(occupancy_documents(entries)), ordered=False)
+    
+    after = await db.occupancy.find_one({"_id": OCCUPANCY_WRITERS_ID}) or {}
+    if active_occupancy_writers(writers) or after.get("writes", 0) != writers.get("writes", 0):
+        await db.occupancy.delete_one({"_id": OCCUPANCY_META_ID})
+    else:
+        await db.occupancy.replace_one(
+            {"_id": OCCUPANCY_META_ID},
+            {"rebuilt_at": datetime.now(timezone.utc), "entries": len(entries)},
+            upsert=True
+        )
+    return len(entries)
+
+@api_router.get("/analytics/utilisation")
+async def get_utilisation(limit: int = Query(10, ge=1, le=1000), detail: bool = False):
+    """Room and lecturer utilisation over the teaching week from the occupancy matrices.
+
+    With detail=true every resource's day x time slot matrix is included (the heatmap input).
+    """
+    if not await db.occupancy.find_one({"_id": OCCUPANCY_META_ID}):
+        await occupancy_rebuilds.do("rebuild", rebuild_occupancy)
+    documents, rooms, faculty = await asyncio.gather(
+        db.occupancy.find({"kind": {"$in": list(OCCUPANCY_KINDS)}}).to_list(None),
+        db.classrooms.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None),
+        db.faculty.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    )
+    observed_days = {day for d in documents for day in d.get("cells", {})}
+    days = DAYS + [day for day in WEEKDAYS if day in observed_days and day not in DAYS]
+    time_slots = sorted(set(build_slot_grid(TimetableConstraints())) |
+                        {slot for d in documents for cells in d.get("cells", {}).values() for slot in cells})
+    return {
+        "days": days,
+        "time_slots": time_slots,
+        "rooms": summarise_occupancy([d for d in documents if d["kind"] == "room"], rooms, days, time_slots, limit, detail),
+        "faculty": summarise_occupancy([d for d in documents if d["kind"] == "faculty"], faculty, days, time_slots, limit, detail)
+    }
+
+@api_router.post("/analytics/utilisation/rebuild")
+async def rebuild_utilisation():
+    return {"success": True, "entries": await occupancy_rebuilds.do("rebuild", rebuild_occupancy)}
+
+# Health checks
+@api_router.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def readiness():
+    if not startup_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **startup_state})
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), timeout=2)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "mongo_unreachable", "error": str(e), **startup_state})
+    return {"status": "ready", **startup_state}
+
+# Diagnostics
+@api_router.get("/diagnostics/timetable-storage")
+async def get_timetable_storage():
+    """BSON bytes of the per-entry timetable documents against the latest week matrix per batch"""
+    entry_bytes = {}
+    entry_counts = {}
+    async for entry in db.timetable.find({}, batch_size=5000):
+        entry_bytes[entry["batch_id"]] = entry_bytes.get(entry["batch_id"], 0) + bson_size(entry)
+        entry_counts[entry["batch_id"]] = entry_counts.get(entry["batch_id"], 0) + 1
+    week_bytes = {}
+    async for week in db.timetable_weeks.find({}).sort("version", 1):
+        week_bytes[week["batch_id"]] = bson_size(week)
+    
+    compared = [b for b in entry_bytes if b in week_bytes]
+    entries_total = sum(entry_bytes[b] for b in compared)
+    weeks_total = sum(week_bytes[b] for b in compared)
+    return {
+        "batches": len(entry_bytes),
+        "batches_with_week_matrix": len(compared),
+        "entry_documents": sum(entry_counts[b] for b in compared),
+        "entry_bytes": entries_total,
+        "week_matrix_documents": len(compared),
+        "week_matrix_bytes": weeks_total,
+        "bytes_saved": entries_total - weeks_total,
+        "ratio": round(weeks_total / entries_total, 4) if entries_total else None
+    }
+
+@api_router.get("/diagnostics/admission")
+async def get_admission_status():
+    return [control.status() for control in (generate_admission, substitute_admission, sample_data_admission)]
+
+@api_router.get("/diagnostics/slow-queries")
+async def get_slow_queries(limit: int = 20, sort: str = "total_ms"):
+    try:
+        shapes = slow_queries.report(limit=limit, sort=sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Filters and plans can hold BSON values (ObjectId, Regex) that need stringifying
+    return json.loads(json.dumps({"threshold_ms": slow_queries.threshold_ms, "shapes": shapes}, default=str))
+
+@api_router.delete("/diagnostics/slow-queries")
+async def reset_slow_queries():
+    slow_queries.reset()
+    return {"message": "Slow query statistics cleared"}
+
 # Initialize sample data
 @api_router.post("/init-sample-data")
-async def initialize_sample_data():
+async def initialize_sample_data(_=Depends(admitted(sample_data_admission))):
     try:
         # Clear existing data
         await db.faculty.delete_many({})
@@ -620,9 +1840,7 @@ async def initialize_sample_data():
             {"name": "Prof. Lakshmi Devi", "email": "lakshmi@university.edu", "department": "ISE", "subjects": ["Operations Research", "Quality Control", "Production Planning"]}
         ]
         
-        for faculty_data in sample_faculty:
-            faculty = Faculty(**faculty_data)
-            await db.faculty.insert_one(faculty.dict())
+        await db.faculty.insert_many([Faculty(**faculty_data).dict() for faculty_data in sample_faculty])
         
         # Sample Subjects for each department and semester
         sample_subjects = {
@@ -662,6 +1880,7 @@ async def initialize_sample_data():
                         2: ["Final Project", "Industry Internship", "Thesis-II", "Viva Voce"]}
                 }
         
+        subject_docs = []
         for department, years in sample_subjects.items():
             for year, semesters in years.items():
                 for semester, subjects in semesters.items():
@@ -675,7 +1894,8 @@ async def initialize_sample_data():
                             type="theory" if "Lab" not in subject_name else "lab",
                             hours_per_week=4 if "Lab" not in subject_name else 6
                         )
-                        await db.subjects.insert_one(subject.dict())
+                        subject_docs.append(subject.dict())
+        await db.subjects.insert_many(subject_docs)
         
         # Sample Classrooms
         sample_classrooms = [
@@ -687,9 +1907,7 @@ async def initialize_sample_data():
             {"name": "LH-103", "capacity": 100, "type": "lecture_hall", "equipment": ["Mic System", "Projector"]}
         ]
         
-        for classroom_data in sample_classrooms:
-            classroom = Classroom(**classroom_data)
-            await db.classrooms.insert_one(classroom.dict())
+        await db.classrooms.insert_many([Classroom(**classroom_data).dict() for classroom_data in sample_classrooms])
         
         # Sample Student Batches
         sample_batches = []
@@ -705,8 +1923,7 @@ async def initialize_sample_data():
                     )
                     sample_batches.append(batch)
         
-        for batch in sample_batches:
-            await db.batches.insert_one(batch.dict())
+        await db.batches.insert_many([batch.dict() for batch in sample_batches])
         
         # Sample Announcements
         sample_announcements = [
@@ -715,18 +1932,44 @@ async def initialize_sample_data():
             {"title": "Exam Schedule Released", "message": "Mid-semester examination schedule has been released. Check your timetables.", "author": "Admin", "target_roles": ["student"]}
         ]
         
-        for announcement_data in sample_announcements:
-            announcement = Announcement(**announcement_data)
-            await db.announcements.insert_one(announcement.dict())
+        await db.announcements.insert_many([Announcement(**announcement_data).dict() for announcement_data in sample_announcements])
         
+        await bump_versions(["reference", "subjects", "announcements", "faculty", "classrooms", "batches"])
+        invalidate_memory_indexes()
         return {"success": True, "message": "Sample data initialized successfully"}
         
     except Exception as e:
         return {"success": False, "message": f"Error initializing data: {str(e)}"}
 
+class SyntheticDataRequest(BaseModel):
+    preset: str = "small"
+    seed: int = 0
+    overrides: Dict[str, Any] = {}
+
+@api_router.post("/init-sample-data/synthetic")
+async def initialize_synthetic_data(request: SyntheticDataRequest, _=Depends(admitted(sample_data_admission))):
+    """Replace faculty, subjects, classrooms and batches with a seeded synthetic dataset"""
+    try:
+        spec = DatasetSpec.from_preset(request.preset, seed=request.seed, **request.overrides)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        dataset = generate_dataset(spec)
+        await write_dataset(db, dataset)
+        await bump_versions(["reference", "subjects", "faculty", "classrooms", "batches"])
+        invalidate_memory_indexes()
+        return {"success": True, "message": "Synthetic data initialized successfully", "counts": dataset_summary(dataset)}
+    except Exception as e:
+        return {"success": False, "message": f"Error initializing data: {str(e)}"}
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -735,6 +1978,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware, routes=app.routes)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -742,6 +1990,82 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# Startup
+# (collection, keys, options) for every index the request handlers rely on
+INDEXES = [
+    ("users", [("email", 1), ("role", 1)], {}),
+    ("sessions", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ("faculty", [("id", 1)], {"unique": True}),
+    ("faculty", [("email", 1)], {}),
+    ("subjects", [("id", 1)], {"unique": True}),
+    ("subjects", [("code", 1)], {}),
+    ("subjects", [("department", 1), ("year", 1), ("semester", 1)], {}),
+    ("classrooms", [("id", 1)], {"unique": True}),
+    ("classrooms", [("name", 1)], {}),
+    ("batches", [("id", 1)], {"unique": True}),
+    ("batches", [("name", 1)], {}),
+    ("timetable", [("batch_id", 1), ("day", 1), ("time_slot", 1)], {}),
+    ("timetable", [("faculty_id", 1), ("day", 1), ("time_slot", 1)], {}),
+    ("timetable", [("classroom_id", 1)], {}),
+    ("timetable_weeks", [("batch_id", 1), ("version", -1)], {}),
+    ("announcements", [("target_roles", 1), ("timestamp", -1)], {}),
+    ("announcements", [("timestamp", -1)], {}),
+    ("absences", [("id", 1)], {"unique": True}),
+    ("absences", [("created_at", -1)], {}),
+    ("absences", [("status", 1)], {}),
+    ("absences", [("date", 1), ("time_slot", 1), ("substitute_id", 1)], {}),
+    ("calendar_exceptions", [("id", 1)], {"unique": True}),
+    ("calendar_exceptions", [("date", 1)], {}),
+    ("generation_jobs", [("id", 1)], {"unique": True}),
+    ("generation_jobs", [("key", 1), ("status", 1)], {}),
+]
+
+async def ensure_indexes():
+    """Create missing indexes; a failure is reported instead of blocking the worker"""
+    async def create(collection, keys, options):
+        try:
+            await db[collection].create_index(keys, **options)
+        except Exception as e:
+            startup_state["errors"].append(f"index {collection}{keys}: {e}")
+            logger.error(f"Could not create index on {collection} {keys}: {e}")
+    await asyncio.gather(*(create(*index) for index in INDEXES))
+
+async def warm_caches():
+    """Load data the first requests of a fresh worker would otherwise fetch on demand"""
+    await refresh_search_index()
+    await refresh_qualification_index()
+
+async def preload_llm_integration():
+    phase_started = timer.perf_counter()
+    try:
+        await asyncio.to_thread(load_llm_integration)
+    except Exception as e:
+        logger.error(f"LLM integration unavailable: {e}")
+        return
+    startup_state["phases"]["llm_import"] = round(timer.perf_counter() - phase_started, 4)
+
+async def prepare_worker(lifespan_started):
+    delay = 0.5
+    while True:
+        try:
+            await client.admin.command("ping")
+            break
+        except Exception as e:
+            logger.warning(f"MongoDB not reachable yet, retrying in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10)
+    startup_state["phases"]["mongo_connect"] = round(timer.perf_counter() - lifespan_started, 4)
+    
+    phase_started = timer.perf_counter()
+    await ensure_indexes()
+    startup_state["phases"]["indexes"] = round(timer.perf_counter() - phase_started, 4)
+    
+    phase_started = timer.perf_counter()
+    await warm_caches()
+    startup_state["phases"]["warm_caches"] = round(timer.perf_counter() - phase_started, 4)
+    
+    ready_after = timer.perf_counter() - IMPORT_STARTED
+    startup_state["ready"] = True
+    startup_state["phases"]["ready_after"] = round(ready_after, 4)
+    startup_seconds.set(ready_after, phase="ready")
+    logger.info(f"Worker ready in {ready_after:.3f}s: {startup_state['phases']}")
@@ -0,0 +1,68 @@
+"""Bearer-token sessions: a TTL-indexed Mongo collection with an in-process cache in front.
+
+Tokens are random and only their SHA-256 is stored, so a leaked sessions collection cannot be
+replayed. A session carries the snapshot of the user it was issued for, so resolving the user
+of a request is a dictionary lookup on a cache hit and one indexed read on a miss. Mongo's TTL
+monitor removes expired documents; expiry is also checked on every lookup, since the monitor
+only runs once a minute.
+
+A revoked token stays valid on other workers until their cached copy ages out
+(`cache_seconds`), which bounds how stale a cache may be.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+USER_FIELDS = ("id", "email", "name", "role", "department", "batch")
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionStore:
+    def __init__(self, collection, ttl_seconds: float = 12 * 3600, cache_size: int = 10000, cache_seconds: float = 60):
+        self.collection = collection
+        self.ttl = ttl_seconds
+        # Unknown tokens are cached too (as None), so a client retrying a bad token stays off Mongo
+        self._cache: TTLCache = TTLCache(maxsize=cache_size, ttl=cache_seconds)
+
+    async def issue(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        """A new session for `user`; the token is returned here and never stored"""
+        token = secrets.token_urlsafe(32)
+        now = datetime.now(timezone.utc)
+        session = {
+            "_id": token_hash(token),
+            "user": {field: user.get(field) for field in USER_FIELDS},
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl),
+        }
+        await self.collection.insert_one(session)
+        self._cache[session["_id"]] = session
+        return {"token": token, "expires_at": session["expires_at"], "user": session["user"]}
+
+    async def resolve(self, token: str) -> Optional[Dict[str, Any]]:
+        """The user snapshot of a live session, or None"""
+        key = token_hash(token)
+        now = datetime.now(timezone.utc)
+        try:
+            session = self._cache[key]
+        except KeyError:
+            session = await self.collection.find_one({"_id": key, "expires_at": {"$gt": now}})
+            self._cache[key] = session
+        if session is None:
+            return None
+        expires_at = session["expires_at"]
+        if expires_at.replace(tzinfo=expires_at.tzinfo or timezone.utc) <= now:
+            self._cache.pop(key, None)
+            return None
+        return session["user"]
+
+    async def revoke(self, token: str) -> bool:
+        key = token_hash(token)
+        self._cache.pop(key, None)
+        result = await self.collection.delete_one({"_id": key})
+        return result.deleted_count > 0
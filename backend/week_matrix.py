@@ -0,0 +1,76 @@
+"""Compact week-matrix layout for a batch timetable.
+
+One document holds a whole week for one batch and timetable version: the day and slot axes,
+small dictionaries of the subject, faculty and classroom ids used, and a day x slot grid whose
+cells are [subject, faculty, classroom] indexes into those dictionaries (or null for a free
+slot). Compared with one TimetableEntry document per session this drops the per-row UUID,
+timestamps and repeated field names and ids.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import bson
+
+from scheduling import DAYS
+
+CELL_FIELDS = (("subject_id", "subjects"), ("faculty_id", "faculty"), ("classroom_id", "classrooms"))
+
+
+def week_id(batch_id: str, version: int) -> str:
+    return f"{batch_id}:{version}"
+
+
+def encode_week(batch_id: str, version: int, entries: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    entries = [e for e in entries if e["batch_id"] == batch_id]
+    days = [d for d in DAYS if any(e["day"] == d for e in entries)]
+    days += sorted({e["day"] for e in entries} - set(DAYS))
+    slots = sorted({e["time_slot"] for e in entries})
+    dictionaries: Dict[str, List[str]] = {name: [] for _, name in CELL_FIELDS}
+    positions: Dict[str, Dict[str, int]] = {name: {} for _, name in CELL_FIELDS}
+
+    def index(name: str, value: str) -> int:
+        if value not in positions[name]:
+            positions[name][value] = len(dictionaries[name])
+            dictionaries[name].append(value)
+        return positions[name][value]
+
+    grid: List[List[Optional[List[int]]]] = [[None] * len(slots) for _ in days]
+    day_index = {d: i for i, d in enumerate(days)}
+    slot_index = {s: i for i, s in enumerate(slots)}
+    for entry in entries:
+        grid[day_index[entry["day"]]][slot_index[entry["time_slot"]]] = [
+            index(name, entry[field]) for field, name in CELL_FIELDS
+        ]
+    return {
+        "_id": week_id(batch_id, version),
+        "batch_id": batch_id,
+        "version": version,
+        "created_at": datetime.now(timezone.utc),
+        "days": days,
+        "slots": slots,
+        **dictionaries,
+        "grid": grid,
+    }
+
+
+def decode_week(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Entry dicts for every filled cell; ids are derived from the week and cell position"""
+    entries = []
+    for d, row in enumerate(doc["grid"]):
+        for s, cell in enumerate(row):
+            if cell is None:
+                continue
+            entry = {
+                "id": f"{doc['_id']}:{d}:{s}",
+                "batch_id": doc["batch_id"],
+                "day": doc["days"][d],
+                "time_slot": doc["slots"][s],
+            }
+            for (field, name), position in zip(CELL_FIELDS, cell):
+                entry[field] = doc[name][position]
+            entries.append(entry)
+    return entries
+
+
+def bson_size(doc: Dict[str, Any]) -> int:
+    return len(bson.encode(doc))
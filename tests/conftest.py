@@ -0,0 +1,98 @@
+"""Shared fixtures for the backend tests.
+
+The backend modules import each other flat from backend/, as the server runs from there. API
+tests run the app in-process against an in-memory mongomock-motor database, with the LLM
+replaced by `FakeChat`, so no MongoDB server or LLM key is needed.
+"""
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+# The benchmark scripts import each other flat from benchmarks/, as they run from there
+sys.path[:0] = [str(BACKEND_DIR), str(BACKEND_DIR / "benchmarks")]
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
+# Admission control has its own tests; here it would only make API tests order-dependent
+for endpoint in ("GENERATE", "SUBSTITUTE", "SAMPLE_DATA"):
+    os.environ.setdefault(f"ADMISSION_{endpoint}_CONCURRENCY", "0")
+    os.environ.setdefault(f"ADMISSION_{endpoint}_RATE", "0")
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeChat:
+    """Stands in for emergentintegrations' LlmChat. Each test sets `reply` (a string, or an
+    exception to raise) and `delay` in seconds; `prompts` records what was sent."""
+    reply = "{}"
+    delay = 0.0
+    prompts = []
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        pass
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        FakeChat.prompts.append(message.text)
+        await asyncio.sleep(FakeChat.delay)
+        if isinstance(FakeChat.reply, Exception):
+            raise FakeChat.reply
+        return FakeChat.reply if isinstance(FakeChat.reply, str) else json.dumps(FakeChat.reply)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The server module bound to a fresh in-memory database, with empty caches and indexes"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server as module
+    from coalesce import SingleFlight
+    from exports import RenderCache
+
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(module, "db", db)
+    monkeypatch.setattr(module.batch_leases, "collection", db.timetable_leases)
+    monkeypatch.setattr(module.session_store, "collection", db.sessions)
+    module.session_store._cache.clear()
+    monkeypatch.setattr(module, "read_cache", SingleFlight("reads", ttl_seconds=1.0))
+    monkeypatch.setattr(module, "occupancy_rebuilds", SingleFlight("occupancy", ttl_seconds=0))
+    monkeypatch.setattr(module, "response_cache", RenderCache(max_bytes=2 ** 20))
+    monkeypatch.setattr(module, "export_cache", RenderCache(max_bytes=2 ** 20))
+    monkeypatch.setattr(module, "local_generation_jobs", {})
+    for index, state, _ in module.MEMORY_INDEXES:
+        index.__init__()
+        state["checked_at"] = None
+    monkeypatch.setattr(module, "LlmChat", FakeChat)
+    monkeypatch.setattr(module, "UserMessage", FakeMessage)
+    monkeypatch.setattr(FakeChat, "reply", "{}")
+    monkeypatch.setattr(FakeChat, "delay", 0.0)
+    monkeypatch.setattr(FakeChat, "prompts", [])
+    return module
+
+
+@pytest.fixture
+def fake_llm(server):
+    return FakeChat
+
+
+@pytest.fixture
+async def client(server):
+    import httpx
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
@@ -0,0 +1,88 @@
+"""Admission control (admission.py): concurrency budgets, per-client rate limits, shedding."""
+import asyncio
+
+import pytest
+
+from admission import AdmissionControl, Rejected
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_requests_beyond_the_concurrency_budget_are_rejected_with_503():
+    control = AdmissionControl("generate", max_concurrent=2)
+    tickets = [control.admit("a"), control.admit("b")]
+    with pytest.raises(Rejected) as rejected:
+        control.admit("c")
+    assert rejected.value.status_code == 503 and rejected.value.retry_after >= 1
+    assert control.status()["in_flight"] == 2
+
+    tickets[0].release()
+    tickets[0].release()  # releasing twice frees one slot, not two
+    control.admit("c")
+    with pytest.raises(Rejected):
+        control.admit("d")
+
+
+def test_rate_limit_is_per_client_and_refills():
+    clock = Clock()
+    control = AdmissionControl("substitute", rate_per_minute=6, burst=2, clock=clock)
+    for _ in range(2):
+        control.admit("a").release()
+    with pytest.raises(Rejected) as rejected:
+        control.admit("a")
+    assert rejected.value.status_code == 429 and rejected.value.retry_after == 10
+    control.admit("b").release()
+
+    clock.now += 10
+    control.admit("a").release()
+    with pytest.raises(Rejected):
+        control.admit("a")
+
+
+async def test_handed_off_ticket_holds_the_slot_until_its_task_ends():
+    control = AdmissionControl("generate", max_concurrent=1)
+    ticket = control.admit("a")
+    done = asyncio.Event()
+    ticket.hand_off(asyncio.create_task(done.wait()))
+    with pytest.raises(Rejected):
+        control.admit("b")
+    done.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    control.admit("b")
+
+
+@pytest.fixture
+async def batch(server):
+    await server.db.batches.insert_many([
+        server.StudentBatch(id=batch_id, name=batch_id.upper(), department="CSE", year=1, semester=1,
+                            student_count=30).dict()
+        for batch_id in ("a", "b")
+    ])
+
+
+async def test_generate_is_shed_while_its_slots_are_taken(server, client, fake_llm, batch, monkeypatch):
+    monkeypatch.setattr(server.generate_admission, "max_concurrent", 1)
+    fake_llm.reply, fake_llm.delay = [], 0.2
+    body = {"constraints": {"max_hours_per_day": 6}}
+    running = await client.post("/api/timetable/generate", params={"wait": "false"}, json={**body, "batch_ids": ["a"]})
+    assert running.status_code == 202
+
+    shed = await client.post("/api/timetable/generate", json={**body, "batch_ids": ["b"]})
+    assert shed.status_code == 503 and int(shed.headers["retry-after"]) >= 1
+    assert (await client.get("/api/diagnostics/admission")).json()[0]["in_flight"] == 1
+
+    job_url = f"/api/timetable/generate/jobs/{running.json()['job_id']}"
+    while (await client.get(job_url)).json()["status"] not in ("succeeded", "failed"):
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.05)
+    assert server.generate_admission.in_flight == 0
+    assert (await client.post("/api/timetable/generate", json={**body, "batch_ids": ["b"]})).status_code == 200
@@ -0,0 +1,60 @@
+"""The in-process API benchmark harness (benchmarks/api_bench.py) against the mongomock server."""
+import json
+import random
+
+import pytest
+
+from api_bench import CountingDatabase, OpCounter, build_scenarios, compare, percentile, run_scenario, seed
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def bench(server, monkeypatch):
+    """A seeded toy dataset behind a database wrapper that counts round trips"""
+    counter = OpCounter()
+    monkeypatch.setattr(server, "db", CountingDatabase(server.db, counter))
+    dataset = await seed(server.db, "toy", 3)
+    return dataset, counter
+
+
+@pytest.mark.parametrize("route", ["timetable_batch", "timetable_faculty", "faculty_list", "subjects_list"])
+async def test_read_routes_run_without_errors(server, client, bench, route):
+    dataset, counter = bench
+    result = await run_scenario(client, build_scenarios(dataset)[route], counter, total=20, concurrency=4, warmup=1,
+                                seed_value=3)
+    assert (result["requests"], result["errors"]) == (20, 0)
+    assert result["mongo_ops_per_request"] >= 1
+    assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+
+async def test_timetable_reads_serialise_stored_entries(server, client, bench):
+    dataset, _ = bench
+    batch_id = dataset["timetable"][0]["batch_id"]
+    response = await client.get(f"/api/timetable/{batch_id}")
+    assert response.status_code == 200
+    assert len(response.json()) == sum(e["batch_id"] == batch_id for e in dataset["timetable"])
+    assert all("_id" not in entry for entry in response.json())
+
+
+def test_percentile_uses_the_nearest_rank():
+    values = sorted(random.Random(1).random() for _ in range(100))
+    assert percentile(values, 50) == values[49] and percentile(values, 99) == values[98]
+    assert percentile([], 95) == 0.0 and percentile([1.0], 95) == 1.0
+
+
+def test_compare_flags_regressions_past_the_threshold(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"routes": {
+        "faculty_list": {"p95_ms": 10.0, "mongo_ops_per_request": 1.0},
+        "subjects_list": {"p95_ms": 10.0, "mongo_ops_per_request": 1.0},
+    }}))
+    current = {"routes": {
+        "faculty_list": {"p95_ms": 11.0, "mongo_ops_per_request": 2.0},
+        "subjects_list": {"p95_ms": 13.0, "mongo_ops_per_request": 1.0},
+        "login": {"p95_ms": 99.0, "mongo_ops_per_request": 9.0},
+    }}
+    assert compare(current, baseline, threshold=0.2) == [
+        "faculty_list: mongo_ops_per_request 1.0 -> 2.0 (+100%)",
+        "subjects_list: p95_ms 10.0 -> 13.0 (+30%)",
+    ]
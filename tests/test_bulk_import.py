@@ -0,0 +1,86 @@
+"""CSV / JSON imports: per-row error reporting and upserts on the natural key."""
+import pytest
+
+from bulk_import import iter_json_records
+
+pytestmark = pytest.mark.anyio
+
+FACULTY_CSV = (
+    "name,email,department,subjects\n"
+    "Ada Lovelace,ada@uni.edu,CSE,Algorithms; Data Structures\n"
+    "No Email,,CSE,Algorithms\n"
+    "Alan Turing,alan@uni.edu,CSE,\"Computability|Logic\"\n"
+    "Grace Hopper,grace@uni.edu\n"
+)
+
+
+async def import_faculty(client, body, format="csv", **params):
+    return (await client.post("/api/import/faculty", content=body.encode(), params={"format": format, **params})).json()
+
+
+async def test_invalid_rows_are_reported_by_row_and_the_rest_imported(server, client):
+    report = await import_faculty(client, FACULTY_CSV)
+    assert report["success"]
+    assert (report["received"], report["inserted"], report["failed"]) == (4, 2, 2)
+    assert [error["row"] for error in report["errors"]] == [2, 4]
+    assert report["errors"][0]["error"].startswith("email:")
+    assert "department" in report["errors"][1]["error"]
+
+    ada = await server.db.faculty.find_one({"email": "ada@uni.edu"})
+    assert ada["subjects"] == ["Algorithms", "Data Structures"]
+    alan = await server.db.faculty.find_one({"email": "alan@uni.edu"})
+    assert alan["subjects"] == ["Computability", "Logic"]
+
+
+async def test_json_rows_that_are_not_objects_are_reported(server, client):
+    body = ('[{"name": "Ada", "email": "ada@uni.edu", "department": "CSE", "subjects": []}, 42,'
+            ' {"name": "Bad", "email": "x", "department": "CSE", "subjects": []}]')
+    report = await import_faculty(client, body, format="json")
+    assert report["inserted"] == 1
+    assert [(error["row"], error["error"]) for error in report["errors"]][0] == (2, "row must be an object")
+    assert report["errors"][1]["row"] == 3 and report["errors"][1]["error"].startswith("email:")
+
+
+async def test_reimport_updates_by_natural_key_and_keeps_ids(server, client):
+    await import_faculty(client, "name,email,department,subjects\nAda,ada@uni.edu,CSE,Algorithms\n")
+    first = await server.db.faculty.find_one({"email": "ada@uni.edu"})
+
+    report = await import_faculty(client, "name,email,department,subjects\nAda L.,ada@uni.edu,ECE,Logic\nAlan,alan@uni.edu,CSE,Logic\n")
+    assert (report["inserted"], report["updated"], report["failed"]) == (1, 1, 0)
+    assert await server.db.faculty.count_documents({}) == 2
+    second = await server.db.faculty.find_one({"email": "ada@uni.edu"})
+    assert (second["id"], second["created_at"]) == (first["id"], first["created_at"])
+    assert (second["name"], second["department"], second["subjects"]) == ("Ada L.", "ECE", ["Logic"])
+
+
+async def test_malformed_json_stops_the_import_with_a_message(server, client):
+    body = '[{"name": "Ada", "email": "ada@uni.edu", "department": "CSE", "subjects": []}, {"name": '
+    report = await import_faculty(client, body, format="json")
+    assert not report["success"]
+    assert report["message"].startswith("Import stopped after 1 rows")
+    assert await server.db.faculty.count_documents({}) == 1
+
+
+@pytest.mark.parametrize("body, message", [
+    ('[{"name": "Ada", "email": "ada@uni.edu", "department": "CSE", "subjects": []}'
+     ' {"name": "Alan", "email": "alan@uni.edu", "department": "CSE", "subjects": []}]',
+     "Expected ',' or ']' between JSON array elements"),
+    ('[{"name": "Ada", "email": "ada@uni.edu", "department": "CSE", "subjects": []},]',
+     "Trailing comma at the end of the JSON array"),
+    ('[, {"name": "Ada", "email": "ada@uni.edu", "department": "CSE", "subjects": []}]',
+     "Unexpected ',' in the JSON array"),
+])
+async def test_array_elements_must_be_separated_by_single_commas(server, client, body, message):
+    report = await import_faculty(client, body, format="json")
+    assert not report["success"] and report["message"].endswith(message)
+
+
+async def test_separators_split_across_chunks():
+    async def chunks(*parts):
+        for part in parts:
+            yield part
+
+    records = [r async for r in iter_json_records(chunks('[{"a": 1}', " ", ',', ' {"b"', ': 2}', "]"))]
+    assert records == [{"a": 1}, {"b": 2}]
+    ndjson = [r async for r in iter_json_records(chunks('{"a": 1}\n{"b": 2}\n'))]
+    assert ndjson == [{"a": 1}, {"b": 2}]
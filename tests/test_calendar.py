@@ -0,0 +1,146 @@
+"""Academic calendar: exceptions and substitutions merged into dated sessions (academic_calendar.py)."""
+from datetime import date
+
+import pytest
+
+from academic_calendar import absence_date, expand_sessions
+
+pytestmark = pytest.mark.anyio
+
+MONDAY = date(2026, 11, 2)
+TUESDAY = date(2026, 11, 3)
+SATURDAY = date(2026, 11, 7)
+
+
+def entry(batch_id, day, time_slot, faculty_id="ada"):
+    return {"id": f"{batch_id}-{day}-{time_slot}", "batch_id": batch_id, "day": day, "time_slot": time_slot,
+            "subject_id": "algo", "faculty_id": faculty_id, "classroom_id": "hall"}
+
+
+ENTRIES = [
+    entry("a", "monday", "09:00-10:00"),
+    entry("a", "monday", "10:00-11:00", "alan"),
+    entry("b", "monday", "09:00-10:00", "grace"),
+    entry("a", "tuesday", "09:00-10:00"),
+]
+
+
+def sessions(start, end, exceptions=(), substitutions=()):
+    return [(s["date"], s["batch_id"], s["time_slot"], s["faculty_id"])
+            for s in expand_sessions(ENTRIES, start, end, exceptions, substitutions)]
+
+
+def test_weekly_pattern_is_expanded_per_date_in_slot_order():
+    assert sessions(MONDAY, TUESDAY) == [
+        ("2026-11-02", "a", "09:00-10:00", "ada"), ("2026-11-02", "b", "09:00-10:00", "grace"),
+        ("2026-11-02", "a", "10:00-11:00", "alan"), ("2026-11-03", "a", "09:00-10:00", "ada"),
+    ]
+    assert sessions(date(2026, 11, 4), date(2026, 11, 8)) == []
+
+
+def test_holiday_for_everyone_or_only_some_batches():
+    assert sessions(MONDAY, MONDAY, [{"date": "2026-11-02", "kind": "holiday"}]) == []
+    assert sessions(MONDAY, MONDAY, [{"date": "2026-11-02", "kind": "holiday", "batch_ids": ["a"]}]) == [
+        ("2026-11-02", "b", "09:00-10:00", "grace")]
+
+
+def test_day_swap_runs_another_weekdays_timetable():
+    swap = {"date": "2026-11-07", "kind": "day_swap", "follows_day": "monday", "batch_ids": ["b"]}
+    assert sessions(SATURDAY, SATURDAY, [swap]) == [("2026-11-07", "b", "09:00-10:00", "grace")]
+    # A swap replaces the day's own timetable for the batches it applies to
+    swap = {"date": "2026-11-03", "kind": "day_swap", "follows_day": "monday"}
+    assert [s[1:3] for s in sessions(TUESDAY, TUESDAY, [swap])] == [
+        ("a", "09:00-10:00"), ("b", "09:00-10:00"), ("a", "10:00-11:00")]
+    [session] = expand_sessions(ENTRIES[2:3], SATURDAY, SATURDAY, [{**swap, "date": "2026-11-07"}])
+    assert (session["day"], session["weekday"]) == ("monday", "saturday")
+
+
+def test_cancellation_drops_one_batch_slot():
+    cancellation = {"date": "2026-11-02", "kind": "cancellation", "time_slot": "09:00-10:00", "batch_ids": ["a"]}
+    assert sessions(MONDAY, MONDAY, [cancellation]) == [
+        ("2026-11-02", "b", "09:00-10:00", "grace"), ("2026-11-02", "a", "10:00-11:00", "alan")]
+
+
+def test_substitute_takes_over_only_the_covered_session():
+    absence = {"id": "x", "lecturer_id": "ada", "date": "2026-11-02", "time_slot": "09:00-10:00", "substitute_id": "alan"}
+    pending = {**absence, "id": "y", "date": "2026-11-03", "substitute_id": None}
+    merged = list(expand_sessions(ENTRIES, MONDAY, TUESDAY, [], [absence, pending]))
+    covered = [s for s in merged if s.get("absence_id")]
+    assert [(s["date"], s["faculty_id"], s["original_faculty_id"], s["absence_id"]) for s in covered] == [
+        ("2026-11-02", "alan", "ada", "x")]
+    assert [s["faculty_id"] for s in merged if s["date"] == "2026-11-03"] == ["ada"]
+
+
+@pytest.mark.parametrize("stored, expected", [
+    ({"date": "2026-11-03"}, TUESDAY),
+    ({"date": "2026-11-03T16:30:00+00:00"}, TUESDAY),
+    # Legacy weekday names: the first such weekday on or after the day of the report
+    ({"date": "Tuesday", "created_at": "2026-11-02T08:00:00+00:00"}, TUESDAY),
+    ({"date": "monday", "created_at": "2026-11-02T08:00:00+00:00"}, MONDAY),
+    ({"date": "Monday", "created_at": "2026-11-03T08:00:00+00:00"}, date(2026, 11, 9)),
+    ({"date": "Monday"}, None),
+    ({"date": "next week"}, None),
+])
+def test_absence_date(stored, expected):
+    assert absence_date(stored) == expected
+
+
+@pytest.fixture
+async def timetable(server):
+    await server.db.timetable.insert_many([dict(e) for e in ENTRIES])
+
+
+async def test_absences_are_stored_with_an_iso_date(server, client):
+    report = {"lecturer_id": "ada", "time_slot": "09:00-10:00", "reason": "conference"}
+    for sent in ("2026-11-03", "2026-11-03T09:15:00Z"):
+        response = await client.post("/api/absences", json={**report, "date": sent})
+        assert response.status_code == 200 and response.json()["date"] == "2026-11-03"
+    weekday = (await client.post("/api/absences", json={**report, "date": "Monday"})).json()
+    assert date.fromisoformat(weekday["date"]).weekday() == 0
+    assert (await client.post("/api/absences", json={**report, "date": "soon"})).status_code == 400
+    assert await server.db.absences.count_documents({"date": "2026-11-03"}) == 2
+
+
+async def test_sessions_range_includes_timestamped_and_legacy_absences(server, client, timetable):
+    await server.db.absences.insert_many([
+        {"id": "iso", "lecturer_id": "ada", "date": "2026-11-03", "time_slot": "09:00-10:00", "substitute_id": "grace"},
+        {"id": "stamp", "lecturer_id": "alan", "date": "2026-11-02T07:00:00Z", "time_slot": "10:00-11:00",
+         "substitute_id": "grace"},
+        {"id": "legacy", "lecturer_id": "ada", "date": "Monday", "time_slot": "09:00-10:00", "substitute_id": "alan",
+         "created_at": "2026-10-30T12:00:00+00:00"},
+        {"id": "later", "lecturer_id": "ada", "date": "2026-11-09", "time_slot": "09:00-10:00", "substitute_id": "alan"},
+    ])
+    body = (await client.get("/api/calendar/sessions", params={"start": "2026-11-02", "end": "2026-11-03",
+                                                               "batch_id": "a"})).json()
+    assert [(s["date"], s["time_slot"], s["faculty_id"], s.get("absence_id")) for s in body["sessions"]] == [
+        ("2026-11-02", "09:00-10:00", "alan", "legacy"), ("2026-11-02", "10:00-11:00", "grace", "stamp"),
+        ("2026-11-03", "09:00-10:00", "grace", "iso"),
+    ]
+    # A lecturer's calendar includes the sessions they cover and drops the ones covered for them
+    body = (await client.get("/api/calendar/sessions", params={"start": "2026-11-02", "end": "2026-11-09",
+                                                               "faculty_id": "grace"})).json()
+    assert [(s["date"], s["batch_id"], s["time_slot"]) for s in body["sessions"]] == [
+        ("2026-11-02", "b", "09:00-10:00"), ("2026-11-02", "a", "10:00-11:00"),
+        ("2026-11-03", "a", "09:00-10:00"), ("2026-11-09", "b", "09:00-10:00"),
+    ]
+
+
+async def test_sessions_follow_stored_exceptions_in_range(server, client, timetable):
+    for exception in ({"date": "2026-11-02", "kind": "holiday", "batch_ids": ["b"]},
+                      {"date": "2026-11-07", "kind": "day_swap", "follows_day": "Tuesday"},
+                      {"date": "2026-11-10", "kind": "holiday"}):
+        assert (await client.post("/api/calendar/exceptions", json=exception)).status_code == 200
+    body = (await client.get("/api/calendar/sessions", params={"start": "2026-11-02", "end": "2026-11-08",
+                                                               "classroom_id": "hall"})).json()
+    assert sorted(e["date"] for e in body["exceptions"]) == ["2026-11-02", "2026-11-07"]
+    assert [(s["date"], s["batch_id"], s["time_slot"]) for s in body["sessions"]] == [
+        ("2026-11-02", "a", "09:00-10:00"), ("2026-11-02", "a", "10:00-11:00"),
+        ("2026-11-03", "a", "09:00-10:00"), ("2026-11-07", "a", "09:00-10:00"),
+    ]
+
+
+async def test_sessions_range_validation(client):
+    params = {"start": "2026-11-03", "end": "2026-11-02", "batch_id": "a"}
+    assert (await client.get("/api/calendar/sessions", params=params)).status_code == 400
+    params = {"start": "2026-11-02", "batch_id": "a", "faculty_id": "ada"}
+    assert (await client.get("/api/calendar/sessions", params=params)).status_code == 400
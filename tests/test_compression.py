@@ -0,0 +1,133 @@
+"""Response compression (compression.py) and versioned JSON bodies with weak ETags."""
+import gzip
+
+import brotli
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from compression import CompressionMiddleware, EncodedBody, negotiate
+
+pytestmark = pytest.mark.anyio
+
+TEXT = "timetable " * 300
+
+
+async def plain(request):
+    return PlainTextResponse(TEXT)
+
+
+async def small(request):
+    return PlainTextResponse("ok")
+
+
+async def events(request):
+    async def stream():
+        for i in range(3):
+            yield f"data: {i}\n\n"
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+async def streamed(request):
+    async def stream():
+        for _ in range(3):
+            yield TEXT
+    return StreamingResponse(stream(), media_type="text/csv")
+
+
+async def encoded(request):
+    return EncodedBody(TEXT.encode(), "text/plain").response(request.headers.get("accept-encoding"))
+
+
+@pytest.fixture
+async def app_client():
+    app = Starlette(routes=[Route(f"/{view.__name__}", view) for view in (plain, small, events, streamed, encoded)])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def raw(client, path, accept_encoding):
+    """Status, headers and the undecoded body bytes"""
+    async with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+def test_negotiate_prefers_br_and_honours_q_zero():
+    assert negotiate("gzip, deflate, br") == "br"
+    assert negotiate("gzip") == "gzip"
+    assert negotiate("br;q=0, gzip;q=0.5") == "gzip"
+    assert negotiate("*;q=0.1") == "br"
+    assert negotiate("identity") == negotiate(None) == negotiate("gzip;q=0") == "identity"
+
+
+@pytest.mark.parametrize("accept_encoding, decode", [("br, gzip", brotli.decompress), ("gzip", gzip.decompress)])
+async def test_body_is_compressed_in_the_negotiated_encoding(app_client, accept_encoding, decode):
+    response, body = await raw(app_client, "/plain", accept_encoding)
+    encoding = accept_encoding.split(",")[0]
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body) < len(TEXT)
+    assert decode(body).decode() == TEXT
+
+
+async def test_identity_and_small_bodies_pass_through(app_client):
+    response, body = await raw(app_client, "/plain", "identity")
+    assert "content-encoding" not in response.headers and body.decode() == TEXT
+    response, body = await raw(app_client, "/small", "gzip")
+    assert "content-encoding" not in response.headers and body == b"ok"
+
+
+async def test_streamed_body_is_compressed_incrementally(app_client):
+    response, body = await raw(app_client, "/streamed", "gzip")
+    assert response.headers["content-encoding"] == "gzip" and "content-length" not in response.headers
+    assert gzip.decompress(body).decode() == TEXT * 3
+
+
+async def test_event_stream_is_never_compressed(app_client):
+    response, body = await raw(app_client, "/events", "br, gzip")
+    assert "content-encoding" not in response.headers
+    assert body == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
+
+
+async def test_pre_encoded_body_is_not_compressed_twice(app_client):
+    response, body = await raw(app_client, "/encoded", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body).decode() == TEXT
+    response, body = await raw(app_client, "/encoded", "br")
+    assert brotli.decompress(body).decode() == TEXT
+
+
+@pytest.fixture
+async def subjects(server):
+    await server.db.subjects.insert_many([
+        server.Subject(name=f"Subject {i}", code=f"CS{i:03}", department="CSE", year=1, semester=1, type="theory",
+                       hours_per_week=3).dict()
+        for i in range(20)
+    ])
+
+
+async def test_versioned_json_is_compressed_and_revalidates_with_a_weak_etag(server, client, subjects):
+    response = await client.get("/api/subjects", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and len(response.json()) == 20
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    # The validator does not depend on the encoding, so a client that cached the br variant revalidates too
+    revalidated = await client.get("/api/subjects", headers={"Accept-Encoding": "br", "If-None-Match": etag})
+    assert revalidated.status_code == 304 and revalidated.headers["etag"] == etag and not revalidated.content
+
+
+async def test_etag_changes_after_a_version_bump(server, client, subjects):
+    etag = (await client.get("/api/subjects")).headers["etag"]
+    created = await client.post("/api/subjects", json={"name": "Compilers", "code": "CS999", "department": "CSE",
+                                                       "year": 3, "semester": 1, "type": "theory", "hours_per_week": 3})
+    assert created.status_code == 200
+
+    response = await client.get("/api/subjects", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert len(response.json()) == 21
+    await server.bump_versions(["subjects"])
+    assert (await client.get("/api/subjects")).headers["etag"] != response.headers["etag"]
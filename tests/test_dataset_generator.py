@@ -0,0 +1,61 @@
+"""Seeded synthetic datasets (dataset_generator.py): determinism and spec validation."""
+import json
+from collections import Counter
+
+import pytest
+
+from dataset_generator import DatasetSpec, generate_dataset
+
+pytestmark = pytest.mark.anyio
+
+
+def test_same_seed_gives_the_same_dataset():
+    first = generate_dataset(DatasetSpec.from_preset("small", seed=7))
+    second = generate_dataset(DatasetSpec.from_preset("small", seed=7))
+    assert json.dumps(first, default=str) == json.dumps(second, default=str)
+    other = generate_dataset(DatasetSpec.from_preset("small", seed=8))
+    assert json.dumps(first, default=str) != json.dumps(other, default=str)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_subject_names_are_unique_per_department(seed):
+    dataset = generate_dataset(DatasetSpec.from_preset("medium", seed=seed, years=6, subjects_per_semester=26))
+    names = Counter((s["department"], s["name"].removesuffix(" Lab")) for s in dataset["subjects"])
+    assert [key for key, count in names.items() if count > 1] == []
+
+
+def test_every_subject_has_a_qualified_lecturer():
+    dataset = generate_dataset(DatasetSpec.from_preset("small", seed=3))
+    taught = {(f["department"], name) for f in dataset["faculty"] for name in f["subjects"]}
+    assert all((s["department"], s["name"]) in taught for s in dataset["subjects"])
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"faculty_per_department": 0}, "faculty_per_department must be an integer from 1"),
+    ({"departments": -1}, "departments must be an integer from 1"),
+    ({"years": 7}, "years must be an integer from 1 to 6"),
+    ({"subjects_per_semester": 27}, "subjects_per_semester must be an integer from 1 to 26"),
+    ({"batches_per_year": "2"}, "batches_per_year must be an integer"),
+    ({"rooms": 0}, "rooms must be an integer from 1"),
+    ({"lab_ratio": 1.5}, "lab_ratio must be a number from 0.0 to 1.0"),
+    ({"target_room_utilisation": 0}, "target_room_utilisation must be a number"),
+    ({"term": "summer"}, "term must be 'odd' or 'even'"),
+    ({"room_mix": {"lab": -1}}, "room_mix must map room types to non-negative shares"),
+    ({"colour": "blue"}, "Unknown dataset parameters: colour"),
+])
+def test_invalid_specs_are_rejected(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        DatasetSpec.from_preset("toy", **overrides)
+
+
+async def test_synthetic_data_route_answers_400_for_an_invalid_spec(server, client):
+    response = await client.post("/api/init-sample-data/synthetic",
+                                 json={"preset": "toy", "overrides": {"faculty_per_department": 0}})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("faculty_per_department must be an integer")
+    response = await client.post("/api/init-sample-data/synthetic", json={"preset": "huge"})
+    assert response.status_code == 400
+
+    response = await client.post("/api/init-sample-data/synthetic", json={"preset": "toy", "seed": 4})
+    assert response.json()["success"]
+    assert await server.db.subjects.count_documents({}) == response.json()["counts"]["subjects"]
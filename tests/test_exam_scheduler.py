@@ -0,0 +1,60 @@
+"""Exam timetabling (exam_scheduler.py): no batch sits two exams in one period."""
+import random
+from collections import defaultdict
+
+import pytest
+
+from dataset_generator import DatasetSpec, generate_dataset
+from exam_scheduler import build_enrollments, schedule_exams
+
+DAYS = ["2026-11-02", "2026-11-03", "2026-11-04", "2026-11-05", "2026-11-06"]
+SESSIONS = ["09:00-12:00", "14:00-17:00"]
+
+
+def electives(data, seed, per_batch=3):
+    """Random cross-department enrollments, so exams conflict beyond a batch's own semester"""
+    rng = random.Random(seed)
+    subject_ids = [s["id"] for s in data["subjects"]]
+    return {b["id"]: rng.sample(subject_ids, per_batch) for b in data["batches"]}
+
+
+def assert_no_batch_sits_two_exams_at_once(data, schedule, extra):
+    enrollments = build_enrollments(data["subjects"], data["batches"], extra)
+    sittings = defaultdict(list)
+    for exam in schedule["exams"]:
+        assert exam["batch_ids"] == sorted(enrollments[exam["subject_id"]])
+        for batch_id in exam["batch_ids"]:
+            sittings[(batch_id, exam["period"])].append(exam["subject_id"])
+    assert {key: exams for key, exams in sittings.items() if len(exams) > 1} == {}
+    scheduled = {e["subject_id"] for e in schedule["exams"]} | {e["subject_id"] for e in schedule["unscheduled"]}
+    assert scheduled == set(enrollments)
+
+
+def assert_rooms_are_not_overbooked(data, schedule):
+    capacity = {r["id"]: r["capacity"] for r in data["classrooms"]}
+    used = defaultdict(int)
+    for exam in schedule["exams"]:
+        assert sum(room["seats"] for room in exam["rooms"]) == exam["students"]
+        for room in exam["rooms"]:
+            used[(exam["period"], room["classroom_id"])] += room["seats"]
+    assert all(seats <= capacity[room_id] for (_, room_id), seats in used.items())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_no_batch_has_two_exams_in_one_period(seed):
+    data = generate_dataset(DatasetSpec.from_preset("small", seed=seed))
+    extra = electives(data, seed)
+    schedule = schedule_exams(data, DAYS, SESSIONS, extra_enrollments=extra)
+    assert schedule["exams"] and schedule["stats"]["conflict_edges"] > 0
+    assert_no_batch_sits_two_exams_at_once(data, schedule, extra)
+    assert_rooms_are_not_overbooked(data, schedule)
+
+
+def test_too_few_periods_leaves_exams_unscheduled_instead_of_clashing():
+    data = generate_dataset(DatasetSpec.from_preset("small", seed=3))
+    extra = electives(data, 3, per_batch=6)
+    schedule = schedule_exams(data, DAYS[:2], SESSIONS[:1], extra_enrollments=extra)
+    assert schedule["unscheduled"]
+    assert {e["reason"] for e in schedule["unscheduled"]} <= {
+        "more conflicting exams than periods", "not enough free seats in any conflict-free period"}
+    assert_no_batch_sits_two_exams_at_once(data, schedule, extra)
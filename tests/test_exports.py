@@ -0,0 +1,57 @@
+"""Timetable exports: validators and iCalendar time zones."""
+from datetime import date
+
+import pytest
+
+from exports import vtimezone
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def batch(server):
+    db = server.db
+    await db.batches.insert_one({"id": "a", "name": "CSE-1A"})
+    await db.subjects.insert_one({"id": "algo", "name": "Algorithms", "code": "CS101"})
+    await db.faculty.insert_one({"id": "ada", "name": "Ada"})
+    await db.classrooms.insert_one({"id": "hall", "name": "Hall"})
+    await db.timetable.insert_one({"id": "t1", "batch_id": "a", "subject_id": "algo", "faculty_id": "ada",
+                                   "classroom_id": "hall", "day": "monday", "time_slot": "09:00-10:00"})
+    return "a"
+
+
+async def test_export_etag_is_weak_and_revalidates(server, client, batch):
+    url = f"/api/timetable/export/batch/{batch}?format=csv"
+    first = await client.get(url)
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+
+
+async def test_ics_with_a_zone_carries_its_vtimezone(server, client, batch, monkeypatch):
+    monkeypatch.setattr(server, "TIMETABLE_TZ", "Europe/London")
+    body = (await client.get(f"/api/timetable/export/batch/{batch}?format=ics&start=2026-03-02&weeks=12")).text
+    assert "BEGIN:VTIMEZONE\r\nTZID:Europe/London\r\n" in body
+    assert "DTSTART;TZID=Europe/London:20260302T090000" in body
+    assert body.index("END:VTIMEZONE") < body.index("BEGIN:VEVENT")
+
+
+async def test_ics_with_an_unknown_zone_uses_floating_times(server, client, batch, monkeypatch):
+    monkeypatch.setattr(server, "TIMETABLE_TZ", "Nowhere/Special")
+    body = (await client.get(f"/api/timetable/export/batch/{batch}?format=ics&start=2026-03-02")).text
+    assert "TZID" not in body and "DTSTART:20260302T090000" in body
+
+
+def test_vtimezone_lists_each_transition_in_the_range():
+    lines = vtimezone("Europe/London", date(2026, 3, 2), date(2026, 12, 1))
+    starts = [(lines[i - 1], line) for i, line in enumerate(lines) if line.startswith("DTSTART")]
+    assert starts == [
+        ("BEGIN:STANDARD", "DTSTART:19700101T000000"),
+        ("BEGIN:DAYLIGHT", "DTSTART:20260329T010000"),
+        ("BEGIN:STANDARD", "DTSTART:20261025T020000"),
+    ]
+    assert "TZOFFSETTO:+0100" in lines and "TZNAME:BST" in lines
+    assert vtimezone("Asia/Kolkata", date(2026, 3, 2), date(2026, 12, 1))[2:8] == [
+        "BEGIN:STANDARD", "DTSTART:19700101T000000", "TZOFFSETFROM:+0530", "TZOFFSETTO:+0530",
+        "TZNAME:IST", "END:STANDARD",
+    ]
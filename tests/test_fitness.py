@@ -0,0 +1,90 @@
+"""Vectorized scoring (fitness.py) agrees with scheduling.evaluate_timetable."""
+import random
+
+import pytest
+
+from dataset_generator import DatasetSpec, generate_dataset
+from fitness import FitnessModel
+from scheduling import DAYS, build_slot_grid, evaluate_timetable, greedy_schedule
+from server import TimetableConstraints
+
+
+def random_candidate(rng, data, slots, size):
+    """Entries drawn uniformly, so clashes, wrong rooms and unqualified lecturers are common;
+    a few carry an unknown id or a slot outside the grid"""
+    def pick(name):
+        return rng.choice(data[name])["id"]
+
+    entries = [{
+        "batch_id": pick("batches"), "subject_id": pick("subjects"), "faculty_id": pick("faculty"),
+        "classroom_id": pick("classrooms"), "day": rng.choice(DAYS), "time_slot": rng.choice(slots),
+    } for _ in range(size)]
+    for entry in rng.sample(entries, min(3, size)):
+        field, value = rng.choice([("faculty_id", "nobody"), ("day", "sunday"), ("time_slot", "03:00-04:00")])
+        entry[field] = value
+    return entries
+
+
+def assert_same_score(fast, slow):
+    assert fast["entries"] == slow["entries"]
+    assert fast["hard_violations"] == slow["hard_violations"]
+    assert fast["hard_total"] == slow["hard_total"]
+    assert fast["soft"] == pytest.approx(slow["soft"], abs=1e-3)
+    assert fast["soft_cost"] == pytest.approx(slow["soft_cost"], abs=1e-2)
+
+
+@pytest.mark.parametrize("constraints", [
+    TimetableConstraints(),
+    TimetableConstraints(max_hours_per_day=3, max_consecutive_hours=1, no_back_to_back_labs=False),
+])
+@pytest.mark.parametrize("seed", range(4))
+def test_random_candidates_score_like_evaluate_timetable(seed, constraints):
+    rng = random.Random(seed)
+    data = generate_dataset(DatasetSpec.from_preset("toy" if seed % 2 else "small", seed=seed))
+    model = FitnessModel(data, constraints)
+    slots = build_slot_grid(constraints)
+    candidates = [random_candidate(rng, data, slots, rng.randrange(0, 400)) for _ in range(5)]
+    candidates.append(greedy_schedule(data, constraints))
+
+    for candidate in candidates:
+        assert_same_score(model.score(candidate), evaluate_timetable(candidate, data, constraints))
+    assert model.score(candidates[-1])["soft"]["room_underuse"] > 0
+
+
+def test_room_underuse_is_the_empty_share_of_rooms_that_fit():
+    constraints = TimetableConstraints()
+    data = {
+        "batches": [{"id": "b40", "department": "CSE", "year": 1, "semester": 1, "student_count": 40},
+                    {"id": "b90", "department": "CSE", "year": 1, "semester": 1, "student_count": 90}],
+        "subjects": [{"id": "algo", "name": "Algorithms", "department": "CSE", "year": 2, "semester": 1,
+                      "type": "theory", "hours_per_week": 1}],
+        "faculty": [{"id": "ada", "subjects": []}],
+        "classrooms": [{"id": "hall", "type": "lecture_hall", "capacity": 60},
+                       {"id": "closet", "type": "lecture_hall", "capacity": 0}],
+    }
+
+    def session(batch_id, classroom_id, day):
+        return {"batch_id": batch_id, "subject_id": "algo", "faculty_id": "ada", "classroom_id": classroom_id,
+                "day": day, "time_slot": "09:00-10:00"}
+
+    # A third of the hall is empty for b40; b90 does not fit, which is a hard violation rather than underuse
+    candidate = [session("b40", "hall", "monday"), session("b90", "hall", "tuesday"), session("b40", "closet", "friday")]
+    slow = evaluate_timetable(candidate, data, constraints)
+    assert slow["soft"]["room_underuse"] == pytest.approx(1 / 3, abs=1e-3)
+    assert slow["hard_violations"]["room_capacity"] == 2
+    assert_same_score(FitnessModel(data, constraints).score(candidate), slow)
+
+
+def test_score_many_matches_scoring_one_at_a_time():
+    rng = random.Random(11)
+    constraints = TimetableConstraints()
+    data = generate_dataset(DatasetSpec.from_preset("small", seed=11))
+    model = FitnessModel(data, constraints)
+    slots = build_slot_grid(constraints)
+    candidates = [random_candidate(rng, data, slots, size) for size in (0, 1, 50, 300)]
+
+    together = model.score_many(candidates)
+    for i, candidate in enumerate(candidates):
+        alone = model.score(candidate)
+        assert together["hard_total"][i] == alone["hard_total"]
+        assert together["soft_cost"][i] == pytest.approx(alone["soft_cost"], abs=1e-3)
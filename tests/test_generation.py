@@ -0,0 +1,160 @@
+"""Timetable generation jobs: per-batch leases, fenced writes and job joining."""
+import asyncio
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONSTRAINTS = {"max_hours_per_day": 6}
+
+
+def slot(batch_id, faculty_id, time_slot="09:00-10:00", day="monday"):
+    return {"batch_id": batch_id, "subject_id": "algo", "faculty_id": faculty_id, "classroom_id": "hall",
+            "day": day, "time_slot": time_slot}
+
+
+@pytest.fixture
+async def campus(server):
+    db = server.db
+    await db.batches.insert_many([
+        server.StudentBatch(id=batch_id, name=batch_id.upper(), department="CSE", year=1, semester=1, student_count=30).dict()
+        for batch_id in ("a", "b")
+    ])
+    await db.subjects.insert_one(server.Subject(id="algo", name="Algorithms", code="CS101", department="CSE", year=1,
+                                                semester=1, type="theory", hours_per_week=3).dict())
+    await db.faculty.insert_many([
+        server.Faculty(id=faculty_id, name=faculty_id.title(), email=f"{faculty_id}@uni.edu", department="CSE",
+                       subjects=["Algorithms"]).dict()
+        for faculty_id in ("ada", "alan", "grace")
+    ])
+    await db.classrooms.insert_one(server.Classroom(id="hall", name="Hall", capacity=60, type="lecture_hall").dict())
+
+
+async def generate(client, fake_llm, batch_ids, entries, **params):
+    fake_llm.reply = entries
+    response = await client.post("/api/timetable/generate", json={"batch_ids": batch_ids, "constraints": CONSTRAINTS},
+                                 params=params)
+    return response.json()
+
+
+async def finished_job(client, job_id):
+    while True:
+        job = (await client.get(f"/api/timetable/generate/jobs/{job_id}")).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.05)
+
+
+async def stored_faculty(server, batch_id):
+    return [e["faculty_id"] for e in await server.db.timetable.find({"batch_id": batch_id}).to_list(None)]
+
+
+async def test_fences_are_per_batch_across_overlapping_batch_sets(server, client, fake_llm, campus):
+    for faculty_id in ("ada", "alan", "ada", "alan", "ada"):
+        assert (await generate(client, fake_llm, ["a"], [slot("a", faculty_id)]))["success"]
+    # batch:a is on token 6 by now, batch:b on its first
+    result = await generate(client, fake_llm, ["a", "b"], [slot("a", "alan"), slot("b", "alan", "10:00-11:00")])
+    assert result["success"]
+    assert {e["batch_id"]: e["fence"] for e in await server.db.timetable.find().to_list(None)} == {"a": 6, "b": 1}
+
+    result = await generate(client, fake_llm, ["b"], [slot("b", "grace", "10:00-11:00")])
+    assert result["success"] and len(result["diff"]["changed"]) == 1
+    assert await stored_faculty(server, "b") == ["grace"]
+    assert await stored_faculty(server, "a") == ["alan"]
+
+
+async def test_write_skipped_by_a_newer_fence_fails_the_job(server, client, fake_llm, campus):
+    await generate(client, fake_llm, ["a"], [slot("a", "ada"), slot("a", "ada", "10:00-11:00")])
+    # A newer holder of batch:a rewrote one slot while this generation was running
+    await server.db.timetable.update_one({"time_slot": "10:00-11:00"}, {"$set": {"fence": 99}})
+
+    result = await generate(client, fake_llm, ["a"], [slot("a", "alan"), slot("a", "alan", "10:00-11:00")])
+    assert not result["success"]
+    assert "1 of 2 slot changes were applied" in result["message"]
+    job = await server.db.generation_jobs.find_one({"id": result["job_id"]})
+    assert job["status"] == "failed"
+    assert sorted(await stored_faculty(server, "a")) == ["ada", "alan"]
+
+
+async def test_insert_into_a_slot_filled_meanwhile_is_skipped(server, client, fake_llm, campus, monkeypatch):
+    renew = server.batch_leases.renew
+
+    async def renew_after_a_concurrent_write(tokens, owner):
+        # Between reading the stored slots and writing, someone else filled the 09:00 slot
+        await server.db.timetable.update_one({"id": "newer"}, {"$setOnInsert": {**slot("a", "grace"), "fence": 99}},
+                                             upsert=True)
+        return await renew(tokens, owner)
+
+    monkeypatch.setattr(server.batch_leases, "renew", renew_after_a_concurrent_write)
+    result = await generate(client, fake_llm, ["a"], [slot("a", "ada"), slot("a", "ada", "10:00-11:00")])
+    assert not result["success"] and "1 of 2 slot changes were applied" in result["message"]
+    assert sorted(await stored_faculty(server, "a")) == ["ada", "grace"]
+    assert await server.db.timetable.count_documents({"time_slot": "09:00-10:00"}) == 1
+
+
+async def test_inserts_made_after_the_lease_was_lost_are_taken_back(server, client, fake_llm, campus, monkeypatch):
+    await generate(client, fake_llm, ["a"], [slot("a", "ada")])
+    renewals = []
+
+    async def renew(tokens, owner):
+        # The check before writing passes; by the one after the writes the lease has moved on
+        renewals.append(owner)
+        return len(renewals) == 1
+
+    monkeypatch.setattr(server.batch_leases, "renew", renew)
+    result = await generate(client, fake_llm, ["a"], [slot("a", "ada"), slot("a", "alan", "10:00-11:00")])
+    assert not result["success"] and "was lost" in result["message"]
+    assert len(renewals) == 2
+    assert await stored_faculty(server, "a") == ["ada"]
+
+
+async def test_identical_request_joins_the_running_job(server, client, fake_llm, campus):
+    fake_llm.delay = 0.2
+    first, second = await asyncio.gather(*(
+        generate(client, fake_llm, ["a"], [slot("a", "ada")], wait="false") for _ in range(2)
+    ))
+    assert first["job_id"] == second["job_id"]
+    assert sorted([first["joined"], second["joined"]]) == [False, True]
+
+    job = await finished_job(client, first["job_id"])
+    assert job["status"] == "succeeded" and job["fences"] == {"batch:a": 1}
+    assert len(fake_llm.prompts) == 1
+    assert await stored_faculty(server, "a") == ["ada"]
+
+
+async def test_overlapping_request_queues_behind_the_running_job(server, client, fake_llm, campus):
+    fake_llm.delay = 0.1
+    entries = [slot("a", "alan"), slot("b", "grace")]
+    queued = await generate(client, fake_llm, ["a"], entries, wait="false")
+    result = await generate(client, fake_llm, ["a", "b"], entries)
+    assert result["success"] and not result["joined"] and result["job_id"] != queued["job_id"]
+
+    first = await server.db.generation_jobs.find_one({"id": queued["job_id"]})
+    second = await server.db.generation_jobs.find_one({"id": result["job_id"]})
+    assert first["status"] == "succeeded" and second["started_at"] >= first["finished_at"]
+    assert await stored_faculty(server, "b") == ["grace"]
+
+
+@pytest.fixture
+def published(server, monkeypatch):
+    diffs = []
+    monkeypatch.setattr(server, "publish_timetable_diff", lambda diff, reason, **context: diffs.append(diff))
+    return diffs
+
+
+async def test_published_diff_matches_the_applied_writes(server, client, fake_llm, campus, published):
+    result = await generate(client, fake_llm, ["a"], [slot("a", "ada"), slot("a", "ada", "10:00-11:00")])
+    assert published == [result["diff"]] and len(result["diff"]["added"]) == 2
+
+    await server.db.timetable.update_one({"time_slot": "10:00-11:00"}, {"$set": {"fence": 99}})
+    result = await generate(client, fake_llm, ["a"], [slot("a", "alan"), slot("a", "alan", "10:00-11:00")])
+    assert not result["success"]
+    # Only the 09:00 change landed, and only it is reported and published
+    changed = result["diff"]["changed"]
+    assert [(row["time_slot"], row["before"]["faculty_id"], row["after"]["faculty_id"]) for row in changed] == [
+        ("09:00-10:00", "ada", "alan")]
+    assert not result["diff"]["added"] and not result["diff"]["removed"]
+    assert published[-1] == result["diff"]
+
+    week = (await client.get("/api/timetable/a/week", params={"expand": "true"})).json()
+    assert sorted(e["faculty_id"] for e in week["entries"]) == ["ada", "alan"]
@@ -0,0 +1,64 @@
+"""Expiring leases with fencing tokens (leases.py) on an in-memory collection."""
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from leases import Lease, LeaseLost, LeaseManager, LeaseUnavailable
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def manager():
+    return LeaseManager(AsyncMongoMockClient()["test"].leases, ttl_seconds=0.2, poll_seconds=0.01)
+
+
+async def test_acquire_is_exclusive_and_all_or_nothing(manager):
+    tokens = await manager.try_acquire(["batch:a", "batch:b"], "one")
+    assert tokens == {"batch:a": 1, "batch:b": 1}
+    assert await manager.try_acquire(["batch:b"], "two") is None
+    # "batch:c" was free, but the request also needs the held "batch:a"
+    assert await manager.try_acquire(["batch:c", "batch:a"], "two") is None
+    assert await manager.try_acquire(["batch:c"], "three") == {"batch:c": 1}
+
+
+async def test_tokens_grow_per_resource_on_every_acquisition(manager):
+    for expected in (1, 2, 3):
+        tokens = await manager.try_acquire(["batch:a"], "one")
+        assert tokens == {"batch:a": expected}
+        await manager.release(tokens, "one")
+    assert await manager.try_acquire(["batch:a", "batch:b"], "two") == {"batch:a": 4, "batch:b": 1}
+
+
+async def test_renew_only_for_the_current_holder(manager):
+    tokens = await manager.try_acquire(["batch:a"], "one")
+    assert await manager.renew(tokens, "one")
+    assert not await manager.renew(tokens, "two")
+    assert not await manager.renew({"batch:a": tokens["batch:a"] - 1}, "one")
+
+
+async def test_expired_lease_is_taken_over_and_the_old_holder_cannot_verify(manager):
+    # A stalled holder: acquired, but never renewed
+    lease = Lease(manager, "one", await manager.try_acquire(["batch:a"], "one"))
+    await asyncio.sleep(0.3)
+    assert await manager.acquire(["batch:a"], "two", timeout=1) == {"batch:a": 2}
+    with pytest.raises(LeaseLost):
+        await lease.verify()
+    # Releasing the lost lease leaves the new holder's document alone
+    await manager.release(lease.tokens, "one")
+    assert (await manager.collection.find_one({"_id": "batch:a"}))["owner"] == "two"
+
+
+async def test_held_lease_is_renewed_in_the_background(manager):
+    async with manager.hold(["batch:a"], "one", timeout=1) as lease:
+        await asyncio.sleep(0.5)
+        await lease.verify()
+        assert await manager.try_acquire(["batch:a"], "two") is None
+    assert await manager.try_acquire(["batch:a"], "two") == {"batch:a": 2}
+
+
+async def test_acquire_times_out_while_held(manager):
+    async with manager.hold(["batch:a"], "one", timeout=1):
+        with pytest.raises(LeaseUnavailable):
+            await manager.acquire(["batch:a"], "two", timeout=0.05)
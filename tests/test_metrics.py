@@ -0,0 +1,85 @@
+"""LLM token metrics (metrics.py): lazily loaded encoding, fallback estimate and counters."""
+import subprocess
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+import metrics
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+@pytest.fixture
+def tiktoken(monkeypatch):
+    """A stand-in tiktoken module; set `fail` to make get_encoding raise"""
+    module = types.ModuleType("tiktoken")
+    module.loads = 0
+    module.fail = None
+
+    def get_encoding(name):
+        module.loads += 1
+        if module.fail:
+            raise module.fail
+        return FakeEncoding()
+
+    module.get_encoding = get_encoding
+    monkeypatch.setitem(sys.modules, "tiktoken", module)
+    monkeypatch.setattr(metrics, "_encoding", None)
+    monkeypatch.setattr(metrics, "_encoding_loaded", False)
+    return module
+
+
+def test_importing_metrics_does_not_load_the_encoding():
+    code = ("import sys, types; tiktoken = types.ModuleType('tiktoken'); "
+            "tiktoken.get_encoding = lambda name: sys.exit('loaded at import'); sys.modules['tiktoken'] = tiktoken; "
+            "import metrics; assert not metrics._encoding_loaded")
+    subprocess.run([sys.executable, "-c", code], cwd=Path(metrics.__file__).parent, check=True)
+
+
+def test_encoding_is_loaded_once_on_first_use(tiktoken):
+    assert metrics.count_tokens("") == 0 and tiktoken.loads == 0
+    assert metrics.count_tokens("three word prompt") == 3
+    assert metrics.count_tokens("two words") == 2
+    assert tiktoken.loads == 1
+
+
+def test_unavailable_encoding_falls_back_to_an_estimate_and_says_so(tiktoken, caplog):
+    tiktoken.fail = OSError("no network")
+    assert metrics.count_tokens("x" * 40) == 10
+    assert metrics.count_tokens("hi") == 1
+    assert tiktoken.loads == 1
+    assert "estimated from text length: no network" in caplog.text
+
+
+def test_llm_call_records_prompt_and_completion_tokens(tiktoken):
+    before = {d: metrics.llm_tokens_total.value(operation="probe", direction=d) for d in ("prompt", "completion")}
+    metrics.observe_llm_call("probe", 0.2, "success", "a b c d", "e f")
+    metrics.observe_llm_call("probe", 0.1, "error", "g h", None)
+    after = {d: metrics.llm_tokens_total.value(operation="probe", direction=d) for d in ("prompt", "completion")}
+    assert (after["prompt"] - before["prompt"], after["completion"] - before["completion"]) == (6, 2)
+    assert 'llm_request_duration_seconds_count{operation="probe",outcome="error"} 1' in metrics.REGISTRY.render()
+
+
+async def test_substitute_suggestion_tokens_appear_on_the_metrics_endpoint(server, client, fake_llm, tiktoken):
+    await server.db.subjects.insert_one({"id": "algo", "name": "Algorithms"})
+    await server.db.faculty.insert_many([
+        {"id": f, "name": f, "email": f"{f}@uni.edu", "department": "CSE", "subjects": ["Algorithms"]}
+        for f in ("absent", "ada")])
+    await server.db.timetable.insert_one({"id": "t1", "batch_id": "b1", "subject_id": "algo", "faculty_id": "absent",
+                                          "classroom_id": "room", "day": "monday", "time_slot": "09:00-10:00"})
+    await server.db.absences.insert_one({"id": "a1", "lecturer_id": "absent", "date": "2026-10-19",
+                                         "time_slot": "09:00-10:00"})
+    fake_llm.reply = {"recommended_faculty_id": "ada", "reason": "free"}
+    label = 'operation="substitute_suggestion",direction="completion"'
+    before = metrics.llm_tokens_total.value(operation="substitute_suggestion", direction="completion")
+
+    assert (await client.post("/api/absences/a1/substitute")).json()["source"] == "llm"
+    body = (await client.get("/metrics")).text
+    assert f"llm_tokens_total{{{label}}} {before + 4}" in body
@@ -0,0 +1,132 @@
+"""Occupancy matrices (occupancy.py): diff deltas, utilisation summaries and rebuilds."""
+import asyncio
+
+import pytest
+from pymongo import UpdateOne
+
+from occupancy import META_ID, WRITERS_ID, occupancy_deltas, occupancy_documents, occupancy_updates, percentiles, summarise
+
+from .test_generation import campus, generate, slot  # noqa: F401 (campus is a fixture)
+
+pytestmark = pytest.mark.anyio
+
+
+def row(day, time_slot, faculty_id, classroom_id="hall"):
+    return {"batch_id": "a", "day": day, "time_slot": time_slot, "faculty_id": faculty_id, "classroom_id": classroom_id}
+
+
+def change(day, time_slot, before, after):
+    return {"batch_id": "a", "day": day, "time_slot": time_slot,
+            "before": {"subject_id": "algo", **before}, "after": {"subject_id": "algo", **after}}
+
+
+def test_deltas_follow_added_removed_and_changed_rows():
+    diff = {
+        "added": [row("monday", "09:00", "ada"), row("monday", "10:00", "ada")],
+        "removed": [row("tuesday", "09:00", "alan", "lab")],
+        "changed": [
+            # New lecturer, same room: the room's cell nets out and is left out
+            change("friday", "09:00", {"faculty_id": "ada", "classroom_id": "hall"},
+                   {"faculty_id": "grace", "classroom_id": "hall"}),
+        ],
+    }
+    assert occupancy_deltas(diff) == {
+        ("faculty", "ada"): {("monday", "09:00"): 1, ("monday", "10:00"): 1, ("friday", "09:00"): -1},
+        ("room", "hall"): {("monday", "09:00"): 1, ("monday", "10:00"): 1},
+        ("faculty", "alan"): {("tuesday", "09:00"): -1},
+        ("room", "lab"): {("tuesday", "09:00"): -1},
+        ("faculty", "grace"): {("friday", "09:00"): 1},
+    }
+    assert occupancy_deltas({"added": [row("monday", "09:00", None, None)], "removed": [], "changed": []}) == {}
+
+    [update] = [u for u in occupancy_updates(diff) if u._filter == {"_id": "faculty:ada"}]
+    assert update == UpdateOne({"_id": "faculty:ada"}, {
+        "$inc": {"cells.monday.09:00": 1, "cells.monday.10:00": 1, "cells.friday.09:00": -1, "total": 1},
+        "$setOnInsert": {"kind": "faculty", "resource_id": "ada"}}, upsert=True)
+
+
+def test_percentiles_interpolate():
+    assert percentiles([]) == {"p50": None, "p75": None, "p90": None, "p99": None}
+    assert percentiles([4, 1, 3, 2]) == {"p50": 2.5, "p75": 3.25, "p90": 3.7, "p99": 3.97}
+    assert percentiles([0.5], (0, 100)) == {"p0": 0.5, "p100": 0.5}
+
+
+def test_summary_counts_idle_resources_and_ranks_cells():
+    documents = occupancy_documents([row("monday", "09:00", "ada"), row("monday", "10:00", "ada"),
+                                     row("tuesday", "09:00", "ada", "lab")])
+    rooms = [d for d in documents if d["kind"] == "room"]
+    rooms[0]["cells"]["tuesday"] = {"10:00": -1}  # a drifted counter never shows as negative use
+    resources = [{"id": "hall", "name": "Hall"}, {"id": "lab", "name": "Lab"}, {"id": "annex", "name": "Annex"}]
+    summary = summarise(rooms, resources, ["monday", "tuesday"], ["09:00", "10:00"], limit=2, detail=True)
+
+    assert summary["resources"] == 3
+    assert [(r["id"], r["hours"], r["utilisation"]) for r in summary["busiest"]] == [("hall", 2, 0.5), ("lab", 1, 0.25)]
+    assert [r["id"] for r in summary["least_used"]] == ["annex", "lab"]
+    assert summary["mean_utilisation"] == 0.25
+    assert summary["utilisation_percentiles"]["p50"] == 0.25
+    assert summary["heatmap"] == [[0.3333, 0.3333], [0.3333, 0.0]]
+    assert [(c["day"], c["time_slot"], c["busy"]) for c in summary["peak_slots"]] == [
+        ("monday", "09:00", 1), ("monday", "10:00", 1)]
+    assert summary["matrix"][0] == {"id": "hall", "cells": [[1, 1], [0, 0]]}
+
+    empty = summarise([], [], ["monday"], ["09:00"])
+    assert empty["mean_utilisation"] is None and empty["heatmap"] == [[0.0]] and "matrix" not in empty
+
+
+async def matrices(server):
+    documents = await server.db.occupancy.find({"kind": {"$exists": True}}).to_list(None)
+    return {d["_id"]: (d["total"], d["cells"]) for d in documents if d["total"]}
+
+
+async def test_incremental_updates_match_a_rebuild(server, client, fake_llm, campus):
+    await generate(client, fake_llm, ["a", "b"], [slot("a", "ada"), slot("b", "alan", "10:00-11:00")])
+    await generate(client, fake_llm, ["a"], [slot("a", "grace"), slot("a", "grace", "11:00-12:00", "tuesday")])
+    incremental = await matrices(server)
+    assert set(incremental) == {"faculty:grace", "faculty:alan", "room:hall"}
+
+    assert (await client.post("/api/analytics/utilisation/rebuild")).json() == {"success": True, "entries": 3}
+    assert await matrices(server) == incremental
+    assert await server.db.occupancy.count_documents({"_id": "faculty:ada"}) == 0
+
+    body = (await client.get("/api/analytics/utilisation")).json()
+    assert body["rooms"]["busiest"][0] == {"id": "hall", "name": "Hall", "hours": 3, "sessions": 3,
+                                           "utilisation": round(3 / (5 * 7), 4)}
+    assert body["faculty"]["resources"] == 3
+
+
+async def test_concurrent_reads_of_stale_matrices_rebuild_without_errors(server, client, fake_llm, campus):
+    await generate(client, fake_llm, ["a"], [slot("a", "ada")])
+    await server.db.occupancy.delete_one({"_id": META_ID})
+    responses = await asyncio.gather(*(client.get("/api/analytics/utilisation") for _ in range(5)))
+    assert {r.status_code for r in responses} == {200}
+    # Rebuilds that do overlap (other workers) replace the same documents instead of colliding
+    await asyncio.gather(*(server.rebuild_occupancy() for _ in range(3)))
+    assert await server.db.occupancy.find_one({"_id": META_ID}) is not None
+    assert (await matrices(server))["room:hall"][0] == 1
+
+
+async def test_rebuild_overlapping_a_timetable_write_stays_stale(server, monkeypatch):
+    await server.db.timetable.insert_one(row("monday", "09:00", "ada"))
+    async with server.occupancy_write():
+        await server.rebuild_occupancy()
+    assert await server.db.occupancy.find_one({"_id": META_ID}) is None
+
+    # A write that starts (and even finishes) while the rebuild runs is caught by the counter
+    replacements = server.occupancy_replacements
+    monkeypatch.setattr(server, "occupancy_replacements", lambda documents: replacements(documents) + [
+        UpdateOne({"_id": WRITERS_ID}, {"$inc": {"writes": 1}})])
+    await server.rebuild_occupancy()
+    assert await server.db.occupancy.find_one({"_id": META_ID}) is None
+
+    monkeypatch.setattr(server, "occupancy_replacements", replacements)
+    assert await server.rebuild_occupancy() == 1
+    assert await server.db.occupancy.find_one({"_id": META_ID}) is not None
+
+
+async def test_a_failed_write_marks_the_matrices_stale(server):
+    await server.rebuild_occupancy()
+    with pytest.raises(RuntimeError):
+        async with server.occupancy_write():
+            raise RuntimeError("bulk write failed")
+    assert await server.db.occupancy.find_one({"_id": META_ID}) is None
+    assert (await server.db.occupancy.find_one({"_id": WRITERS_ID}))["active"] == {}
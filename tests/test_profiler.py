@@ -0,0 +1,109 @@
+"""Slow-query profiler (profiler.py): threshold, shape eviction and redacted samples."""
+import asyncio
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+
+import profiler
+from profiler import SlowQueryProfiler, redact
+
+pytestmark = pytest.mark.anyio
+
+_request_ids = count()
+
+
+def run_command(listener, command, duration_ms, database="test"):
+    """Feed the listener a started/succeeded pair like pymongo's command monitoring does"""
+    name = next(iter(command))
+    event = SimpleNamespace(connection_id=("localhost", 27017), request_id=next(_request_ids), command_name=name,
+                            database_name=database, command=command, duration_micros=int(duration_ms * 1000))
+    listener.started(event)
+    listener.succeeded(event)
+
+
+def find(collection, filter_):
+    return {"find": collection, "filter": filter_, "lsid": {"id": "session"}}
+
+
+def test_only_commands_at_or_above_the_threshold_are_recorded():
+    listener = SlowQueryProfiler(threshold_ms=50, explain=False)
+    run_command(listener, find("faculty", {"email": "a@uni.edu"}), 49.9)
+    assert listener.report() == []
+    run_command(listener, find("faculty", {"email": "b@uni.edu"}), 50)
+    run_command(listener, find("faculty", {"email": "c@uni.edu"}), 120)
+    run_command(listener, {"ping": 1}, 500)
+    [shape] = listener.report()
+    assert (shape["count"], shape["max_ms"], shape["total_ms"]) == (2, 120.0, 170.0)
+    assert shape["shape"] == {"email": "str"} and shape["explain_state"] == "skipped"
+
+
+def test_a_new_shape_evicts_the_cheapest_once_full(monkeypatch):
+    monkeypatch.setattr(profiler, "MAX_SHAPES", 2)
+    listener = SlowQueryProfiler(threshold_ms=0, explain=False)
+    run_command(listener, find("faculty", {"email": "x"}), 300)
+    run_command(listener, find("subjects", {"code": "x"}), 100)
+    run_command(listener, find("subjects", {"code": "y"}), 100)
+    run_command(listener, find("batches", {"name": "x"}), 150)
+    assert [s["collection"] for s in listener.report()] == ["test.faculty", "test.batches"]
+    run_command(listener, find("classrooms", {"name": "x"}), 10)
+    assert [s["collection"] for s in listener.report()] == ["test.faculty", "test.classrooms"]
+    listener.reset()
+    assert listener.report() == []
+
+
+def test_sample_filter_keeps_keys_and_operators_but_no_values():
+    filter_ = {"email": "ada@uni.edu", "expires_at": {"$gt": 1700000000},
+               "$or": [{"role": "admin"}, {"batch": {"$in": ["CSE-1A", "CSE-1B"]}}]}
+    assert redact(filter_) == {"email": "?str", "expires_at": {"$gt": "?int"},
+                               "$or": [{"role": "?str"}, {"batch": {"$in": ["?str", "?str"]}}]}
+
+    listener = SlowQueryProfiler(threshold_ms=0, explain=False)
+    run_command(listener, find("sessions", filter_), 200)
+    assert listener.report()[0]["sample_filter"] == redact(filter_)
+
+
+class ExplainingClient:
+    """Answers explain with a plan that repeats the filter's values, as Mongo does"""
+
+    def __init__(self):
+        self.commands = []
+
+    def __getitem__(self, database):
+        return self
+
+    async def command(self, command):
+        self.commands.append(command)
+        return {"queryPlanner": {
+            "parsedQuery": {"email": {"$eq": "ada@uni.edu"}},
+            "winningPlan": {"stage": "FETCH", "inputStage": {
+                "stage": "IXSCAN", "keyPattern": {"email": 1},
+                "indexBounds": {"email": ['["ada@uni.edu", "ada@uni.edu"]']}}},
+        }}
+
+
+async def test_explain_runs_with_the_real_filter_but_keeps_only_a_redacted_plan():
+    listener = SlowQueryProfiler(threshold_ms=0)
+    client = ExplainingClient()
+    listener.attach(asyncio.get_running_loop(), client)
+    run_command(listener, find("faculty", {"email": "ada@uni.edu"}), 200)
+    while listener._tasks or listener.report()[0]["explain_state"] == "pending":
+        await asyncio.sleep(0.01)
+
+    assert client.commands == [{"explain": {"find": "faculty", "filter": {"email": "ada@uni.edu"}},
+                                "verbosity": "queryPlanner"}]
+    [shape] = listener.report()
+    assert shape["explain_state"] == "captured" and shape["plan"] == "FETCH <- IXSCAN {email: 1}"
+    assert "ada@uni.edu" not in repr(shape)
+    assert shape["explain"]["queryPlanner"]["parsedQuery"] == {"email": {"$eq": "?str"}}
+
+
+async def test_diagnostics_endpoint_does_not_leak_filter_values(server, client, caplog):
+    server.slow_queries.reset()
+    try:
+        run_command(server.slow_queries, find("sessions", {"_id": "0f3a9c-token-hash"}), 10 ** 6)
+        body = (await client.get("/api/diagnostics/slow-queries")).json()
+    finally:
+        server.slow_queries.reset()
+    assert body["shapes"][0]["sample_filter"] == {"_id": "?str"}
+    assert "token-hash" not in repr(body) and "token-hash" not in caplog.text
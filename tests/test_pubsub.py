@@ -0,0 +1,192 @@
+"""Publish/subscribe hub behind the Server-Sent Event streams (pubsub.py)."""
+import asyncio
+import json
+
+import pytest
+
+from pubsub import CLOSED, HEARTBEAT, Hub, TooManySubscribers
+from scheduling import diff_entries, split_diff_by_subscriber
+
+pytestmark = pytest.mark.anyio
+
+
+def drain(subscription):
+    """Everything queued for a subscription right now, without waiting"""
+    items = []
+    while not subscription.queue.empty():
+        items.append(subscription.queue.get_nowait())
+    return items
+
+
+def payloads(subscription):
+    return [item[2] for item in drain(subscription) if item not in (HEARTBEAT, CLOSED)]
+
+
+async def test_publish_fans_out_to_every_subscriber_of_the_topic():
+    hub = Hub()
+    first, second = hub.subscribe(["announcements"]), hub.subscribe(["announcements"])
+    other = hub.subscribe(["elsewhere"])
+    both = hub.subscribe(["announcements", "elsewhere", "announcements"])
+    assert both.topics == ("announcements", "elsewhere")
+
+    hub.publish("announcements", "announcement", {"n": 1})
+    hub.publish("elsewhere", "announcement", {"n": 2})
+    hub.publish("nobody", "announcement", {"n": 3})
+
+    assert payloads(first) == payloads(second) == [{"n": 1}]
+    assert payloads(other) == [{"n": 2}]
+    assert payloads(both) == [{"n": 1}, {"n": 2}]
+    assert hub.subscriber_count == 4
+    for subscription in (first, second, other, both):
+        subscription.close()
+    assert hub.subscriber_count == 0 and hub._subscribers == {}
+
+
+async def test_event_ids_increase_across_topics_within_a_process():
+    hub = Hub()
+    ids = [hub.publish(topic, "announcement", {}) for topic in ("a", "b", "a", "c")]
+    epochs = {event_id.split("-")[0] for event_id in ids}
+    assert epochs == {hub.epoch}
+    assert [int(event_id.split("-")[1]) for event_id in ids] == [1, 2, 3, 4]
+
+
+async def test_subscriber_limit():
+    hub = Hub(max_subscribers=1)
+    subscription = hub.subscribe(["announcements"])
+    with pytest.raises(TooManySubscribers):
+        hub.subscribe(["announcements"])
+    subscription.close()
+    hub.subscribe(["announcements"]).close()
+
+
+async def test_sse_stream_renders_events_and_heartbeats():
+    hub = Hub(heartbeat_seconds=0.01)
+    subscription = hub.subscribe(["announcements"])
+    stream = hub.sse_stream(subscription, retry_ms=1000)
+    assert await stream.__anext__() == "retry: 1000\n: connected\n\n"
+
+    event_id = hub.publish("announcements", "announcement", {"title": "Exams", "n": 1})
+    frame = await stream.__anext__()
+    head, data = frame.rstrip("\n").rsplit("\n", 1)
+    assert head == f"id: {event_id}\nevent: announcement"
+    assert json.loads(data.removeprefix("data: ")) == {"title": "Exams", "n": 1}
+
+    assert await asyncio.wait_for(stream.__anext__(), timeout=1) == ": ping\n\n"
+    await stream.aclose()
+    assert hub.subscriber_count == 0
+
+
+async def test_a_closed_subscription_ends_its_stream():
+    hub = Hub()
+    subscription = hub.subscribe(["announcements"])
+    hub.publish("announcements", "announcement", {"n": 1})
+    subscription.close()
+    assert [item async for item in subscription] == [(1, "announcement", {"n": 1})]
+
+
+async def test_reconnect_replays_only_what_the_client_missed():
+    hub = Hub(replay_size=10)
+    ids = [hub.publish("batch:b1", "timetable_diff", {"n": n}) for n in range(4)]
+    hub.publish("batch:b2", "timetable_diff", {"n": "other batch"})
+
+    assert payloads(hub.subscribe(["batch:b1"])) == []
+    assert payloads(hub.subscribe(["batch:b1"], last_event_id=ids[1])) == [{"n": 2}, {"n": 3}]
+    assert payloads(hub.subscribe(["batch:b1"], last_event_id=ids[-1])) == []
+    # Replay across topics keeps publication order
+    assert payloads(hub.subscribe(["batch:b2", "batch:b1"], last_event_id=ids[2])) == [{"n": 3}, {"n": "other batch"}]
+
+
+async def test_reconnect_from_before_the_replay_buffer_gets_the_whole_buffer():
+    hub = Hub(replay_size=3)
+    ids = [hub.publish("announcements", "announcement", {"n": n}) for n in range(6)]
+    # The client's position fell out of the buffer: it receives everything still kept
+    assert payloads(hub.subscribe(["announcements"], last_event_id=ids[0])) == [{"n": 3}, {"n": 4}, {"n": 5}]
+    # An id from a previous process (other epoch) or a malformed one is treated the same way
+    for stale in ("0-5", f"{hub.epoch}-x", "garbage"):
+        assert payloads(hub.subscribe(["announcements"], last_event_id=stale)) == [{"n": 3}, {"n": 4}, {"n": 5}]
+
+
+async def test_replay_never_fills_the_queue():
+    hub = Hub(replay_size=100, queue_size=4)
+    [hub.publish("announcements", "announcement", {"n": n}) for n in range(10)]
+    subscription = hub.subscribe(["announcements"], last_event_id="0-0")
+    # The newest events fit with a slot to spare, so the next publish does not disconnect it
+    assert subscription.queue.qsize() == 3
+    hub.publish("announcements", "announcement", {"n": 10})
+    assert hub.subscriber_count == 1
+    assert payloads(subscription) == [{"n": 7}, {"n": 8}, {"n": 9}, {"n": 10}]
+
+
+async def test_a_slow_consumer_is_disconnected_and_can_resume():
+    hub = Hub(queue_size=3)
+    slow, fast = hub.subscribe(["announcements"]), hub.subscribe(["announcements"])
+    ids = []
+    for n in range(3):
+        ids.append(hub.publish("announcements", "announcement", {"n": n}))
+        assert payloads(fast) == [{"n": n}]
+    # The slow queue is full: the next event disconnects it, the fast subscriber still gets it
+    ids.append(hub.publish("announcements", "announcement", {"n": 3}))
+    assert hub.subscriber_count == 1 and payloads(fast) == [{"n": 3}]
+
+    # Its stream ends early without skipping anything: the newest queued event makes way for CLOSED
+    # and comes back, with everything after it, when the client resumes from its last event id
+    assert [item[2] async for item in slow] == [{"n": 0}, {"n": 1}]
+    resumed = hub.subscribe(["announcements"], last_event_id=ids[1])
+    assert payloads(resumed) == [{"n": 2}, {"n": 3}]
+
+
+async def test_predicate_filters_live_events_and_replay():
+    hub = Hub()
+    students = lambda announcement: "student" in announcement["target_roles"]
+    hub.publish("announcements", "announcement", {"title": "staff meeting", "target_roles": ["lecturer"]})
+    hub.publish("announcements", "announcement", {"title": "exams", "target_roles": ["student", "lecturer"]})
+
+    subscription = hub.subscribe(["announcements"], students, last_event_id="0-0")
+    hub.publish("announcements", "announcement", {"title": "payroll", "target_roles": ["admin"]})
+    hub.publish("announcements", "announcement", {"title": "holiday", "target_roles": ["student"]})
+    assert [a["title"] for a in payloads(subscription)] == ["exams", "holiday"]
+
+
+async def test_announcement_stream_only_sends_announcements_for_the_role(server, client):
+    class StreamRequest:
+        headers = {}
+
+    async def next_frame(stream):
+        return await asyncio.wait_for(stream.__anext__(), timeout=1)
+
+    streams = {role: (await server.stream_announcements(StreamRequest(), role=role)).body_iterator
+               for role in ("student", "lecturer", None)}
+    try:
+        for stream in streams.values():
+            assert (await next_frame(stream)).endswith(": connected\n\n")
+        for title, roles in (("Lab closed", ["lecturer"]), ("Exam dates", ["student", "lecturer"])):
+            response = await client.post("/api/announcements", json={
+                "title": title, "message": "-", "author": "office", "target_roles": roles})
+            assert response.status_code == 200
+
+        def title(frame):
+            return json.loads(frame.rstrip("\n").rsplit("data: ", 1)[1])["title"]
+        assert title(await next_frame(streams["student"])) == "Exam dates"
+        assert [title(await next_frame(streams["lecturer"])) for _ in range(2)] == ["Lab closed", "Exam dates"]
+        assert [title(await next_frame(streams[None])) for _ in range(2)] == ["Lab closed", "Exam dates"]
+    finally:
+        for stream in streams.values():
+            await stream.aclose()
+
+
+def test_timetable_diffs_are_split_per_batch_and_lecturer():
+    def entry(batch, day, slot, faculty, subject="s1"):
+        return {"id": f"{batch}-{day}-{slot}", "batch_id": batch, "day": day, "time_slot": slot,
+                "subject_id": subject, "faculty_id": faculty, "classroom_id": "r1"}
+
+    old = [entry("b1", "monday", "09:00", "f1"), entry("b1", "tuesday", "09:00", "f1"), entry("b2", "monday", "09:00", "f2")]
+    new = [entry("b1", "monday", "09:00", "f3"), entry("b2", "monday", "09:00", "f2"), entry("b2", "friday", "11:00", "f2")]
+    slices = split_diff_by_subscriber(diff_entries(old, new))
+
+    assert set(slices) == {"batch:b1", "batch:b2", "faculty:f1", "faculty:f2", "faculty:f3"}
+    assert [c["day"] for c in slices["batch:b1"]["changed"]] == ["monday"]
+    assert [r["day"] for r in slices["batch:b1"]["removed"]] == ["tuesday"]
+    assert [a["day"] for a in slices["batch:b2"]["added"]] == ["friday"]
+    # Both the lecturer who lost the slot and the one who took it over are told
+    assert slices["faculty:f1"]["changed"] == slices["faculty:f3"]["changed"] == slices["batch:b1"]["changed"]
+    assert slices["faculty:f2"] == {"added": slices["batch:b2"]["added"], "removed": [], "changed": []}
@@ -0,0 +1,90 @@
+"""Qualification index (qualifications.py): subject name normalisation and live updates."""
+import pytest
+
+from qualifications import QualificationIndex, qualification_map, subject_key
+
+pytestmark = pytest.mark.anyio
+
+
+def lecturer(faculty_id, *subjects):
+    return {"id": faculty_id, "subjects": list(subjects)}
+
+
+@pytest.fixture
+def index():
+    index = QualificationIndex()
+    index.replace_kind("subjects", [{"id": "ds", "name": "Data Structures"}, {"id": "os", "name": "Operating Systems"}])
+    index.replace_kind("faculty", [lecturer("ada", "Data Structures"), lecturer("alan", "Operating Systems")])
+    return index
+
+
+@pytest.mark.parametrize("name", [
+    "Data Structures", "data structures", "DATA STRUCTURES", "  Data   Structures ", "Data\tStructures\n",
+    "Dàta Strùctures",
+])
+def test_name_variants_share_a_key(name):
+    assert subject_key(name) == "data structures"
+
+
+def test_case_and_whitespace_variants_qualify(index):
+    index.upsert("faculty", lecturer("grace", "  DATA  structures", "operating\tsystems"))
+    assert index.faculty_for("ds") == {"ada", "grace"}
+    assert index.faculty_for("os") == {"alan", "grace"}
+    assert index.is_qualified("grace", "ds") and not index.is_qualified("alan", "ds")
+    # Blank names qualify nobody for anything
+    index.upsert("faculty", lecturer("blank", "", "   ", None))
+    assert index.subject_map() == {"ds": ["ada", "grace"], "os": ["alan", "grace"]}
+
+
+def test_changing_a_lecturers_subjects_moves_them(index):
+    index.upsert("faculty", lecturer("ada", "operating systems"))
+    assert index.faculty_for("ds") == frozenset() and index.faculty_for("os") == {"ada", "alan"}
+    index.upsert("faculty", lecturer("ada"))
+    assert index.faculty_for("os") == {"alan"} and not index.is_qualified("ada", "os")
+    index.remove("faculty", "alan")
+    assert index.subject_map() == {"ds": [], "os": []}
+    assert len(index) == 1
+
+
+def test_subject_added_or_renamed_after_its_lecturers(index):
+    index.upsert("faculty", lecturer("grace", "Compilers"))
+    assert index.faculty_for("cc") == frozenset()
+    index.upsert("subjects", {"id": "cc", "name": "COMPILERS "})
+    assert index.faculty_for("cc") == {"grace"}
+
+    index.upsert("subjects", {"id": "cc", "name": "Data Structures"})
+    assert index.faculty_for("cc") == {"ada"}
+    index.remove("subjects", "cc")
+    assert index.faculty_for("cc") == frozenset() and not index.is_qualified("ada", "cc")
+
+
+def test_subjects_sharing_a_name_share_lecturers():
+    faculty = [lecturer("ada", "Data Structures")]
+    subjects = [{"id": "ds1", "name": "Data Structures"}, {"id": "ds3", "name": "data structures"},
+                {"id": "os", "name": "Operating Systems"}]
+    assert qualification_map(faculty, subjects) == {"ds1": ["ada"], "ds3": ["ada"], "os": []}
+
+
+async def test_faculty_updates_through_the_api_reach_the_index(server, client):
+    subject = {"name": "Data Structures", "code": "CS201", "department": "CSE", "year": 2, "semester": 3,
+               "type": "theory", "hours_per_week": 3}
+    subject_id = (await client.post("/api/subjects", json=subject)).json()["id"]
+    ada = {"name": "Ada", "email": "ada@uni.edu", "department": "CSE", "subjects": ["data  STRUCTURES"]}
+    ada_id = (await client.post("/api/faculty", json=ada)).json()["id"]
+    await server.refresh_qualification_index()
+    assert server.qualification_index.faculty_for(subject_id) == {ada_id}
+
+    await client.put(f"/api/faculty/{ada_id}", json={**ada, "subjects": ["Operating Systems"]})
+    await server.refresh_qualification_index()
+    assert server.qualification_index.faculty_for(subject_id) == frozenset()
+
+    # A write by another worker is picked up at the next version check
+    await server.db.faculty.update_one({"id": ada_id}, {"$set": {"subjects": ["Data Structures"]}})
+    await server.bump_versions(["faculty"])
+    server.qualification_state["checked_at"] = None
+    await server.refresh_qualification_index()
+    assert server.qualification_index.faculty_for(subject_id) == {ada_id}
+
+    await client.delete(f"/api/faculty/{ada_id}")
+    await server.refresh_qualification_index()
+    assert server.qualification_index.faculty_for(subject_id) == frozenset()
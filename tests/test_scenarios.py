@@ -0,0 +1,116 @@
+"""What-if scenarios (scenarios.py): edits on a snapshot, scheduled around the batches left out."""
+import pytest
+
+from scenarios import ScenarioError, run_scenario
+from scheduling import evaluate_timetable, greedy_schedule
+from server import TimetableConstraints
+
+pytestmark = pytest.mark.anyio
+
+CONSTRAINTS = TimetableConstraints()
+
+
+def batch(batch_id):
+    return {"id": batch_id, "name": batch_id.upper(), "department": "CSE", "year": 1, "semester": 1, "student_count": 40}
+
+
+@pytest.fixture
+def snapshot():
+    return {
+        "batches": [batch("b1"), batch("b2")],
+        "subjects": [{"id": "algo", "name": "Algorithms", "code": "CS101", "department": "CSE", "year": 1,
+                      "semester": 1, "type": "theory", "hours_per_week": 1}],
+        "faculty": [{"id": "ada", "name": "Ada", "subjects": ["Algorithms"]}],
+        "classrooms": [{"id": "hall", "name": "Hall", "type": "lecture_hall", "capacity": 60}],
+    }
+
+
+def entry(batch_id, day="monday", time_slot="09:00-10:00", faculty_id="ada", classroom_id="hall"):
+    return {"batch_id": batch_id, "subject_id": "algo", "faculty_id": faculty_id, "classroom_id": classroom_id,
+            "day": day, "time_slot": time_slot}
+
+
+def slots(entries):
+    return {(e["day"], e["time_slot"]) for e in entries}
+
+
+def test_greedy_keeps_clear_of_fixed_entries(snapshot):
+    only_b1 = {**snapshot, "batches": [batch("b1")]}
+    assert slots(greedy_schedule(only_b1, CONSTRAINTS)) == {("monday", "09:00-10:00")}
+    fixed = [entry("b2")]
+    [placed] = greedy_schedule(only_b1, CONSTRAINTS, fixed)
+    assert (placed["day"], placed["time_slot"]) != ("monday", "09:00-10:00")
+    assert evaluate_timetable([placed], only_b1, CONSTRAINTS, fixed)["hard_total"] == 0
+
+
+def test_evaluation_counts_clashes_with_fixed_entries_only_once(snapshot):
+    only_b1 = {**snapshot, "batches": [batch("b1")]}
+    fixed = [entry("b2"), entry("b3")]  # already clashing with each other: not b1's doing
+    hard = evaluate_timetable([entry("b1")], only_b1, CONSTRAINTS, fixed)["hard_violations"]
+    assert (hard["faculty_clash"], hard["room_clash"]) == (1, 1)
+    hard = evaluate_timetable([entry("b1", day="tuesday")], only_b1, CONSTRAINTS, fixed)["hard_violations"]
+    assert (hard["faculty_clash"], hard["room_clash"]) == (0, 0)
+
+
+def test_fixed_hours_count_towards_the_daily_limit(snapshot):
+    constraints = TimetableConstraints(max_hours_per_day=2)
+    only_b1 = {**snapshot, "batches": [batch("b1")]}
+    fixed = [entry("b2", time_slot=s) for s in ("09:00-10:00", "10:00-11:00")]
+    hard = evaluate_timetable([entry("b1", time_slot="11:00-12:00")], only_b1, constraints, fixed)["hard_violations"]
+    assert hard["faculty_daily_hours"] == 1
+    # Three fixed hours are already over the limit; only the scoped entry's extra hour is counted
+    fixed.append(entry("b3", time_slot="13:00-14:00"))
+    hard = evaluate_timetable([entry("b1", time_slot="11:00-12:00")], only_b1, constraints, fixed)["hard_violations"]
+    assert hard["faculty_daily_hours"] == 1
+    [placed] = greedy_schedule(only_b1, constraints, fixed)
+    assert placed["day"] != "monday"
+
+
+def validate(resource, record):
+    if "id" not in record:
+        raise ValueError("id is required")
+    return record
+
+
+def test_scoped_scenario_schedules_around_the_other_batches(snapshot):
+    current = [entry("b1", day="tuesday"), entry("b2")]
+    result = run_scenario(snapshot, current, [], CONSTRAINTS, validate, batch_ids=["b1"], include_entries=True)
+    assert {e["batch_id"] for e in result["entries"]} == {"b1"}
+    assert ("monday", "09:00-10:00") not in slots(result["entries"])
+    for report in ("current", "baseline", "proposed"):
+        assert result[report]["hard_total"] == 0, report
+    # b1 already sits in the first free slot, and b2's stored session is not reported as removed
+    assert result["diff"] == {"added": [], "removed": [], "changed": [], "unchanged": 1}
+    assert result["affected"] == {"batches": 0, "faculty": 0}
+
+
+def test_edits_are_judged_against_the_current_timetable(snapshot):
+    current = [entry("b1", day="tuesday"), entry("b2")]
+    edits = [{"op": "add", "resource": "classrooms", "data": {"id": "annex", "name": "Annex", "type": "lecture_hall",
+                                                             "capacity": 60}},
+             {"op": "remove", "resource": "classrooms", "id": "hall"}]
+    result = run_scenario(snapshot, current, edits, CONSTRAINTS, validate, batch_ids=["b1"], include_entries=True)
+    assert result["current"]["hard_violations"]["unknown_reference"] == 1
+    assert [e["classroom_id"] for e in result["entries"]] == ["annex"]
+    assert result["proposed"]["hard_total"] == 0
+
+    with pytest.raises(ScenarioError, match="edit 1: no faculty with id 'nobody'"):
+        run_scenario(snapshot, current, [{"op": "remove", "resource": "faculty", "id": "nobody"}], CONSTRAINTS, validate)
+
+
+async def test_scenario_endpoint_keeps_other_batches_occupancy(server, client, snapshot):
+    db = server.db
+    await db.batches.insert_many([server.StudentBatch(**b).dict() for b in snapshot["batches"]])
+    await db.subjects.insert_one(server.Subject(**snapshot["subjects"][0]).dict())
+    await db.faculty.insert_one(server.Faculty(id="ada", name="Ada", email="ada@uni.edu", department="CSE",
+                                               subjects=["Algorithms"]).dict())
+    await db.classrooms.insert_one(server.Classroom(**snapshot["classrooms"][0]).dict())
+    await db.timetable.insert_one({"id": "t1", **entry("b2")})
+
+    response = await client.post("/api/scenarios/evaluate", json={"batch_ids": ["b1"], "include_entries": True})
+    assert response.status_code == 200
+    body = response.json()
+    assert [e["batch_id"] for e in body["entries"]] == ["b1"]
+    assert ("monday", "09:00-10:00") not in slots(body["entries"])
+    assert body["proposed"]["hard_total"] == 0
+    assert body["diff"]["removed"] == [] and body["diff"]["added"][0]["batch_id"] == "b1"
@@ -0,0 +1,95 @@
+"""Local timetable rules (scheduling.py) and the solver benchmark corpus."""
+import pytest
+
+from solver_bench import bench_instance, compare, load_engine
+from scheduling import HARD_CONSTRAINTS, build_slot_grid, evaluate_timetable, greedy_schedule
+from server import TimetableConstraints
+
+pytestmark = pytest.mark.anyio
+
+CONSTRAINTS = TimetableConstraints()
+
+
+def test_slot_grid_skips_the_lunch_break():
+    assert build_slot_grid(CONSTRAINTS) == [
+        "09:00-10:00", "10:00-11:00", "11:00-12:00", "13:00-14:00", "14:00-15:00", "15:00-16:00", "16:00-17:00"]
+    short = TimetableConstraints(start_time="08:30", end_time="12:30", period_duration=90, lunch_break_start="11:30")
+    assert build_slot_grid(short) == ["08:30-10:00", "10:00-11:30"]
+
+
+@pytest.fixture
+def data():
+    return {
+        "batches": [{"id": "b1", "department": "CSE", "year": 1, "semester": 1, "student_count": 40},
+                    {"id": "b2", "department": "CSE", "year": 1, "semester": 1, "student_count": 40}],
+        "subjects": [{"id": "algo", "name": "Algorithms", "department": "CSE", "year": 1, "semester": 1,
+                      "type": "theory", "hours_per_week": 1}],
+        "faculty": [{"id": "ada", "subjects": ["Algorithms"]}, {"id": "alan", "subjects": ["Logic"]}],
+        "classrooms": [{"id": "hall", "type": "lecture_hall", "capacity": 60},
+                       {"id": "lab", "type": "lab", "capacity": 60},
+                       {"id": "tiny", "type": "lecture_hall", "capacity": 10}],
+    }
+
+
+def entry(batch_id="b1", faculty_id="ada", classroom_id="hall", day="monday", time_slot="09:00-10:00"):
+    return {"batch_id": batch_id, "subject_id": "algo", "faculty_id": faculty_id, "classroom_id": classroom_id,
+            "day": day, "time_slot": time_slot}
+
+
+def violations(entries, data, constraints=CONSTRAINTS):
+    hard = evaluate_timetable(entries, data, constraints)["hard_violations"]
+    return {name: count for name, count in hard.items() if count}
+
+
+def test_a_valid_timetable_has_no_hard_violations(data):
+    assert violations([entry("b1"), entry("b2", time_slot="10:00-11:00")], data) == {}
+
+
+@pytest.mark.parametrize("entries, expected", [
+    ([entry("b1"), entry("b2", classroom_id="lab", faculty_id="alan")],
+     {"faculty_clash": 0, "room_type": 1, "unqualified_faculty": 1}),
+    ([entry("b1"), entry("b2")], {"faculty_clash": 1, "room_clash": 1}),
+    ([entry("b1"), entry("b1", time_slot="10:00-11:00"), entry("b2", classroom_id="tiny", time_slot="11:00-12:00")],
+     {"room_capacity": 1}),
+    ([entry("b1", time_slot="12:00-13:00"), entry("b2", day="sunday"), entry("b1", faculty_id="nobody")],
+     {"invalid_slot": 2, "unknown_reference": 1, "unscheduled_hours": 2}),
+    ([entry("b1", time_slot="10:00-11:00"), entry("b1", time_slot="10:00-11:00", faculty_id="alan", classroom_id="tiny")],
+     {"batch_clash": 1, "unqualified_faculty": 1, "room_capacity": 1, "unscheduled_hours": 1}),
+])
+def test_each_hard_violation_is_counted(data, entries, expected):
+    assert violations(entries, data) == {name: count for name, count in expected.items() if count}
+
+
+def test_faculty_daily_hours_count_each_excess_hour(data):
+    slots = build_slot_grid(CONSTRAINTS)[:4]
+    entries = [entry("b1" if i % 2 else "b2", time_slot=slot) for i, slot in enumerate(slots)]
+    assert violations(entries, data, TimetableConstraints(max_hours_per_day=2))["faculty_daily_hours"] == 2
+
+
+@pytest.mark.parametrize("instance", ["xs", "s"])
+def test_greedy_only_ever_leaves_hours_unscheduled(instance):
+    result = bench_instance(load_engine("greedy"), instance, CONSTRAINTS, repeat=1, scorer="python")
+    placed = {name: count for name, count in result["hard_violations"].items() if count and name != "unscheduled_hours"}
+    assert placed == {}
+    assert result["entries"] + result["hard_violations"]["unscheduled_hours"] == result["required_hours"]
+    if instance == "xs":
+        assert result["hard_total"] == 0
+
+
+def test_solver_compare_flags_new_hard_violations_and_ignores_timing_noise(tmp_path):
+    previous = {"hard_total": 0, "wall_s": 0.01, "peak_mb": 10.0, "soft_cost": 100.0}
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text('{"instances": {"xs": %s}}' % str(previous).replace("'", '"'))
+    current = {"instances": {"xs": {**previous, "hard_total": 2, "wall_s": 0.03, "soft_cost": 130.0}}}
+    assert compare(current, baseline, threshold=0.2) == [
+        "xs: hard violations 0 -> 2", "xs: soft_cost 100.0 -> 130.0 (+30%)"]
+
+
+async def test_greedy_schedule_of_a_stored_dataset(server, client):
+    assert (await client.post("/api/init-sample-data/synthetic", json={"preset": "toy", "seed": 5})).json()["success"]
+    data = {name: await server.db[name].find({}, {"_id": 0}).to_list(None)
+            for name in ("batches", "subjects", "faculty", "classrooms")}
+    entries = greedy_schedule(data, CONSTRAINTS)
+    report = evaluate_timetable(entries, data, CONSTRAINTS)
+    assert report["hard_total"] == 0 and set(report["hard_violations"]) == set(HARD_CONSTRAINTS)
+    assert greedy_schedule(data, CONSTRAINTS) == entries
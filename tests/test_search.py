@@ -0,0 +1,115 @@
+"""Autocomplete index (search.py): ranking, fuzzy fallback, the result cache and freshness."""
+import pytest
+
+from search import SearchIndex, VersionTracker
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.upsert("subjects", {"id": "algo", "name": "Algorithms", "code": "CS101", "department": "CSE"})
+    index.upsert("subjects", {"id": "adv", "name": "Advanced Algorithms", "code": "CS401", "department": "CSE"})
+    index.upsert("subjects", {"id": "linear", "name": "Linear Algebra", "code": "MA201", "department": "MATH"})
+    index.upsert("faculty", {"id": "alan", "name": "Alan Turing", "email": "alan@uni.edu", "department": "CSE"})
+    index.upsert("classrooms", {"id": "lab", "name": "Algo Lab", "type": "lab"})
+    return index
+
+
+def ids(results):
+    return [r["id"] for r in results]
+
+
+def test_prefix_ranking(index):
+    # A label starting with the prefix ranks first, then shorter labels
+    assert ids(index.search("alg")) == ["lab", "algo", "linear", "adv"]
+    # A whole-word match outranks a prefix of a longer word
+    assert [(r["id"], r["score"]) for r in index.search("algorithms")] == [("algo", 1.2), ("adv", 1.0)]
+    assert ids(index.search("adv alg")) == ["adv"]
+    assert ids(index.search("cs1")) == ["algo"]
+    # Department is a weaker field than the name
+    assert index.search("turing")[0]["score"] > index.search("cse")[0]["score"]
+
+
+def test_kinds_and_limit(index):
+    assert ids(index.search("alg", kinds=["subjects"], limit=2)) == ["algo", "linear"]
+    assert ids(index.search("alg", kinds=["faculty"])) == []
+    assert index.search("   ") == []
+
+
+def test_fuzzy_fallback_finds_typos(index):
+    assert ids(index.search("algoritms")) == ["algo", "adv"]
+    assert ids(index.search("alan turign")) == ["alan"]
+    assert index.search("xyzzy") == []
+
+
+def test_result_cache_is_dropped_on_upsert_and_remove(index):
+    first = index.search("alg")
+    assert index.search("alg") is first
+
+    index.upsert("batches", {"id": "b1", "name": "Algo Batch", "department": "CSE"})
+    assert "b1" in ids(index.search("alg"))
+    index.upsert("subjects", {"id": "algo", "name": "Graph Theory", "code": "CS101", "department": "CSE"})
+    assert "algo" not in ids(index.search("alg")) and ids(index.search("graph")) == ["algo"]
+    index.remove("classrooms", "lab")
+    assert "lab" not in ids(index.search("alg"))
+    assert len(index) == 5
+
+
+def test_replace_kind_drops_records_no_longer_stored(index):
+    index.replace_kind("subjects", [{"id": "os", "name": "Operating Systems", "code": "CS301"}], version=4)
+    assert ids(index.search("alg")) == ["lab"]
+    assert ids(index.search("operating")) == ["os"]
+    assert index.versions["subjects"] == 4
+
+
+def test_stale_kinds_ignores_own_writes_only():
+    tracker = VersionTracker()
+    assert tracker.stale_kinds({"faculty": 0}) == ["faculty"]  # never loaded
+    tracker.synced("faculty", 3)
+    assert tracker.stale_kinds({"faculty": 3}) == []
+
+    tracker.note_local_write("faculty", 4)
+    tracker.note_local_write("faculty", 5)
+    assert tracker.stale_kinds({"faculty": 5}) == []
+    assert tracker.versions["faculty"] == 5
+    # Another worker wrote 6, this one 7
+    tracker.note_local_write("faculty", 7)
+    assert tracker.stale_kinds({"faculty": 7}) == ["faculty"]
+
+
+def test_refresh_between_a_bump_and_its_local_write_does_not_hide_the_next_remote_write():
+    tracker = VersionTracker()
+    tracker.synced("faculty", 3)
+    # A route bumped faculty to 4; before it applies its write, a refresh reloads at 4
+    assert tracker.stale_kinds({"faculty": 4}) == ["faculty"]
+    tracker.synced("faculty", 4)
+    tracker.note_local_write("faculty", 4)
+    # The next write is another worker's
+    assert tracker.stale_kinds({"faculty": 5}) == ["faculty"]
+
+
+def test_reload_keeps_own_writes_newer_than_the_reloaded_version():
+    tracker = VersionTracker()
+    tracker.synced("faculty", 3)
+    tracker.note_local_write("faculty", 5)
+    tracker.synced("faculty", 4)  # a reload read version 4 before this worker's write
+    assert tracker.stale_kinds({"faculty": 5}) == []
+
+
+async def test_search_endpoint_sees_local_and_remote_writes(server, client):
+    subject = {"name": "Algorithms", "code": "CS101", "department": "CSE", "year": 1, "semester": 1,
+               "type": "theory", "hours_per_week": 3}
+    created = (await client.post("/api/subjects", json=subject)).json()
+    assert ids((await client.get("/api/search", params={"q": "algo"})).json()["results"]) == [created["id"]]
+
+    # Another worker inserts a subject and bumps the version
+    await server.db.subjects.insert_one({**subject, "id": "remote", "name": "Algorithm Design", "code": "CS201"})
+    await server.bump_versions(["subjects"])
+    server.search_state["checked_at"] = None
+    results = (await client.get("/api/search", params={"q": "algo"})).json()["results"]
+    assert sorted(ids(results)) == sorted([created["id"], "remote"])
+
+    await client.delete(f"/api/subjects/{created['id']}")
+    assert ids((await client.get("/api/search", params={"q": "algo"})).json()["results"]) == ["remote"]
@@ -0,0 +1,73 @@
+"""Bearer-token sessions (sessions.py): expiry, revocation and the per-worker cache."""
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from sessions import SessionStore, token_hash
+
+pytestmark = pytest.mark.anyio
+
+ADA = {"id": "u1", "email": "ada@uni.edu", "name": "Ada", "role": "admin", "password": "not kept"}
+
+
+@pytest.fixture
+def collection():
+    return AsyncMongoMockClient()["test"].sessions
+
+
+async def test_issued_token_resolves_and_only_its_hash_is_stored(collection):
+    store = SessionStore(collection)
+    session = await store.issue(ADA)
+    assert await store.resolve(session["token"]) == session["user"]
+    assert "password" not in session["user"]
+
+    stored = await collection.find_one({})
+    assert stored["_id"] == token_hash(session["token"]) != session["token"]
+    # A cold worker reads it from the collection
+    assert (await SessionStore(collection).resolve(session["token"]))["email"] == "ada@uni.edu"
+    assert await store.resolve("made-up") is None
+
+
+async def test_session_expires_even_while_cached(collection):
+    store = SessionStore(collection, ttl_seconds=0.1, cache_seconds=60)
+    token = (await store.issue(ADA))["token"]
+    assert await store.resolve(token) is not None
+    await asyncio.sleep(0.15)
+    # Mongo's TTL monitor has not run yet; the lookup itself must notice
+    assert await collection.count_documents({}) == 1
+    assert await store.resolve(token) is None
+    assert await SessionStore(collection).resolve(token) is None
+
+
+async def test_revoked_token_is_rejected(collection):
+    store = SessionStore(collection)
+    token = (await store.issue(ADA))["token"]
+    assert await store.revoke(token)
+    assert await store.resolve(token) is None
+    assert not await store.revoke(token)
+    assert await collection.count_documents({}) == 0
+
+
+async def test_other_workers_see_a_revocation_once_their_cache_ages_out(collection):
+    store = SessionStore(collection)
+    other = SessionStore(collection, cache_seconds=0.1)
+    token = (await store.issue(ADA))["token"]
+    assert await other.resolve(token) is not None
+
+    await store.revoke(token)
+    assert await other.resolve(token) is not None
+    await asyncio.sleep(0.15)
+    assert await other.resolve(token) is None
+
+
+async def test_login_me_and_logout(server, client):
+    login = (await client.post("/api/auth/login", json={"email": "ada@uni.edu", "role": "admin"})).json()
+    auth = {"Authorization": f"Bearer {login['token']}"}
+    me = await client.get("/api/auth/me", headers=auth)
+    assert me.status_code == 200 and me.json()["email"] == "ada@uni.edu"
+
+    assert (await client.post("/api/auth/logout", headers=auth)).json() == {"success": True}
+    assert (await client.get("/api/auth/me", headers=auth)).status_code == 401
+    assert (await client.post("/api/auth/logout", headers=auth)).status_code == 401
+    assert (await client.get("/api/auth/me")).status_code == 401
@@ -0,0 +1,100 @@
+"""Worker startup: liveness right away, readiness once Mongo answers, LLM stack only on opt-in."""
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from profiler import SlowQueryProfiler
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakyClient:
+    """Wraps a mongomock client whose ping fails until `up` is set, like a Mongo still booting"""
+
+    def __init__(self):
+        self.inner = AsyncMongoMockClient()
+        self.up = False
+        self.pings = 0
+        self.closed = False
+
+    @property
+    def admin(self):
+        return self
+
+    async def command(self, command):
+        self.pings += 1
+        if not self.up:
+            raise ConnectionError("connection refused")
+        return await self.inner.admin.command(command)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def startup(server, monkeypatch):
+    """The server with a fresh startup state, a Mongo that is not up yet and a counted LLM import"""
+    mongo = FlakyClient()
+    llm_imports = []
+    monkeypatch.setattr(server, "client", mongo)
+    monkeypatch.setattr(server, "startup_state", {"ready": False, "phases": {}, "errors": []})
+    monkeypatch.setattr(server, "slow_queries", SlowQueryProfiler(threshold_ms=100, explain=False))
+    monkeypatch.setattr(server, "load_llm_integration", lambda: llm_imports.append(True))
+    monkeypatch.setattr(server.asyncio, "sleep", fast_sleep)
+    return mongo, llm_imports
+
+
+real_sleep = asyncio.sleep
+
+
+async def fast_sleep(seconds, *args):
+    # prepare_worker backs off up to 10s between pings; the tests only need the retries to happen
+    await real_sleep(0, *args)
+
+
+async def wait_until(predicate):
+    for _ in range(400):
+        if predicate():
+            return
+        await real_sleep(0.005)
+    raise AssertionError("condition not reached")
+
+
+async def test_liveness_answers_before_the_worker_is_ready(server, client, startup):
+    assert (await client.get("/api/health/live")).json() == {"status": "alive"}
+    response = await client.get("/api/health/ready")
+    assert response.status_code == 503 and response.json()["status"] == "starting"
+
+
+async def test_readiness_flips_once_mongo_answers(server, client, startup):
+    mongo, llm_imports = startup
+    async with server.lifespan(server.app):
+        await wait_until(lambda: mongo.pings >= 3)
+        response = await client.get("/api/health/ready")
+        assert response.status_code == 503 and response.json()["status"] == "starting"
+
+        mongo.up = True
+        await wait_until(lambda: server.startup_state["ready"])
+        response = await client.get("/api/health/ready")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "ready" and body["errors"] == []
+        assert {"import", "mongo_connect", "indexes", "warm_caches", "ready_after"} <= set(body["phases"])
+
+        # A worker that loses Mongo after startup stops advertising itself as ready
+        mongo.up = False
+        response = await client.get("/api/health/ready")
+        assert response.status_code == 503 and response.json()["status"] == "mongo_unreachable"
+    assert mongo.closed
+    assert llm_imports == []
+
+
+async def test_background_preload_imports_the_llm_stack_at_startup(server, startup, monkeypatch):
+    mongo, llm_imports = startup
+    monkeypatch.setattr(server, "LLM_PRELOAD", "background")
+    mongo.up = True
+    async with server.lifespan(server.app):
+        await wait_until(lambda: "llm_import" in server.startup_state["phases"])
+        await wait_until(lambda: server.startup_state["ready"])
+    assert llm_imports == [True]
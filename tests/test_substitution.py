@@ -0,0 +1,121 @@
+"""Hedged substitute suggestions: the LLM races a local heuristic, and a late LLM answer may
+replace the heuristic pick only while that lecturer is still free."""
+import asyncio
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+MONDAY = "2026-10-19"
+SLOT = "09:00-10:00"
+
+
+def lecturer(faculty_id, name):
+    return {"id": faculty_id, "name": name, "email": f"{faculty_id}@uni.edu", "department": "CSE",
+            "subjects": ["Algorithms"], "max_hours_per_day": 6}
+
+
+def entry(entry_id, faculty_id, batch_id, time_slot=SLOT):
+    return {"id": entry_id, "batch_id": batch_id, "subject_id": "algo", "faculty_id": faculty_id,
+            "classroom_id": "room", "day": "monday", "time_slot": time_slot}
+
+
+@pytest.fixture
+async def absence(server):
+    """Absent lecturer "absent"; "busy" teaches in the slot, "light" and "heavy" are free and
+    the heuristic prefers "light" for its lower load"""
+    db = server.db
+    await db.subjects.insert_one({"id": "algo", "name": "Algorithms"})
+    await db.faculty.insert_many([lecturer(i, i.title()) for i in ("absent", "busy", "light", "heavy")])
+    await db.timetable.insert_many([
+        entry("t1", "absent", "b1"),
+        entry("t2", "busy", "b2"),
+        entry("t3", "heavy", "b3", "11:00-12:00"),
+    ])
+    await db.absences.insert_one({"id": "a1", "lecturer_id": "absent", "date": MONDAY, "time_slot": SLOT})
+    return "a1"
+
+
+async def settle(server):
+    await asyncio.gather(*list(server.background_tasks))
+
+
+async def stored(server, absence_id):
+    return await server.db.absences.find_one({"id": absence_id}, {"_id": 0})
+
+
+async def test_fast_llm_answer_is_used(server, client, absence, fake_llm):
+    fake_llm.reply = {"recommended_faculty_id": "heavy", "reason": "expert"}
+    body = (await client.post(f"/api/absences/{absence}/substitute")).json()
+    assert body["success"] and body["source"] == "llm"
+    assert body["substitute"]["recommended_faculty_id"] == "heavy"
+    assert '"available": false' in fake_llm.prompts[0]
+    assert (await stored(server, absence))["substitute_source"] == "llm"
+
+
+async def test_llm_pick_of_a_busy_lecturer_falls_back_to_heuristic(server, client, absence, fake_llm):
+    fake_llm.reply = {"recommended_faculty_id": "busy", "reason": "expert"}
+    body = (await client.post(f"/api/absences/{absence}/substitute")).json()
+    assert body["source"] == "heuristic" and not body["llm_pending"]
+    assert body["substitute"]["recommended_faculty_id"] == "light"
+
+
+async def test_failing_llm_falls_back_to_heuristic(server, client, absence, fake_llm):
+    fake_llm.reply = RuntimeError("provider down")
+    body = (await client.post(f"/api/absences/{absence}/substitute")).json()
+    assert body["success"] and body["source"] == "heuristic" and not body["llm_pending"]
+    assert (await stored(server, absence))["substitute_id"] == "light"
+
+
+async def test_slow_llm_upgrades_heuristic_after_deadline(server, client, absence, fake_llm):
+    fake_llm.reply = {"recommended_faculty_id": "heavy", "reason": "expert"}
+    fake_llm.delay = 0.2
+    body = (await client.post(f"/api/absences/{absence}/substitute?deadline_ms=20")).json()
+    assert body["source"] == "heuristic" and body["llm_pending"]
+    assert body["substitute"]["recommended_faculty_id"] == "light"
+
+    await settle(server)
+    upgraded = await stored(server, absence)
+    assert upgraded["substitute_id"] == "heavy" and upgraded["substitute_source"] == "llm"
+
+
+async def test_late_llm_pick_that_became_busy_is_discarded(server, client, absence, fake_llm):
+    fake_llm.reply = {"recommended_faculty_id": "heavy", "reason": "expert"}
+    fake_llm.delay = 0.2
+    await client.post(f"/api/absences/{absence}/substitute?deadline_ms=20")
+    # Meanwhile "heavy" is assigned to cover another absence in the same slot
+    await server.db.absences.insert_one({"id": "a2", "lecturer_id": "other", "date": MONDAY, "time_slot": SLOT,
+                                         "substitute_id": "heavy"})
+
+    await settle(server)
+    kept = await stored(server, absence)
+    assert kept["substitute_id"] == "light" and kept["substitute_source"] == "heuristic"
+
+
+async def test_late_llm_answer_never_overrides_manual_assignment(server, client, absence, fake_llm):
+    fake_llm.reply = {"recommended_faculty_id": "heavy", "reason": "expert"}
+    fake_llm.delay = 0.2
+    await client.post(f"/api/absences/{absence}/substitute?deadline_ms=20")
+    await server.db.absences.update_one({"id": absence}, {"$set": {"substitute_id": "busy", "substitute_source": "manual"}})
+
+    await settle(server)
+    assert (await stored(server, absence))["substitute_id"] == "busy"
+
+
+async def test_unhedged_waits_for_llm(server, client, absence, fake_llm):
+    fake_llm.reply = {"recommended_faculty_id": "heavy", "reason": "expert"}
+    fake_llm.delay = 0.05
+    body = (await client.post(f"/api/absences/{absence}/substitute?hedged=false&deadline_ms=0")).json()
+    assert body["success"] and body["source"] == "llm"
+    assert body["substitute"]["recommended_faculty_id"] == "heavy"
+
+
+async def test_unhedged_rejects_busy_or_unparseable_answers(server, client, absence, fake_llm):
+    fake_llm.reply = {"recommended_faculty_id": "busy", "reason": "expert"}
+    body = (await client.post(f"/api/absences/{absence}/substitute?hedged=false")).json()
+    assert not body["success"] and "busy" in body["message"]
+
+    fake_llm.reply = "not json"
+    body = (await client.post(f"/api/absences/{absence}/substitute?hedged=false")).json()
+    assert body == {"success": False, "message": "Failed to parse AI response", "qualified_faculty": body["qualified_faculty"]}
+    assert (await stored(server, absence)).get("substitute_id") is None
@@ -0,0 +1,96 @@
+"""Week-matrix documents (week_matrix.py) and the /timetable/{batch_id}/week reads."""
+import pytest
+
+from scheduling import DAYS
+from week_matrix import decode_week, encode_week, week_id
+
+from .test_generation import campus, generate, slot  # noqa: F401 (campus is a fixture)
+
+pytestmark = pytest.mark.anyio
+
+FIELDS = ("batch_id", "day", "time_slot", "subject_id", "faculty_id", "classroom_id")
+
+
+def cells(entries):
+    return sorted(tuple(e[f] for f in FIELDS) for e in entries)
+
+
+def entry(batch_id, day, time_slot, subject_id, faculty_id, classroom_id):
+    return dict(zip(FIELDS, (batch_id, day, time_slot, subject_id, faculty_id, classroom_id)))
+
+
+def test_decode_inverts_encode():
+    entries = [
+        entry("b1", "friday", "14:00-15:00", "algo", "ada", "hall"),
+        entry("b1", "monday", "09:00-10:00", "algo", "ada", "hall"),
+        entry("b1", "monday", "10:00-11:00", "os", "alan", "lab"),
+        entry("b1", "sunday", "09:00-10:00", "os", "ada", "lab"),
+        entry("b2", "monday", "09:00-10:00", "db", "grace", "hall"),
+    ]
+    week = encode_week("b1", 4, entries)
+    assert week["_id"] == week_id("b1", 4) == "b1:4"
+    assert week["days"] == [d for d in DAYS if d in ("monday", "friday")] + ["sunday"]
+    assert week["slots"] == ["09:00-10:00", "10:00-11:00", "14:00-15:00"]
+    assert week["subjects"] == ["algo", "os"] and sorted(week["classrooms"]) == ["hall", "lab"]
+    assert week["grid"][0] == [[0, 0, 0], [1, 1, 1], None]
+
+    decoded = decode_week(week)
+    assert cells(decoded) == cells(entries[:4])
+    assert len({e["id"] for e in decoded}) == 4 and all(e["id"].startswith("b1:4:") for e in decoded)
+    assert decode_week(encode_week("b1", 5, decoded)) == [{**e, "id": e["id"].replace("b1:4:", "b1:5:")} for e in decoded]
+
+
+def test_empty_week():
+    week = encode_week("b1", 1, [])
+    assert (week["days"], week["slots"], week["grid"]) == ([], [], [])
+    assert decode_week(week) == []
+
+
+async def week(client, batch_id, **params):
+    response = await client.get(f"/api/timetable/{batch_id}/week", params={"expand": True, **params})
+    return response.status_code, response.json()
+
+
+async def stored(server, batch_id):
+    return cells(await server.db.timetable.find({"batch_id": batch_id}).to_list(None))
+
+
+async def test_unchanged_batch_reads_its_older_week(server, client, fake_llm, campus):
+    assert (await generate(client, fake_llm, ["a", "b"], [slot("a", "ada"), slot("b", "alan", "10:00-11:00")]))["success"]
+    _, first_a = await week(client, "a")
+    _, first_b = await week(client, "b")
+
+    # Only batch a changes: b gets no new week document and keeps reading the first one
+    assert (await generate(client, fake_llm, ["a", "b"], [slot("a", "grace"), slot("b", "alan", "10:00-11:00")]))["success"]
+    status, latest_a = await week(client, "a")
+    assert status == 200 and latest_a["version"] > first_a["version"]
+    assert cells(latest_a["entries"]) == await stored(server, "a")
+    status, latest_b = await week(client, "b")
+    assert status == 200 and latest_b["_id"] == first_b["_id"]
+    assert cells(latest_b["entries"]) == await stored(server, "b")
+    assert await server.db.timetable_weeks.count_documents({"batch_id": "b"}) == 1
+
+    # Older versions stay readable until pruned
+    status, old_a = await week(client, "a", version=first_a["version"])
+    assert status == 200 and [e["faculty_id"] for e in old_a["entries"]] == ["ada"]
+
+
+async def test_old_weeks_are_pruned(server, client, fake_llm, campus, monkeypatch):
+    monkeypatch.setattr(server, "TIMETABLE_WEEK_HISTORY", 2)
+    for faculty_id in ("ada", "alan", "grace", "ada"):
+        assert (await generate(client, fake_llm, ["a"], [slot("a", faculty_id)]))["success"]
+    versions = sorted(w["version"] for w in await server.db.timetable_weeks.find({"batch_id": "a"}).to_list(None))
+    assert len(versions) == 2 and versions[1] == versions[0] + 1
+    assert (await week(client, "a", version=versions[0] - 1))[0] == 404
+
+
+async def test_timetable_without_week_documents_is_converted_on_first_read(server, client):
+    assert (await week(client, "a"))[0] == 404
+    await server.db.timetable.insert_many([
+        {"id": "e1", **entry("a", "tuesday", "09:00-10:00", "algo", "ada", "hall")},
+        {"id": "e2", **entry("a", "monday", "11:00-12:00", "algo", "ada", "hall")},
+    ])
+    status, body = await week(client, "a")
+    assert status == 200 and body["days"] == ["monday", "tuesday"]
+    assert cells(body["entries"]) == await stored(server, "a")
+    assert await server.db.timetable_weeks.count_documents({"_id": body["_id"]}) == 1